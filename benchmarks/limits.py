@@ -0,0 +1,132 @@
+"""Evaluation of limits by TestCase.result_handler
+
+Compares callable limits whose source is read for every measurement (before limits
+were compiled) with compiled callable and declarative limits, and bulk evaluation
+of declarative limits with NumPy with one by one evaluation.
+
+Run from the repository root: python benchmarks/limits.py
+"""
+import inspect
+import pathlib
+import sys
+import time
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+# Fakes of the test station shared with the tests
+sys.path.insert(0, str(ROOT / 'tests'))
+
+from conftest import Progress  # pylint: disable=wrong-import-position
+from conftest import create_common_definitions  # pylint: disable=wrong-import-position
+from test_runner import limits as limits_engine  # pylint: disable=wrong-import-position
+from test_runner import test_case  # pylint: disable=wrong-import-position
+from test_runner.dut import Dut  # pylint: disable=wrong-import-position
+
+MEASUREMENTS = 200
+ROUNDS = 20
+
+CALLABLE_LIMITS = {
+    'Bench': {
+        f'M{i}': {'limit': lambda measurement: 90 < measurement < 100, 'unit': 'dB'}
+        for i in range(MEASUREMENTS)
+    }
+}
+DECLARATIVE_LIMITS = {
+    'Bench': {f'M{i}': {'min': 90, 'max': 100, 'unit': 'dB'} for i in range(MEASUREMENTS)}
+}
+
+
+class Bench(test_case.TestCase):
+    def test(self):
+        pass
+
+    def post_test(self):
+        pass
+
+
+class SourcePerMeasurement(Bench):
+    """Limits are evaluated like before they were compiled"""
+
+    def result_handler(self, error=None):
+        case = self.dut.test_cases[self.name]
+        case['measurements'].take_changed()
+
+        for measurement_name, measurement_dict in case['measurements'].items():
+            limits = self.limits[self.name][measurement_name]
+            limit = limits.get('report_limit', inspect.getsource(limits['limit']))
+            result = 'pass' if limits['limit'](measurement_dict['measurement']) else 'fail'
+            measurement_dict['error'] = None
+            measurement_dict['unit'] = limits.get('unit', '')
+            measurement_dict['optional'] = limits.get('optional', False)
+            measurement_dict['limit'] = limit
+            measurement_dict['result'] = result
+            self.set_pass_fail_result(result)
+
+
+def result_handler_us(test_case_class, limits, rounds=ROUNDS):
+    """Returns microseconds per measurement of measuring and evaluating the results"""
+    common_definitions = create_common_definitions(FLOW_CONTROL=None)
+    bench = test_case_class(limits, Progress(), Dut('sn', '1'), {}, None, common_definitions)
+    bench.name = 'Bench'
+    bench.initialize_measurements()
+
+    def measure_and_evaluate():
+        for index in range(MEASUREMENTS):
+            bench.new_measurement(f'M{index}', 95.0 + index % 3)
+        bench.evaluate_results()
+
+    measure_and_evaluate()
+    start = time.perf_counter()
+    for _ in range(rounds):
+        measure_and_evaluate()
+
+    return (time.perf_counter() - start) / rounds / MEASUREMENTS * 1e6
+
+
+def bulk_us(measurements, rounds=200):
+    """Returns microseconds per measurement of bulk and one by one evaluation"""
+    compiled = limits_engine.CompiledLimits(
+        {'Bench': {f'M{i}': {'min': 90, 'max': 100} for i in range(measurements)}}
+    )
+    values = {f'M{i}': 95.0 + i % 7 for i in range(measurements)}
+    compiled.evaluate_bulk('Bench', values)
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        compiled.evaluate_bulk('Bench', values)
+    bulk = (time.perf_counter() - start) / rounds / measurements * 1e6
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for name, value in values.items():
+            compiled.get('Bench', name).evaluate(value)
+    one_by_one = (time.perf_counter() - start) / rounds / measurements * 1e6
+
+    return bulk, one_by_one
+
+
+def main():
+    print(f"Measure and evaluate {MEASUREMENTS} measurements, us per measurement:")
+    print("  callable, source read per measurement %7.1f"
+          % result_handler_us(SourcePerMeasurement, CALLABLE_LIMITS, 3))
+    print("  compiled callable                     %7.1f"
+          % result_handler_us(Bench, CALLABLE_LIMITS))
+    print("  compiled declarative                  %7.1f"
+          % result_handler_us(Bench, DECLARATIVE_LIMITS))
+
+    numpy = limits_engine.numpy
+    limits_engine.numpy = None
+    print("  compiled declarative without NumPy    %7.1f"
+          % result_handler_us(Bench, DECLARATIVE_LIMITS))
+    limits_engine.numpy = numpy
+
+    if numpy is None:
+        return
+
+    print("Declarative limits only, us per measurement (bulk NumPy / one by one):")
+    for measurements in (16, 200, 2000):
+        print("  %5d measurements %7.2f / %.2f" % ((measurements,) + bulk_us(measurements)))
+
+
+if __name__ == '__main__':
+    main()
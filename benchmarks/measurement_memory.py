@@ -0,0 +1,56 @@
+"""Memory of measurements stored to Dut.test_cases
+
+Compares measurements stored as dictionaries with MeasurementRecord and checks that
+both are exported to the same JSON.
+
+Run from the repository root: python benchmarks/measurement_memory.py
+"""
+import json
+import pathlib
+import sys
+import tracemalloc
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+from test_runner import measurements  # pylint: disable=wrong-import-position
+
+MEASUREMENTS = 20000
+
+
+def build(factory):
+    """Returns measurements of a test case stored as given by result_handler"""
+    test_case_measurements = {}
+
+    for index in range(MEASUREMENTS):
+        measurement = factory()
+        measurement['measurement'] = float(index)
+        measurement['error'] = None
+        measurement['unit'] = 'dB'
+        measurement['optional'] = False
+        measurement['limit'] = '90 <= measurement <= 100'
+        measurement['result'] = 'pass'
+        test_case_measurements[f'M{index}'] = measurement
+
+    return test_case_measurements
+
+
+def main():
+    print(f"{MEASUREMENTS} measurements including names and values:")
+
+    for label, factory in (('dict', dict), ('MeasurementRecord', measurements.MeasurementRecord)):
+        tracemalloc.start()
+        test_case_measurements = build(factory)
+        size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del test_case_measurements
+
+        print("  %-18s %6.2f MB (%d B/measurement)" % (label, size / 1e6, size / MEASUREMENTS))
+
+    same_json = json.dumps(build(dict), default=str) == json.dumps(
+        build(measurements.MeasurementRecord), default=measurements.json_default
+    )
+    print("Same JSON export:", same_json)
+
+
+if __name__ == '__main__':
+    main()
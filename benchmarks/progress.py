@@ -0,0 +1,110 @@
+"""Serialisation of the progress published to UI
+
+16 test positions with 10 test cases of 50 measurements each, one position changes
+per update. Compares progress built from the cached JSON of unchanged positions with
+progress serialised again for all positions on every update.
+
+Run from the repository root: python benchmarks/progress.py
+"""
+import pathlib
+import queue
+import sys
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+# pylint: disable=wrong-import-position
+from test_runner import measurements
+from test_runner.dut import Dut
+from test_runner.progress_reporter import ProgressReporter
+from test_runner.test_position import TestPosition
+
+POSITIONS = 16
+TEST_CASES = 10
+MEASUREMENTS = 50
+UPDATES = 50
+
+
+def create_test_positions():
+    test_positions = {}
+
+    for index in range(POSITIONS):
+        position = TestPosition(str(index), index)
+        position.status = 'testing'
+        dut = Dut(f'sn_{index}', str(index))
+
+        for case_index in range(TEST_CASES):
+            case = {'result': 'pass', 'measurements': {}}
+            for measurement_index in range(MEASUREMENTS):
+                measurement = measurements.MeasurementRecord()
+                measurement['measurement'] = float(measurement_index)
+                measurement['error'] = None
+                measurement['unit'] = 'V'
+                measurement['optional'] = False
+                measurement['limit'] = '0 <= measurement <= 100'
+                measurement['result'] = 'pass'
+                case['measurements'][f'M{measurement_index}'] = measurement
+            dut.test_cases[f'Case{case_index}'] = case
+
+        dut.touch()
+        position.dut = dut
+        test_positions[str(index)] = position
+
+    return test_positions
+
+
+def run(cached):
+    """Returns milliseconds per update of building, publishing, JSON and delta"""
+    test_control = {
+        'get_sn_from_ui': False,
+        'test_sequences': [],
+        'test_cases': [],
+        'running_mode': [],
+        'gage_rr': False,
+    }
+    test_positions = create_test_positions()
+    progress_queue = queue.Queue()
+    reporter = ProgressReporter(test_control, progress_queue)
+    reporter.set_progress(general_state='testing', test_positions=test_positions)
+
+    start = time.perf_counter()
+    for update in range(UPDATES):
+        position = test_positions[str(update % POSITIONS)]
+        position.step = f'Case{update % TEST_CASES}'
+        position.dut.test_cases['Case0']['measurements']['M0']['measurement'] = float(update)
+        position.dut.touch()
+        if not cached:
+            reporter._fragments.clear()  # pylint: disable=protected-access
+        reporter.set_progress(test_positions=test_positions)
+    build = (time.perf_counter() - start) / UPDATES * 1e3
+
+    messages = [progress_queue.get() for _ in range(progress_queue.qsize())][1:]
+
+    start = time.perf_counter()
+    for message in messages:
+        message.json  # pylint: disable=pointless-statement
+    full_json = (time.perf_counter() - start) / len(messages) * 1e3
+
+    start = time.perf_counter()
+    for message in messages:
+        message.delta_json  # pylint: disable=pointless-statement
+    delta = (time.perf_counter() - start) / len(messages) * 1e3
+
+    return build, full_json, delta, len(messages[-1].json)
+
+
+def main():
+    print(
+        f"{POSITIONS} positions x {TEST_CASES} test cases x {MEASUREMENTS} measurements, "
+        "one position changed per update, ms per update:"
+    )
+    for label, cached in (('serialised again', False), ('cached', True)):
+        build, full_json, delta, size = run(cached)
+        print(
+            "  %-16s build and publish %6.1f, full JSON %5.1f, delta %5.1f (%d kB)"
+            % (label, build, full_json, delta, size / 1e3)
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -95,193 +95,201 @@ PARSER.add_argument(
     nargs='+'
 )
 
-ARGS = PARSER.parse_args()
 
-
-LOG_SETTINGS_FILE = pathlib.Path('test_definitions/common/logging.yaml')
-
-def add_extension(path):
+def add_extension(path, extension):
+    """Returns log file path with the extension added to the name of its directory"""
     index = path.rfind("/")
-    return path[:index] + ARGS.extension_log_path[0] + path[index:]
+    return path[:index] + extension + path[index:]
 
-if LOG_SETTINGS_FILE.is_file():
-    with LOG_SETTINGS_FILE.open() as _f:
-        LOG_CONF = yaml.safe_load(_f.read())
-    if ARGS.extension_log_path:
-        if 'info_file_handler' in LOG_CONF['handlers']:
-            LOG_CONF['handlers']['info_file_handler']['filename'] = add_extension(LOG_CONF['handlers']['info_file_handler']['filename'])
-        if 'debug_file_handler' in LOG_CONF['handlers']:
-            LOG_CONF['handlers']['debug_file_handler']['filename'] = add_extension(LOG_CONF['handlers']['debug_file_handler']['filename'])
-        if 'error_file_handler' in LOG_CONF['handlers']:
-            LOG_CONF['handlers']['error_file_handler']['filename'] = add_extension(LOG_CONF['handlers']['error_file_handler']['filename'])
-        if 'test_case_file_handler' in LOG_CONF['handlers']:
-            LOG_CONF['handlers']['test_case_file_handler']['filename'] = add_extension(LOG_CONF['handlers']['test_case_file_handler']['filename'])
-        LOG_CONF['log_file_path'] = add_extension(LOG_CONF['log_file_path'])
-    pathlib.Path(LOG_CONF['log_file_path']).mkdir(parents=True, exist_ok=True)
-    logging.config.dictConfig(LOG_CONF)
-    logging.info('Logging with configuration from %s', LOG_SETTINGS_FILE)
-else:
-    logging.basicConfig(level=logging.INFO)
-    logging.warning('Cannot find logging settings. Logging with basicConfig.')
 
-if ARGS.verbose:
-    logging.getLogger().setLevel(logging.DEBUG)
+class MessageHandler:
+    def __init__(self, message_queue, message_handler):
+        while True:
+            msg = message_queue.get()
+            # Websocket handlers may be added and removed meanwhile
+            for handler in list(message_handler):
+                handler(msg)
 
-LOGGER = logging.getLogger(__name__)
 
-LOGGER.debug("Logging initialized")
-LOGGER.info("Logging initialized")
+def main():
+    """Runs the test station"""
+    args = PARSER.parse_args()
+
+    log_settings_file = pathlib.Path('test_definitions/common/logging.yaml')
+
+    if log_settings_file.is_file():
+        with log_settings_file.open() as _f:
+            log_conf = yaml.safe_load(_f.read())
+        if args.extension_log_path:
+            extension = args.extension_log_path[0]
+            for handler in (
+                'info_file_handler',
+                'debug_file_handler',
+                'error_file_handler',
+                'test_case_file_handler',
+            ):
+                if handler in log_conf['handlers']:
+                    log_conf['handlers'][handler]['filename'] = add_extension(
+                        log_conf['handlers'][handler]['filename'], extension
+                    )
+            log_conf['log_file_path'] = add_extension(log_conf['log_file_path'], extension)
+        pathlib.Path(log_conf['log_file_path']).mkdir(parents=True, exist_ok=True)
+        logging.config.dictConfig(log_conf)
+        logging.info('Logging with configuration from %s', log_settings_file)
+    else:
+        logging.basicConfig(level=logging.INFO)
+        logging.warning('Cannot find logging settings. Logging with basicConfig.')
 
-if ARGS.create:
+    if args.verbose:
+        logging.getLogger().setLevel(logging.DEBUG)
 
-    from distutils.dir_util import copy_tree
-    from test_definition_template.sequences import example_sequence
-    from test_definition_template import test_case_pool
+    logger = logging.getLogger(__name__)
 
-    TEST_DEF_PATH = os.path.join("./test_definitions/sequences", ARGS.create[0])
+    logger.debug("Logging initialized")
+    logger.info("Logging initialized")
 
-    if os.path.isdir(TEST_DEF_PATH):
-        LOGGER.warning("Test sequence " + ARGS.create[0] + " already exists")
-        sys.exit(-1)
+    if args.create:
 
-    copy_tree(example_sequence.__path__[0], TEST_DEF_PATH)
-    copy_tree(test_case_pool.__path__[0], './test_definitions/test_case_pool')
+        from distutils.dir_util import copy_tree
+        from test_definition_template.sequences import example_sequence
+        from test_definition_template import test_case_pool
 
-    if not os.path.isdir('./test_definitions/common'):
-        from test_definition_template import common
+        test_def_path = os.path.join("./test_definitions/sequences", args.create[0])
 
-        copy_tree(common.__path__[0], './test_definitions/common')
+        if os.path.isdir(test_def_path):
+            logger.warning("Test sequence " + args.create[0] + " already exists")
+            sys.exit(-1)
 
-        import additional_dist_files
-        from shutil import copyfile
+        copy_tree(example_sequence.__path__[0], test_def_path)
+        copy_tree(test_case_pool.__path__[0], './test_definitions/test_case_pool')
 
-        copyfile(additional_dist_files.__path__[0] + '/Dockerfile', './Dockerfile')
-        copyfile(additional_dist_files.__path__[0] + '/docker-compose.yml', './docker-compose.yml')
-    else:
-        LOGGER.info('./test_definitions/common already exists. Not copying it.')
+        if not os.path.isdir('./test_definitions/common'):
+            from test_definition_template import common
 
-    sys.exit(0)
+            copy_tree(common.__path__[0], './test_definitions/common')
 
-CONTROL = runner.get_test_control(LOGGER)
-COMMON_DEFINITIONS = runner.get_common_definitions()
-SETTINGS_FILE = pathlib.Path('station_settings.yaml')
+            import additional_dist_files
+            from shutil import copyfile
 
-if SETTINGS_FILE.is_file():
-    with SETTINGS_FILE.open() as _f:
-        COMMON_DEFINITIONS.SETTINGS = yaml.safe_load(_f.read())
+            copyfile(additional_dist_files.__path__[0] + '/Dockerfile', './Dockerfile')
+            copyfile(additional_dist_files.__path__[0] + '/docker-compose.yml', './docker-compose.yml')
+        else:
+            logger.info('./test_definitions/common already exists. Not copying it.')
 
-if ARGS.list_applications:
-    # Print available applications and actions
-    class GaiaJsonEncoder(json.JSONEncoder):
-        '''Encode json properly'''
+        sys.exit(0)
 
-        def default(self, obj):
-            if callable(obj):
-                return obj.__name__
-            # Let the base class default method raise the TypeError
-            return json.JSONEncoder.default(self, obj)
+    control = runner.get_test_control(logger)
+    common_definitions = runner.get_common_definitions()
+    settings_file = pathlib.Path('station_settings.yaml')
 
-    # Todo: Initialization not working like this anymore
-    COMMON_DEFINITIONS.instrument_initialization()
+    if settings_file.is_file():
+        with settings_file.open() as _f:
+            common_definitions.SETTINGS = yaml.safe_load(_f.read())
 
-    client = COMMON_DEFINITIONS.INSTRUMENTS['gaia']
+    if args.list_applications:
+        # Print available applications and actions
+        class GaiaJsonEncoder(json.JSONEncoder):
+            '''Encode json properly'''
 
-    print(json.dumps(client.applications, indent=4, sort_keys=True, cls=GaiaJsonEncoder))
-    print(json.dumps(client.state_triggers, indent=4, sort_keys=True, cls=GaiaJsonEncoder))
-    sys.exit()
+            def default(self, obj):
+                if callable(obj):
+                    return obj.__name__
+                # Let the base class default method raise the TypeError
+                return json.JSONEncoder.default(self, obj)
 
-CONTROL['run'].set()
+        # Todo: Initialization not working like this anymore
+        common_definitions.instrument_initialization()
 
-if ARGS.dry_run:
-    CONTROL['dry_run'] = True
+        client = common_definitions.INSTRUMENTS['gaia']
 
-if ARGS.mock:
-    CONTROL['mock'] = ARGS.mock
+        print(json.dumps(client.applications, indent=4, sort_keys=True, cls=GaiaJsonEncoder))
+        print(json.dumps(client.state_triggers, indent=4, sort_keys=True, cls=GaiaJsonEncoder))
+        sys.exit()
 
-if ARGS.inverse_mock:
-    CONTROL['inverse_mock'] = ARGS.inverse_mock
+    control['run'].set()
 
-if ARGS.single_run:
-    CONTROL['single_run'] = True
+    if args.dry_run:
+        control['dry_run'] = True
 
-if ARGS.report_off:
-    CONTROL['report_off'] = True
+    if args.mock:
+        control['mock'] = args.mock
 
-if ARGS.instrument_args:
-    CONTROL['instrument_args'] = ARGS.instrument_args
+    if args.inverse_mock:
+        control['inverse_mock'] = args.inverse_mock
 
-if ARGS.extension_log_path:
-    CONTROL['extension_log_path'] = ARGS.extension_log_path
+    if args.single_run:
+        control['single_run'] = True
 
-DUT_SN_QUEUE = Queue()
-MESSAGE_QUEUE = Queue()
-PROGRESS_QUEUE = Queue()
-LISTENER_ARGS = {'database': None, 'download_path': None}
+    if args.report_off:
+        control['report_off'] = True
 
-if hasattr(COMMON_DEFINITIONS, 'listener_args'):
-        COMMON_DEFINITIONS.listener_args(LISTENER_ARGS)
+    if args.instrument_args:
+        control['instrument_args'] = args.instrument_args
 
-RUNNER_THREAD = threading.Thread(
-    target=runner.run_test_runner,
-    args=(CONTROL, MESSAGE_QUEUE, PROGRESS_QUEUE, DUT_SN_QUEUE, LISTENER_ARGS),
-    name='test_runner_thread',
-)
-RUNNER_THREAD.daemon = True
-RUNNER_THREAD.start()
+    if args.extension_log_path:
+        control['extension_log_path'] = args.extension_log_path
 
+    dut_sn_queue = Queue()
+    message_queue = Queue()
+    progress_queue = Queue()
+    listener_args = {'database': None, 'download_path': None}
 
-class MessageHandler:
-    def __init__(self, message_queue, message_handler):
-        while True:
-            msg = message_queue.get()
-            for handler in message_handler:
-                handler(msg)
+    if hasattr(common_definitions, 'listener_args'):
+        common_definitions.listener_args(listener_args)
 
+    runner_thread = threading.Thread(
+        target=runner.run_test_runner,
+        args=(control, message_queue, progress_queue, dut_sn_queue, listener_args),
+        name='test_runner_thread',
+    )
+    runner_thread.daemon = True
+    runner_thread.start()
 
-MESSAGE_HANDLER = []
+    message_handler = []
 
-# If you want to also print message, add print handler like this:
-# MESSAGE_HANDLER = [print]
+    # If you want to also print message, add print handler like this:
+    # message_handler = [print]
 
-MESSAGE_THREAD = threading.Thread(
-    target=MessageHandler, args=(MESSAGE_QUEUE, MESSAGE_HANDLER), name='message_thread'
-)
+    message_thread = threading.Thread(
+        target=MessageHandler, args=(message_queue, message_handler), name='message_thread'
+    )
 
-PROGRESS_HANDLER = []
+    progress_handler = []
 
-# If you want to also print message, add print handler like this:
-# PROGRESS_HANDLER = [print]
+    # If you want to also print message, add print handler like this:
+    # progress_handler = [print]
 
+    progress_thread = threading.Thread(
+        target=MessageHandler, args=(progress_queue, progress_handler), name='progress_thread'
+    )
 
-PROGRESS_THREAD = threading.Thread(
-    target=MessageHandler, args=(PROGRESS_QUEUE, PROGRESS_HANDLER), name='progress_thread'
-)
+    progress_thread.daemon = True
+    message_thread.daemon = True
 
-PROGRESS_THREAD.daemon = True
-MESSAGE_THREAD.daemon = True
+    progress_thread.start()
+    message_thread.start()
 
-PROGRESS_THREAD.start()
-MESSAGE_THREAD.start()
+    if args.listener:
+        port = args.port or PORT
+        if not args.no_browser:
+            import webbrowser
 
-if ARGS.listener:
-    if ARGS.port:
-        PORT = ARGS.port
-    if not ARGS.no_browser:
-        import webbrowser
+            webbrowser.open("http://localhost:" + str(port))
 
-        webbrowser.open("http://localhost:" + str(PORT))
+        listener.create_listener(
+            port,
+            control,
+            message_handler,
+            progress_handler,
+            common_definitions,
+            dut_sn_queue,
+            listener_args,
+        )
+        tornado.ioloop.IOLoop.current().start()
 
-    listener.create_listener(
-        PORT,
-        CONTROL,
-        MESSAGE_HANDLER,
-        PROGRESS_HANDLER,
-        COMMON_DEFINITIONS,
-        DUT_SN_QUEUE,
-        LISTENER_ARGS,
-    )
-    tornado.ioloop.IOLoop.current().start()
+    runner_thread.join()
 
-# MESSAGE_HANDLER = print
 
-RUNNER_THREAD.join()
+# Process pool workers import this module, so the station is run only as the main script
+if __name__ == '__main__':
+    main()
@@ -10,6 +10,7 @@ import tornado.web
 import tornado.websocket
 from listener.logs_web_socket import LogsWebSocketHandler
 from listener.auth import authenticate, get_cookie_secret
+from test_runner import measurements, progress_reporter
 
 RESP_CONTENT_TYPE = 'application/vnd.siren+json; charset=UTF-8'
 
@@ -183,11 +184,13 @@ class DutsHandler(IrisRequestHandler):
     def handle_get(self, host, user, *args):
         """Returns running test handlers"""
 
-        duts = self.test_control['progress']['duts']
-        for dut in duts:
-            duts[dut].pop('dut_class', None)
+        # Progress is shared with the websocket clients, so it is not modified here
+        duts = {
+            name: {key: value for key, value in dut.items() if key != 'dut_class'}
+            for name, dut in self.test_control['progress']['duts'].items()
+        }
 
-        return json.dumps(duts, default=str)
+        return json.dumps(duts, default=measurements.json_default)
 
     def handle_post(self, json_args, host, user, *args):  # pylint: disable=W0613
         """Sets dut types and serial numbers"""
@@ -242,7 +245,8 @@ class ProgressHandler(IrisRequestHandler):
     def handle_get(self, host, user, *args):
         """Returns current progress as json"""
 
-        return json.dumps({'progress': self.test_control['progress']}, default=str)
+        # Published progress is not changed, its JSON is serialised once for all clients
+        return f'{{"progress": {self.test_control["progress_message"].json}}}'
 
 class ReportPathsHandler(IrisRequestHandler):
     """Handles calls to /api/report_paths"""
@@ -396,6 +400,197 @@ class MessageWebsocketHandler(tornado.websocket.WebSocketHandler):
         return True
 
 
+def _names(names):
+    """Returns frozenset of comma separated string or list of names, or None for all"""
+    if names is None:
+        return None
+    if isinstance(names, str):
+        names = names.split(',')
+    return frozenset(str(name).strip() for name in names if str(name).strip())
+
+
+class ProgressWebsocketHandler(MessageWebsocketHandler):
+    """Sends progress to the client
+
+    By default every message is the full progress. With protocol=delta query argument
+    the client gets snapshot of the progress when connected:
+
+        {"type": "snapshot", "version": 12, "progress": {...}}
+
+    and after that JSON patch (RFC 6902) to the previous version:
+
+        {"type": "delta", "version": 13, "base_version": 12, "patch": [...]}
+
+    Versions skipped because of max_rate are not sent. The next delta is then from the
+    version the client got last, given as base_version. Snapshot is sent when the client
+    connects, subscribes or requests it by sending {"type": "resync"}.
+
+    Client can subscribe only to some test positions and fields of the progress and
+    limit the amount of messages per second with query arguments, e.g.
+    ?positions=1,2&fields=general_state,duts&max_rate=2, or by sending:
+
+        {"type": "subscribe", "positions": ["1"], "fields": ["general_state"], "max_rate": 2}
+
+    Subscribed client and client of the delta protocol get a message only when their
+    part of the progress has changed.
+    """
+
+    def initialize(self, message_handlers=None, test_control=None, **kwargs):
+        """Initialize is called when tornado.web.Application is created"""
+        super().initialize(**kwargs)
+        self.message_handlers = message_handlers  # pylint: disable=W0201
+        self.test_control = test_control  # pylint: disable=W0201
+        self.delta = False  # pylint: disable=W0201
+        self.version = None  # pylint: disable=W0201
+        # Progress sent to the client last time, as selected by the subscription
+        self.sent = None  # pylint: disable=W0201
+        self.positions = None  # pylint: disable=W0201
+        self.fields = None  # pylint: disable=W0201
+        self.min_interval_s = 0  # pylint: disable=W0201
+        self.last_send = 0  # pylint: disable=W0201
+        # Latest message waiting for max_rate
+        self.pending = None  # pylint: disable=W0201
+
+    def open(self, *args: str, **kwargs: str):
+        """Registers to progress messages and sends the current snapshot on delta protocol"""
+
+        self.delta = self.get_argument('protocol', 'full') == 'delta'  # pylint: disable=W0201
+        self.subscribe(
+            self.get_argument('positions', None),
+            self.get_argument('fields', None),
+            self.get_argument('max_rate', None),
+        )
+        self.message_handlers.append(self.websocket_signal_handler)
+
+        if self.delta:
+            self.send_current()
+
+    def on_close(self):
+        """Unregisters from progress messages"""
+
+        try:
+            self.message_handlers.remove(self.websocket_signal_handler)
+        except ValueError:
+            pass
+
+    def subscribe(self, positions=None, fields=None, max_rate=None):
+        """Sets test positions and fields sent to the client and max messages per second"""
+
+        self.positions = _names(positions)  # pylint: disable=W0201
+        self.fields = _names(fields)  # pylint: disable=W0201
+        self.min_interval_s = 0  # pylint: disable=W0201
+
+        if max_rate:
+            try:
+                self.min_interval_s = max(1 / float(max_rate), 0)  # pylint: disable=W0201
+            except (TypeError, ValueError, ZeroDivisionError):
+                self.logger.warning("Invalid max_rate of progress subscription: %s", max_rate)
+
+    @property
+    def skip_unchanged(self):
+        """True if the client is not sent a message when its progress has not changed"""
+        return self.delta or self.positions is not None or self.fields is not None
+
+    def websocket_signal_handler(self, message):
+        """Called by progress thread for each published progress"""
+
+        self.loop.call_soon_threadsafe(self.send_progress, message)
+
+    def send_progress(self, message):
+        """Sends the progress message now or, with max_rate, when the next message is due"""
+
+        wait_s = self.last_send + self.min_interval_s - time.monotonic()
+        if wait_s > 0:
+            if self.pending is None:
+                self.loop.call_later(wait_s, self.send_pending)
+            self.pending = message  # pylint: disable=W0201
+            return
+
+        self.send_selected(message)
+
+    def send_pending(self):
+        message, self.pending = self.pending, None  # pylint: disable=W0201
+        if message is not None:
+            self.send_selected(message)
+
+    def send_selected(self, message):
+        """Sends the subscribed part of the progress as full progress, delta or snapshot"""
+
+        if self.version is not None and message.version <= self.version:
+            return
+
+        selected = message.select(self.positions, self.fields)
+
+        if self.sent is None:
+            msg = selected.snapshot_json if self.delta else selected.json
+        elif not self.skip_unchanged:
+            # Full progress on every message, no need to compare
+            msg = selected.json
+        else:
+            # Versions between may not have been sent because of max_rate, so the
+            # delta is from the version sent last
+            from_base = selected.base_version == self.version
+            if from_base:
+                patch = selected.patch
+            else:
+                patch = progress_reporter.diff(self.sent, selected.progress)
+
+            if not patch:
+                msg = None
+            elif not self.delta:
+                msg = selected.json
+            elif from_base:
+                msg = selected.delta_json
+            else:
+                msg = json.dumps(
+                    {
+                        'type': 'delta',
+                        'version': selected.version,
+                        'base_version': self.version,
+                        'patch': patch,
+                    }
+                )
+
+        if msg is not None:
+            self.write_progress(msg)
+            self.last_send = time.monotonic()  # pylint: disable=W0201
+
+        self.version = selected.version  # pylint: disable=W0201
+        self.sent = selected.progress  # pylint: disable=W0201
+
+    def send_current(self):
+        """Sends the latest published progress, as snapshot on delta protocol"""
+
+        self.version = None  # pylint: disable=W0201
+        self.sent = None  # pylint: disable=W0201
+        message = self.test_control.get('progress_message')
+        if message is not None:
+            self.send_selected(message)
+
+    def write_progress(self, msg):
+        try:
+            self.write_message(msg)
+        except tornado.websocket.WebSocketClosedError:
+            pass
+
+    def on_message(self, message):
+        """Handles resync and subscribe requests of the client"""
+
+        try:
+            request = json.loads(message)
+        except ValueError:
+            self.logger.warning("Invalid progress websocket message: %s", message)
+            return
+
+        if not isinstance(request, dict):
+            self.logger.warning("Invalid progress websocket message: %s", message)
+        elif request.get('type') == 'resync':
+            self.send_current()
+        elif request.get('type') == 'subscribe':
+            self.subscribe(request.get('positions'), request.get('fields'), request.get('max_rate'))
+            self.send_current()
+
+
 class LogsHandler(IrisRequestHandler):
     _filename = ''
 
@@ -491,8 +686,8 @@ def create_listener(
             ),
             (
                 r'/api/websocket/progress',
-                MessageWebsocketHandler,
-                {'message_handlers': progress_handlers},
+                ProgressWebsocketHandler,
+                {'message_handlers': progress_handlers, 'test_control': test_control},
             ),
             (
                 r'/api/websocket/dut_sn',
@@ -31,6 +31,49 @@ PARALLEL_SYNC_PER_TEST_CASE = 'MID'
 # Mid test case thread syncing timeout is defined in test cases
 PARALLEL_SYNC_COMPLETED_TEST_TIMEOUT = 10.0
 
+# Default timeout of test cases in seconds, overridden by TIMEOUT of a test case class.
+# Applies to the test and separately to its post_test.
+# Timed out or aborted test case is marked as error and its test position is freed right away,
+# even if the test case is stuck e.g. on an instrument call. None for no timeout.
+TEST_CASE_TIMEOUT = None
+
+# Each test position gets its DUT, tests, reports and releases it independently,
+# without waiting for the other test positions. Loop execution and Gage R&R
+# are not supported in this mode.
+INDEPENDENT_TEST_POSITIONS = False
+
+# Amount of long-lived threads running test cases along dependency graph (DEPENDS or
+# REQUIRED_INSTRUMENTS) and pre-tests on background. Shared by all test positions.
+# Each test position has also its own worker for test cases.
+BACKGROUND_WORKERS = 2 * len(TEST_POSITIONS)
+PRE_TEST_WORKERS = 2 * len(TEST_POSITIONS)
+
+# Maximum amount of post-tests in progress per test position and per station.
+# When full, the test position waits before starting its next post-test.
+POST_PROCESSING_PER_POSITION = 2
+POST_PROCESSING_PER_STATION = 2 * len(TEST_POSITIONS)
+
+# Progress updates within PROGRESS_WINDOW_S seconds are sent to UI as one message, and
+# at most PROGRESS_MAX_RATE messages are sent per second. Changes of the state of the
+# test run, e.g. to finalize or abort, are sent right away. With 0 and None every update is sent.
+PROGRESS_WINDOW_S = 0.05
+PROGRESS_MAX_RATE = 20
+
+# Amount of processes for CPU heavy work offloaded by test cases with self.offload().
+# With 0 offloaded work is run on the thread of the test case.
+PROCESS_POOL_WORKERS = 0
+
+# Reorder test cases so that the test cases most likely to fail per second of test time
+# are run first. Failure history is read from test reports and updated after each DUT.
+# Useful with FlowControl.STOP_ON_FAIL. Test cases listed in PINNED of the sequence keep
+# their place and DEPENDS of the sequence is respected.
+FAIL_FAST_ORDERING = False
+
+# Finalize test and create report on background while the next test run checks instruments,
+# updates statistics, loads test definitions and waits for serial numbers. Next test run waits
+# for finalize_test of the previous one before prepare_test. Not supported with LOOP_EXECUTION.
+PIPELINED_TEST_RUNS = False
+
 LOOP_EXECUTION = True
 
 LOOP_TIME_IN_SECONDS = 30 * 60
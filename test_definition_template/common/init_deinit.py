@@ -58,7 +58,14 @@ def identify_DUTs(dut_sn, instruments, logger):
 def update_parameters(common_definitions, logger):
     pass
 
+def get_test_case_params_token(common_definitions, sequence_name, logger):
+    # Return token, e.g. version of the parameters on database, to reuse merged limits
+    # while the token and the source files stay the same. With None the sequence is
+    # reloaded and limits merged on every test run.
+    return 'template'
+
 def update_test_case_params(common_definitions, sequence_name, test_definitions, logger):
+    # Called once after the sequence is (re)loaded and limits merged, see get_test_case_params_token
     pass
 
 def shutdown(instruments, logger):
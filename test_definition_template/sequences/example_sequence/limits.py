@@ -16,6 +16,9 @@ LIMITS["Second"] = {
 }
 
 LIMITS["First"] = {
+    # Declarative limits (min, max, equals, in) are faster to evaluate than lambdas.
+    # min and max are inclusive: {"min": 90, "max": 100} is 90 <= measurement <= 100.
+    # Exclusive limits like this one are written as lambdas.
     "Measurement1": {"limit": lambda measurement: 90 < measurement < 100},
     "Measurement2": {"limit": lambda measurement: measurement == [123, 456, 1, 3]},
 }
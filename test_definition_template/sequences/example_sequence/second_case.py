@@ -2,6 +2,14 @@ from test_runner.test_case import TestCase
 
 
 class Second(TestCase):
+    # Instruments used by this test case. Other test positions can use other
+    # instruments at the same time. EXCLUSIVE instruments are used by one test case at a time.
+    # InstrumentAccess is imported from test_runner.test_case.
+    # REQUIRED_INSTRUMENTS = {'gaia': InstrumentAccess.SHARED}
+
+    # Seconds after which the test case is cancelled and marked as error. See TEST_CASE_TIMEOUT.
+    # TIMEOUT = 30
+
     def pre_test(self):
         pass
 
@@ -3,3 +3,9 @@ When pool of test cases is used, PARAMETERS can be used to store
 DUT type specific parameters"""
 
 PARAMETERS = {"param1": "this is param1", "param2": "and this is param2"}
+
+# Optional sweeps. Test case is run for each point, or its test_batch(points) for all points.
+# Dictionary of lists is swept over all combinations, list of dictionaries point by point.
+# Measurements are stored per point, e.g. "Measurement1[frequency=1000000.0]", and evaluated
+# against the limits of "Measurement1".
+# PARAMETERS["sweeps"] = {"First": {"frequency": [1e6, 2e6, 3e6]}}
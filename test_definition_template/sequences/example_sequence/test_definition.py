@@ -8,5 +8,12 @@ TESTS = ["Second_pre", "First", "Second", "Third", "Fourth", "PoolTestCase"]
 
 SKIP = ["Third", "Fourth"]
 
+# Optional dependencies between test cases. When defined, test cases of a DUT are run
+# as soon as the test cases they depend on are done, independent test cases at the same time.
+# DEPENDS = {"Second": ["First"]}
+
+# Optional test cases which keep their place when FAIL_FAST_ORDERING is used
+# PINNED = ["First"]
+
 # Amount of DUTs to be tested for specific sequence. If not defined, defaults to 1.
 DUTS = 1
@@ -0,0 +1,395 @@
+"""Cooperative cancellation of test cases and watchdog for their timeouts"""
+import collections.abc
+import heapq
+import itertools
+import logging
+import threading
+import time
+import weakref
+
+from test_runner import exceptions
+
+# Interval of checking abort of the test run when no timeout is due
+ABORT_POLL_S = 0.1
+
+
+class CancellationToken:
+    """Cancellation state of one test case run
+
+    Checked by the test case on sync_threads, new_measurement and instrument calls.
+    Callbacks registered with on_cancel are called once when the token is cancelled,
+    e.g. to abort barriers or cancel coroutines the test case is waiting for.
+    """
+
+    def __init__(self):
+        self.reason = None
+        self._cancelled = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def cancel(self, reason):
+        """Cancels the token. Returns False if it was already cancelled."""
+        with self._lock:
+            if self._cancelled.is_set():
+                return False
+            self.reason = reason
+            self._cancelled.set()
+            callbacks, self._callbacks = self._callbacks, []
+
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:  # pylint: disable=broad-except
+                logging.getLogger('cancellation').exception("Cancellation callback failed")
+
+        return True
+
+    def on_cancel(self, callback):
+        """Calls callback when the token is cancelled, right away if it already is"""
+        with self._lock:
+            if not self._cancelled.is_set():
+                self._callbacks.append(callback)
+                return
+
+        callback()
+
+    def check(self):
+        """Raises TestCaseCancelled if the token is cancelled"""
+        if self._cancelled.is_set():
+            raise exceptions.TestCaseCancelled(self.reason)
+
+    def wait(self, timeout=None):
+        """Waits until the token is cancelled. Returns True if it was."""
+        return self._cancelled.wait(timeout)
+
+
+class CancellableBarrier:
+    """threading.Barrier which a cancelled party can leave
+
+    When a test case is cancelled, its party leaves the barrier with leave(token):
+    the other parties continue without it instead of getting BrokenBarrierError.
+    Parties pass their cancellation token to wait() so that a cancelled party
+    waiting on the barrier is released with BrokenBarrierError.
+    """
+
+    def __init__(self, parties):
+        self._parties = parties
+        self._condition = threading.Condition()
+        self._left = set()
+        self._broken = False
+        # Tokens of the waiting parties and the outcome of the current round of waiting
+        self._round = {'waiting': [], 'released': False, 'broken': False}
+
+    @property
+    def parties(self):
+        return self._parties
+
+    @property
+    def n_waiting(self):
+        return len(self._round['waiting'])
+
+    @property
+    def broken(self):
+        return self._broken
+
+    def wait(self, timeout=None, token=None):
+        """Waits until all parties are waiting. Returns index of the party, 0 to parties - 1."""
+        with self._condition:
+            if self._broken or token in self._left:
+                raise threading.BrokenBarrierError
+
+            current = self._round
+            index = len(current['waiting'])
+            current['waiting'].append(token)
+
+            if len(current['waiting']) >= self._parties:
+                self._next_round(released=True)
+                return index
+
+            done = self._condition.wait_for(
+                lambda: current['released'] or current['broken'] or token in self._left,
+                timeout,
+            )
+
+            if current['released']:
+                return index
+
+            if not done:
+                # Timeout breaks the barrier for all parties, as in threading.Barrier
+                self._broken = True
+                self._next_round(released=False)
+            raise threading.BrokenBarrierError
+
+    def leave(self, token):
+        """Removes the party of the cancelled token. Other parties continue without it."""
+        with self._condition:
+            if token in self._left:
+                return
+            self._left.add(token)
+            self._parties -= 1
+
+            waiting = self._round['waiting']
+            if token in waiting:
+                waiting.remove(token)
+
+            if waiting and len(waiting) >= self._parties:
+                self._next_round(released=True)
+            else:
+                self._condition.notify_all()
+
+    def reset(self):
+        """Makes the barrier usable again. Waiting parties get BrokenBarrierError."""
+        with self._condition:
+            if self._round['waiting']:
+                self._next_round(released=False)
+            self._broken = False
+
+    def abort(self):
+        """Breaks the barrier for all parties"""
+        with self._condition:
+            self._broken = True
+            self._next_round(released=False)
+
+    def _next_round(self, released):
+        self._round['released'] = released
+        self._round['broken'] = not released
+        self._round = {'waiting': [], 'released': False, 'broken': False}
+        self._condition.notify_all()
+
+
+# Special methods forwarded to the instrument, if its type has them. Methods which
+# use the instrument check the cancellation token first.
+CHECKED_SPECIAL_METHODS = (
+    '__call__',
+    '__enter__',
+    '__getitem__',
+    '__setitem__',
+    '__delitem__',
+    '__iter__',
+    '__contains__',
+)
+UNCHECKED_SPECIAL_METHODS = (
+    '__exit__',
+    '__len__',
+    '__bool__',
+    '__eq__',
+    '__ne__',
+    '__hash__',
+    '__str__',
+)
+
+# Instruments of these types are plain data and returned as they are
+UNWRAPPED_TYPES = (dict, list, tuple, set, frozenset, str, bytes, int, float, bool, type(None))
+
+
+class InstrumentProxy:
+    """Instrument whose attributes and calls check the cancellation token first
+
+    isinstance and the special methods of the instrument, e.g. with statement and
+    subscription, work as on the instrument itself.
+    """
+
+    def __init__(self, instrument, token):
+        object.__setattr__(self, '_instrument', instrument)
+        object.__setattr__(self, '_token', token)
+
+    @property
+    def __class__(self):
+        return type(self._instrument)
+
+    def __getattr__(self, name):
+        self._token.check()
+        attribute = getattr(self._instrument, name)
+
+        # Methods and callable sub-objects, e.g. clients of the instrument, are proxies
+        # too, so that calling them checks the token and their attributes stay reachable
+        if not callable(attribute) or isinstance(attribute, type):
+            return attribute
+
+        return wrap_instrument(attribute, self._token)
+
+    def __setattr__(self, name, value):
+        setattr(self._instrument, name, value)
+
+    def __repr__(self):
+        return repr(self._instrument)
+
+
+def _forward(name, checked):
+    def method(self, *args, **kwargs):
+        if checked:
+            self._token.check()
+        # Bound as Python binds special methods: e.g. magic methods of MagicMock are
+        # mocks in the class without __get__ and are called without the instance
+        function = getattr(type(self._instrument), name)
+        get = getattr(type(function), '__get__', None)
+        if get is not None:
+            function = get(function, self._instrument, type(self._instrument))
+        return function(*args, **kwargs)
+
+    method.__name__ = name
+    return method
+
+
+# Weak keys, because e.g. each MagicMock instrument and its attributes have own classes
+_PROXY_CLASSES = weakref.WeakKeyDictionary()
+_PROXY_CLASSES_LOCK = threading.Lock()
+
+
+def get_proxy_class(instrument_class):
+    """Returns InstrumentProxy class forwarding the special methods of instrument_class"""
+    with _PROXY_CLASSES_LOCK:
+        if instrument_class not in _PROXY_CLASSES:
+            methods = {}
+            for names, checked in (
+                (CHECKED_SPECIAL_METHODS, True),
+                (UNCHECKED_SPECIAL_METHODS, False),
+            ):
+                for name in names:
+                    if not hasattr(instrument_class, name):
+                        continue
+                    if getattr(instrument_class, name) is None:
+                        # E.g. __hash__ of unhashable instrument
+                        methods[name] = None
+                    else:
+                        methods[name] = _forward(name, checked)
+
+            _PROXY_CLASSES[instrument_class] = type(
+                f'{instrument_class.__name__}Proxy', (InstrumentProxy,), methods
+            )
+
+        return _PROXY_CLASSES[instrument_class]
+
+
+def wrap_instrument(instrument, token):
+    """Returns instrument checking the cancellation token, plain data as it is"""
+    if isinstance(instrument, UNWRAPPED_TYPES):
+        return instrument
+
+    return get_proxy_class(type(instrument))(instrument, token)
+
+
+class Instruments(dict):
+    """Instruments of a test case, returned as InstrumentProxy of its cancellation token
+
+    Instruments of common definitions are not changed.
+    """
+
+    def __init__(self, instruments, token):
+        super().__init__(instruments or {})
+        self.token = token
+
+    def __getitem__(self, name):
+        return wrap_instrument(super().__getitem__(name), self.token)
+
+    def get(self, name, default=None):
+        if name in self:
+            return self[name]
+        return default
+
+    def values(self):
+        return collections.abc.ValuesView(self)
+
+    def items(self):
+        return collections.abc.ItemsView(self)
+
+
+class Watchdog:
+    """One thread cancelling watched test cases on timeout or abort of the test run"""
+
+    def __init__(self):
+        self.logger = logging.getLogger('watchdog')
+        self._deadlines = []
+        self._watches = {}
+        self._counter = itertools.count()
+        self._changed = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name='watchdog')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def watch(self, token, timeout, on_cancel, is_aborted=None):
+        """Cancels token and calls on_cancel(reason) after timeout seconds or when
+        is_aborted() returns True. Returns handle for unwatch."""
+        handle = next(self._counter)
+        deadline = time.monotonic() + timeout if timeout else None
+
+        with self._changed:
+            self._watches[handle] = (token, on_cancel, is_aborted, timeout)
+            if deadline is not None:
+                heapq.heappush(self._deadlines, (deadline, handle))
+            self._changed.notify()
+
+        return handle
+
+    def unwatch(self, handle):
+        """Stops watching. Deadline is removed lazily from the heap."""
+        with self._changed:
+            self._watches.pop(handle, None)
+
+    def _fire(self, handle, reason):
+        with self._changed:
+            watch = self._watches.pop(handle, None)
+
+        if watch is None:
+            return
+
+        token, on_cancel, _, _ = watch
+        if token.cancel(reason):
+            self.logger.warning(reason)
+            try:
+                on_cancel(reason)
+            except Exception:  # pylint: disable=broad-except
+                self.logger.exception("Handling cancelled test case failed")
+
+    def _next_timeout(self):
+        timeout = None
+        if any(is_aborted is not None for _, _, is_aborted, _ in self._watches.values()):
+            timeout = ABORT_POLL_S
+        if self._deadlines:
+            until_deadline = max(self._deadlines[0][0] - time.monotonic(), 0)
+            timeout = until_deadline if timeout is None else min(timeout, until_deadline)
+        return timeout
+
+    def _run(self):
+        while True:
+            with self._changed:
+                now = time.monotonic()
+                expired = []
+                while self._deadlines and self._deadlines[0][0] <= now:
+                    _, handle = heapq.heappop(self._deadlines)
+                    if handle in self._watches:
+                        expired.append((handle, self._watches[handle][3]))
+
+                polled = [
+                    (handle, is_aborted)
+                    for handle, (_, _, is_aborted, _) in self._watches.items()
+                    if is_aborted is not None
+                ]
+
+            for handle, timeout in expired:
+                self._fire(handle, f"Timeout after {timeout} s")
+
+            for handle, is_aborted in polled:
+                if is_aborted():
+                    self._fire(handle, "Test aborted")
+
+            with self._changed:
+                self._changed.wait(self._next_timeout())
+
+
+_WATCHDOG = None
+_WATCHDOG_LOCK = threading.Lock()
+
+
+def get_watchdog():
+    """Returns the watchdog shared by all test runs. Started when first needed."""
+    global _WATCHDOG  # pylint: disable=global-statement
+
+    with _WATCHDOG_LOCK:
+        if _WATCHDOG is None:
+            _WATCHDOG = Watchdog()
+        return _WATCHDOG
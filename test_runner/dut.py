@@ -1,4 +1,29 @@
-class Dut:
+import copy
+import threading
+
+from test_runner.helpers import Versioned
+
+
+def reduce_result(current, result):
+    """Returns result after adding result to current result
+
+    Error stays error, fail changes only to error and other results ('testing', 'pass')
+    change to any result.
+    """
+    if current == 'error':
+        return current
+    if current == 'fail' and result != 'error':
+        return current
+    return result
+
+
+class Dut(Versioned):
+    """DUT and its test results
+
+    Code changing test_cases or the lists in place calls touch(), otherwise progress
+    reporter keeps sending the progress serialised before the change.
+    """
+
     def __init__(self, serial_number, test_position, hw_id=None, order=None, additional_info=None):
         self.test_position = test_position
         self.serial_number = serial_number
@@ -9,6 +34,67 @@ class Dut:
         self.pass_fail_result = 'testing'
         self.failed_steps = []
         self.error_steps = []
+        # Results are added from the threads of pre-tests, tests and post-tests
+        self._result_lock = threading.Lock()
+
+    def add_result(self, test_case_name, result):
+        """Adds result of a test case to the results of the test case and the DUT
+
+        Result only moves towards error (error > fail > pass), independent of the
+        order in which the threads add their results.
+        """
+        with self._result_lock:
+            test_case = self.test_cases[test_case_name]
+            test_case['result'] = reduce_result(test_case['result'], result)
+            self.pass_fail_result = reduce_result(self.pass_fail_result, result)
+
+            if result == 'fail' and test_case_name not in self.failed_steps:
+                self.failed_steps.append(test_case_name)
+
+            if result == 'error' and test_case_name not in self.error_steps:
+                self.error_steps.append(test_case_name)
+
+            self.touch()
+
+    def __deepcopy__(self, memo):
+        """Copies the DUT and its results, e.g. to report them while the DUT is changed"""
+        with self._result_lock:
+            dut = copy.copy(self)
+            memo[id(self)] = dut
+            for name, value in vars(self).items():
+                if name != '_result_lock':
+                    object.__setattr__(dut, name, copy.deepcopy(value, memo))
+
+        object.__setattr__(dut, '_result_lock', threading.Lock())
+        return dut
+
+    def add_dut_result(self, result):
+        """Adds result to the result of the DUT only"""
+        with self._result_lock:
+            self.pass_fail_result = reduce_result(self.pass_fail_result, result)
+
+    def prepare_retest(self, test_case_names):
+        """Clears results of the given test cases before they are tested again
+
+        Result of the DUT is evaluated again from the results of the other test cases.
+        """
+        with self._result_lock:
+            self.failed_steps = [s for s in self.failed_steps if s not in test_case_names]
+            self.error_steps = [s for s in self.error_steps if s not in test_case_names]
+
+            results = [
+                case['result']
+                for name, case in self.test_cases.items()
+                if name not in test_case_names
+            ]
+            if 'error' in results:
+                self.pass_fail_result = 'error'
+            elif 'fail' in results:
+                self.pass_fail_result = 'fail'
+            elif 'pass' in results:
+                self.pass_fail_result = 'pass'
+            else:
+                self.pass_fail_result = 'testing'
 
     def get_dut_dict(self):
 
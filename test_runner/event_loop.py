@@ -0,0 +1,89 @@
+"""Dedicated asyncio event loop for asynchronous test cases"""
+import asyncio
+import threading
+
+
+class EventLoopThread:
+    """Runs asyncio event loop forever on its own thread"""
+
+    def __init__(self, name='test_case_event_loop'):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name=name)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def run(self, coroutine):
+        """Runs coroutine on the loop and waits for its result on the calling thread"""
+        return self.submit(coroutine).result()
+
+    def submit(self, coroutine):
+        """Schedules coroutine on the loop. Returns concurrent.futures.Future."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    def stop(self):
+        """Stops the loop and waits for the thread to finish"""
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.loop.close()
+
+
+_EVENT_LOOP = None
+_EVENT_LOOP_LOCK = threading.Lock()
+
+
+def get_event_loop():
+    """Returns the event loop shared by all asynchronous test cases. Started when first needed."""
+    global _EVENT_LOOP  # pylint: disable=global-statement
+
+    with _EVENT_LOOP_LOCK:
+        if _EVENT_LOOP is None:
+            _EVENT_LOOP = EventLoopThread()
+        return _EVENT_LOOP
+
+
+def stop_event_loop():
+    """Stops the shared event loop if it was started"""
+    global _EVENT_LOOP  # pylint: disable=global-statement
+
+    with _EVENT_LOOP_LOCK:
+        if _EVENT_LOOP is not None:
+            _EVENT_LOOP.stop()
+            _EVENT_LOOP = None
+
+
+def _set_result(future, result):
+    if not future.done():
+        future.set_result(result)
+
+
+def _set_exception(future, err):
+    if not future.done():
+        future.set_exception(err)
+
+
+async def run_in_thread(function, *args):
+    """Runs blocking function on its own thread without blocking the event loop
+
+    A new thread is used instead of the default executor, whose size is limited,
+    so that e.g. barrier waits of all test positions can be pending at the same time.
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def _run():
+        try:
+            result = function(*args)
+        except BaseException as err:  # pylint: disable=broad-except
+            loop.call_soon_threadsafe(_set_exception, future, err)
+        else:
+            loop.call_soon_threadsafe(_set_result, future, result)
+
+    thread = threading.Thread(target=_run, name='event_loop_blocking_call')
+    thread.daemon = True
+    thread.start()
+
+    return await future
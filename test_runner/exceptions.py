@@ -23,3 +23,15 @@ class TestCaseNotFound(IrisError):
     """Raised when test case is not found"""
 
     pass
+
+
+class DependencyError(IrisError):
+    """Raised when test case dependencies (DEPENDS) are invalid"""
+
+    pass
+
+
+class TestCaseCancelled(IrisError):
+    """Raised in test case when it is cancelled on timeout or abort"""
+
+    pass
@@ -0,0 +1,428 @@
+"""Long-lived worker threads for running test cases and background tasks"""
+import importlib
+import importlib.util
+import logging
+import multiprocessing
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError, ProcessPoolExecutor, wait
+
+
+class WorkerPool:
+    """Fixed amount of long-lived threads consuming a shared task queue"""
+
+    def __init__(self, name, workers=1):
+        self.name = name
+        self.workers = workers
+        self.logger = logging.getLogger('executor')
+        self._tasks = queue.Queue()
+        self._lock = threading.Lock()
+        self._running_since = {}
+        self._running_futures = {}
+        self._abandoned = set()
+        self._busy_time = 0.0
+        self._completed = 0
+        self._created_monotonic = time.monotonic()
+        self._threads = []
+        self._thread_count = 0
+
+        for _ in range(workers):
+            self._start_thread()
+
+    def _start_thread(self):
+        thread = threading.Thread(target=self._work, name=f'{self.name}_{self._thread_count}')
+        thread.daemon = True
+        thread.start()
+        self._thread_count += 1
+        self._threads.append(thread)
+
+    def submit(self, function, *args, **kwargs):
+        """Queues function to be run by the pool. Returns concurrent.futures.Future."""
+        future = Future()
+        self._tasks.put((future, function, args, kwargs))
+        return future
+
+    def _work(self):
+        while True:
+            task = self._tasks.get()
+            if task is None:
+                break
+
+            future, function, args, kwargs = task
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            start = time.monotonic()
+            ident = threading.get_ident()
+            with self._lock:
+                self._running_since[ident] = start
+                self._running_futures[ident] = future
+
+            try:
+                result = function(*args, **kwargs)
+            except BaseException as err:  # pylint: disable=broad-except
+                self._set_future(future, exception=err)
+            else:
+                self._set_future(future, result=result)
+            finally:
+                with self._lock:
+                    abandoned = ident in self._abandoned
+                    self._abandoned.discard(ident)
+                    if not abandoned:
+                        del self._running_since[ident]
+                        del self._running_futures[ident]
+                        self._busy_time += time.monotonic() - start
+                        self._completed += 1
+
+            if abandoned:
+                # Replacement thread is already consuming the queue
+                break
+
+    @staticmethod
+    def _set_future(future, result=None, exception=None):
+        # Future of an abandoned task is already done
+        try:
+            if exception is not None:
+                future.set_exception(exception)
+            else:
+                future.set_result(result)
+        except InvalidStateError:
+            pass
+
+    def abandon(self, thread_ident):
+        """Gives up the task running on the thread, e.g. stuck on a hung instrument call
+
+        The future of the task is done with None and a new thread replaces the
+        abandoned one, which exits when the task returns. Returns False if the
+        thread doesn't belong to the pool.
+        """
+        with self._lock:
+            if thread_ident not in self._running_futures:
+                return False
+
+            future = self._running_futures.pop(thread_ident)
+            self._busy_time += time.monotonic() - self._running_since.pop(thread_ident)
+            self._completed += 1
+            self._abandoned.add(thread_ident)
+            self._threads = [t for t in self._threads if t.ident != thread_ident]
+            self._start_thread()
+
+        self.logger.warning("Abandoned task on worker thread %s of %s", thread_ident, self.name)
+        self._set_future(future)
+        return True
+
+    def statistics(self):
+        """Returns queue depth and utilisation of the pool"""
+        now = time.monotonic()
+        with self._lock:
+            busy = len(self._running_since)
+            busy_time = self._busy_time + sum(now - start for start in self._running_since.values())
+            completed = self._completed
+
+        capacity = (now - self._created_monotonic) * self.workers
+
+        return {
+            'workers': self.workers,
+            'busy': busy,
+            'queue_depth': self._tasks.qsize(),
+            'completed': completed,
+            'utilisation': round(busy_time / capacity, 3) if capacity > 0 else 0.0,
+        }
+
+    def shutdown(self, wait_tasks=True):
+        """Stops the worker threads after queued tasks are done"""
+        for _ in self._threads:
+            self._tasks.put(None)
+
+        if wait_tasks:
+            for thread in self._threads:
+                thread.join()
+
+
+class LatencyStatistics:
+    """Count, mean and max of latencies of one stage"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, latency):
+        with self._lock:
+            self.count += 1
+            self.total += latency
+            self.max = max(self.max, latency)
+
+    def statistics(self):
+        with self._lock:
+            return {
+                'count': self.count,
+                'mean_s': round(self.total / self.count, 3) if self.count else 0.0,
+                'max_s': round(self.max, 3),
+            }
+
+
+class PostProcessingStage:
+    """Bounded stage for post-tests
+
+    Limits the amount of post-tests in progress (queued or running) per test position
+    and per station. Submitting blocks when the limit is reached. Post-tests have their
+    own workers so that blocked producers on other pools can't starve them.
+    """
+
+    def __init__(self, per_position, per_station):
+        self.per_position = per_position
+        self.per_station = per_station
+        self.pool = WorkerPool('post_processing', per_station)
+        self.latency = {
+            'wait': LatencyStatistics(),
+            'queue': LatencyStatistics(),
+            'run': LatencyStatistics(),
+        }
+        self._station_slots = threading.BoundedSemaphore(per_station)
+        self._position_slots = {}
+        self._lock = threading.Lock()
+
+    def _get_position_slots(self, test_position_name):
+        with self._lock:
+            if test_position_name not in self._position_slots:
+                self._position_slots[test_position_name] = threading.BoundedSemaphore(
+                    self.per_position
+                )
+            return self._position_slots[test_position_name]
+
+    def submit(self, test_position_name, function, on_wait=None):
+        """Queues post-test. Calls on_wait before blocking if the stage is full."""
+        position_slots = self._get_position_slots(test_position_name)
+        start = time.monotonic()
+
+        if not position_slots.acquire(blocking=False):
+            if on_wait is not None:
+                on_wait()
+                on_wait = None
+            position_slots.acquire()
+
+        if not self._station_slots.acquire(blocking=False):
+            if on_wait is not None:
+                on_wait()
+            self._station_slots.acquire()
+
+        queued = time.monotonic()
+        self.latency['wait'].add(queued - start)
+
+        def _run():
+            started = time.monotonic()
+            self.latency['queue'].add(started - queued)
+            try:
+                return function()
+            finally:
+                self.latency['run'].add(time.monotonic() - started)
+                self._station_slots.release()
+                position_slots.release()
+
+        return self.pool.submit(_run)
+
+    def statistics(self):
+        """Returns limits, pool statistics and latencies of the stage"""
+        return {
+            'per_position': self.per_position,
+            'per_station': self.per_station,
+            'pool': self.pool.statistics(),
+            'latency': {stage: latency.statistics() for stage, latency in self.latency.items()},
+        }
+
+    def abandon(self, thread_ident):
+        return self.pool.abandon(thread_ident)
+
+    def shutdown(self):
+        self.pool.shutdown()
+
+
+class Executor:
+    """One long-lived worker per test position and shared pools for background tasks
+
+    Position workers run the test cases of their test position one at a time.
+    Background pool runs test cases run along dependency graph. Pre-tests and
+    finishing of pipelined test runs have their own pools, as tasks of the background
+    pool wait for them. Post-tests are run on a bounded post-processing stage.
+    """
+
+    def __init__(
+        self,
+        test_positions,
+        background_workers,
+        post_per_position,
+        post_per_station,
+        pre_test_workers=None,
+    ):
+        self.positions = {name: WorkerPool(f'position_{name}') for name in test_positions}
+        self.background = WorkerPool('background', background_workers)
+        self.pre_tests = WorkerPool('pre_test', pre_test_workers or background_workers)
+        # Test run waits for the previous one before prepare_test, so one is finished at a time
+        self.finishing = WorkerPool('finishing')
+        self.post_processing = PostProcessingStage(post_per_position, post_per_station)
+        self.pre_test_latency = {'queue': LatencyStatistics(), 'run': LatencyStatistics()}
+
+    def submit(self, test_position_name, function, *args, **kwargs):
+        """Runs function on the worker of the given test position"""
+        return self.positions[test_position_name].submit(function, *args, **kwargs)
+
+    def submit_background(self, function, *args, **kwargs):
+        """Runs function on the shared background pool"""
+        return self.background.submit(function, *args, **kwargs)
+
+    def submit_pre_test(self, function):
+        """Runs pre-test on the pre-test pool"""
+        queued = time.monotonic()
+
+        def _run():
+            started = time.monotonic()
+            self.pre_test_latency['queue'].add(started - queued)
+            try:
+                return function()
+            finally:
+                self.pre_test_latency['run'].add(time.monotonic() - started)
+
+        return self.pre_tests.submit(_run)
+
+    def submit_finish(self, function, *args, **kwargs):
+        """Runs finishing of a test run, e.g. finalize and report, on its own worker"""
+        return self.finishing.submit(function, *args, **kwargs)
+
+    def submit_post_test(self, test_position_name, function, on_wait=None):
+        """Runs post-test on the post-processing stage. Blocks if the stage is full."""
+        return self.post_processing.submit(test_position_name, function, on_wait)
+
+    def abandon(self, thread_ident):
+        """Gives up the task running on the thread so that the worker is replaced
+
+        Returns False if the thread is not a worker of the executor.
+        """
+        pools = [
+            *self.positions.values(),
+            self.background,
+            self.pre_tests,
+            self.finishing,
+            self.post_processing,
+        ]
+        return any(pool.abandon(thread_ident) for pool in pools)
+
+    def statistics(self):
+        """Returns queue depth, utilisation and latencies of all workers"""
+        return {
+            'positions': {name: pool.statistics() for name, pool in self.positions.items()},
+            'background': self.background.statistics(),
+            'pre_tests': self.pre_tests.statistics(),
+            'finishing': self.finishing.statistics(),
+            'pre_test_latency': {
+                stage: latency.statistics() for stage, latency in self.pre_test_latency.items()
+            },
+            'post_processing': self.post_processing.statistics(),
+        }
+
+    def shutdown(self):
+        """Stops all workers"""
+        for pool in self.positions.values():
+            pool.shutdown()
+        self.background.shutdown()
+        self.pre_tests.shutdown()
+        self.finishing.shutdown()
+        self.post_processing.shutdown()
+
+
+def join(futures, logger):
+    """Waits until all futures are done and logs the exceptions
+
+    Behaves like joining plain threads: errors are logged but not raised.
+    """
+    wait(futures)
+
+    for future in futures:
+        if future.exception() is not None:
+            err = future.exception()
+            logger.error("Exception in background task", exc_info=(type(err), err, err.__traceback__))
+
+
+_PROCESS_POOL = None
+_PROCESS_POOL_LOCK = threading.Lock()
+
+
+def start_process_pool(workers):
+    """Starts process pool for CPU heavy work offloaded by test cases
+
+    Worker processes are started from a clean server process, not forked from the test
+    runner with its threads, e.g. the progress reporter, holding locks.
+    """
+    global _PROCESS_POOL  # pylint: disable=global-statement
+
+    with _PROCESS_POOL_LOCK:
+        if _PROCESS_POOL is None and workers:
+            if 'forkserver' in multiprocessing.get_all_start_methods():
+                context = multiprocessing.get_context('forkserver')
+            else:
+                context = multiprocessing.get_context('spawn')
+            _PROCESS_POOL = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+            wait([_PROCESS_POOL.submit(time.sleep, 0) for _ in range(workers)])
+
+
+def _import_function(module_name, module_file, qualname):
+    """Returns function of a worker process
+
+    Test definitions are loaded from their files, so their modules are not
+    necessarily importable by name. Such module is loaded from its file.
+    """
+    module = sys.modules.get(module_name)
+    if module is None:
+        try:
+            module = importlib.import_module(module_name)
+        except ImportError:
+            if module_file is None:
+                raise
+            spec = importlib.util.spec_from_file_location(module_name, module_file)
+            module = importlib.util.module_from_spec(spec)
+            sys.modules[module_name] = module
+            spec.loader.exec_module(module)
+
+    function = module
+    for name in qualname.split('.'):
+        function = getattr(function, name)
+    return function
+
+
+def _call_in_process(module_name, module_file, qualname, args, kwargs):
+    return _import_function(module_name, module_file, qualname)(*args, **kwargs)
+
+
+def run_in_process(function, *args, **kwargs):
+    """Runs function on the process pool and waits for the result
+
+    Function is run on the calling thread if the process pool is not started.
+    """
+    with _PROCESS_POOL_LOCK:
+        pool = _PROCESS_POOL
+
+    if pool is None:
+        return function(*args, **kwargs)
+
+    module_name = getattr(function, '__module__', None)
+    qualname = getattr(function, '__qualname__', None)
+    if module_name is None or qualname is None:
+        return pool.submit(function, *args, **kwargs).result()
+
+    module_file = getattr(sys.modules.get(module_name), '__file__', None)
+    return pool.submit(
+        _call_in_process, module_name, module_file, qualname, args, kwargs
+    ).result()
+
+
+def shutdown_process_pool():
+    """Stops the process pool if it was started"""
+    global _PROCESS_POOL  # pylint: disable=global-statement
+
+    with _PROCESS_POOL_LOCK:
+        if _PROCESS_POOL is not None:
+            _PROCESS_POOL.shutdown()
+            _PROCESS_POOL = None
@@ -3,19 +3,33 @@ import sys
 import os
 import json
 import importlib
+import itertools
 import threading
 from test_runner import exceptions
 
 
-def import_by_name(name, error_message, logger):
+# Source file mtimes of imported test definitions. Modules are reloaded only when changed.
+_SOURCE_MTIMES = {}
+# Times the test definitions have been imported or reloaded
+_LOAD_COUNTS = {}
+
+
+def import_by_name(name, error_message, logger, force_reload=False):
     sys.path.append(os.getcwd())
     sys.path.append(os.path.join(os.getcwd(), 'test_definitions'))
 
     try:
+        imported = name in sys.modules
         imp = importlib.import_module(name)
 
         if 'common' not in name:
-            importlib.reload(imp)
+            mtimes = get_source_mtimes(imp)
+            if imported and (force_reload or _SOURCE_MTIMES.get(name) != mtimes):
+                importlib.reload(imp)
+                imported = False
+            if not imported:
+                _LOAD_COUNTS[name] = _LOAD_COUNTS.get(name, 0) + 1
+            _SOURCE_MTIMES[name] = mtimes
 
         # TODO: This hides also errors on nested imports
     except ImportError as err:
@@ -26,13 +40,13 @@ def import_by_name(name, error_message, logger):
     return imp
 
 
-def get_test_pool_definitions(logger):
+def get_test_pool_definitions(logger, force_reload=False):
     """Returns test definition pool"""
 
-    return import_by_name('test_case_pool', "test_case_pool missing?", logger)
+    return import_by_name('test_case_pool', "test_case_pool missing?", logger, force_reload)
 
 
-def get_test_definitions(sequence_name, logger):
+def get_test_definitions(sequence_name, logger, force_reload=False):
     """Returns test definitions"""
 
     err = (
@@ -41,4 +55,49 @@ def get_test_definitions(sequence_name, logger):
         + ". Remember, you can create new definition template with --create argument."
     )
 
-    return import_by_name("sequences." + sequence_name, err, logger)
+    return import_by_name("sequences." + sequence_name, err, logger, force_reload)
+
+
+def get_load_count(module):
+    """Returns how many times the test definitions module has been imported or reloaded"""
+
+    return _LOAD_COUNTS.get(module.__name__, 0)
+
+
+def get_source_mtimes(*modules):
+    """Returns modification times of the source files of the module packages"""
+
+    mtimes = []
+    for module in modules:
+        module_file = getattr(module, '__file__', None)
+        if module_file is None:
+            continue
+        for root, _, files in os.walk(os.path.dirname(module_file)):
+            for file_name in files:
+                if file_name.endswith('.py'):
+                    path = os.path.join(root, file_name)
+                    mtimes.append((path, os.stat(path).st_mtime_ns))
+
+    return tuple(sorted(mtimes))
+
+
+# Versions are unique over all objects, so a version is never reused after a change
+_VERSIONS = itertools.count(1)
+
+
+class Versioned:
+    """Object whose version changes on every attribute assignment
+
+    Changes inside attributes, e.g. to dictionaries, are marked with touch().
+    Used to cache serialised progress of unchanged objects.
+    """
+
+    version = 0
+
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        object.__setattr__(self, 'version', next(_VERSIONS))
+
+    def touch(self):
+        """Marks the object changed"""
+        object.__setattr__(self, 'version', next(_VERSIONS))
@@ -0,0 +1,144 @@
+"""Shared and exclusive locking of instruments used by test cases"""
+import threading
+import time
+from contextlib import contextmanager
+from test_runner.test_case import InstrumentAccess
+
+
+class InstrumentLock:
+    """Readers-writer lock of one instrument. Keeps track of busy and wait times.
+
+    Waiting exclusive users are preferred so that they are not starved by shared users.
+    """
+
+    def __init__(self, name, created_monotonic=None):
+        self.name = name
+        self._condition = threading.Condition()
+        self._shared_users = 0
+        self._exclusive_user = False
+        self._exclusive_waiting = 0
+        self._created_monotonic = created_monotonic or time.monotonic()
+        self._busy_since = None
+        self._busy_time = 0.0
+        self._wait_time = 0.0
+        self._acquisitions = 0
+
+    def acquire(self, access):
+        start = time.monotonic()
+
+        with self._condition:
+            if access == InstrumentAccess.EXCLUSIVE:
+                self._exclusive_waiting += 1
+                try:
+                    self._condition.wait_for(
+                        lambda: not self._exclusive_user and self._shared_users == 0
+                    )
+                finally:
+                    self._exclusive_waiting -= 1
+                self._exclusive_user = True
+            else:
+                self._condition.wait_for(
+                    lambda: not self._exclusive_user and self._exclusive_waiting == 0
+                )
+                self._shared_users += 1
+
+            now = time.monotonic()
+            if self._busy_since is None:
+                self._busy_since = now
+            self._wait_time += now - start
+            self._acquisitions += 1
+
+    def release(self, access):
+        with self._condition:
+            if access == InstrumentAccess.EXCLUSIVE:
+                self._exclusive_user = False
+            else:
+                self._shared_users -= 1
+
+            if not self._exclusive_user and self._shared_users == 0:
+                self._busy_time += time.monotonic() - self._busy_since
+                self._busy_since = None
+
+            self._condition.notify_all()
+
+    def statistics(self):
+        """Returns busy and idle time of the instrument"""
+        with self._condition:
+            now = time.monotonic()
+            busy = self._busy_time
+            if self._busy_since is not None:
+                busy += now - self._busy_since
+            elapsed = now - self._created_monotonic
+
+            return {
+                'busy_s': round(busy, 2),
+                'idle_s': round(elapsed - busy, 2),
+                'utilisation': round(busy / elapsed, 3) if elapsed > 0 else 0.0,
+                'wait_s': round(self._wait_time, 2),
+                'acquisitions': self._acquisitions,
+            }
+
+
+class HeldInstruments:
+    """Locks held by a test case, released temporarily e.g. while waiting for other test positions"""
+
+    def __init__(self, locks):
+        self._locks = locks
+        self._acquired = []
+
+    def acquire(self):
+        for lock, access in self._locks:
+            lock.acquire(access)
+            self._acquired.append((lock, access))
+
+    def release(self):
+        while self._acquired:
+            lock, access = self._acquired.pop()
+            lock.release(access)
+
+    @contextmanager
+    def released(self):
+        """Releases the locks for the with block"""
+        self.release()
+        try:
+            yield
+        finally:
+            self.acquire()
+
+
+class InstrumentLocks:
+    """Locks of all instruments, created when first needed"""
+
+    def __init__(self):
+        self._locks = {}
+        self._lock = threading.Lock()
+        self._created_monotonic = time.monotonic()
+
+    def _get(self, name):
+        with self._lock:
+            if name not in self._locks:
+                self._locks[name] = InstrumentLock(name, self._created_monotonic)
+            return self._locks[name]
+
+    @contextmanager
+    def hold(self, required_instruments):
+        """Holds locks of the given instruments. Yields HeldInstruments.
+
+        required_instruments: Dictionary of instrument name -> InstrumentAccess.
+        Locks are acquired in the order of instrument names to avoid deadlocks.
+        """
+        held = HeldInstruments(
+            [(self._get(name), required_instruments[name]) for name in sorted(required_instruments)]
+        )
+        try:
+            held.acquire()
+            yield held
+        finally:
+            held.release()
+
+    def statistics(self):
+        """Returns busy and idle times of all used instruments"""
+        with self._lock:
+            locks = dict(self._locks)
+
+        return {name: lock.statistics() for name, lock in locks.items()}
@@ -0,0 +1,255 @@
+"""Compiled evaluation of test limits
+
+Limits of a measurement are either a callable:
+
+    "Measurement1": {"limit": lambda measurement: 90 < measurement < 100}
+
+or declarative, which can be evaluated in bulk:
+
+    "Measurement2": {"min": 90, "max": 100}
+    "Measurement3": {"equals": [123, 456, 1, 3]}
+    "Measurement4": {"in": ["A", "B"]}
+
+min and max are inclusive, i.e. Measurement2 passes when 90 <= measurement <= 100.
+Exclusive limits, like the one of Measurement1, are written as callables. When both
+are given, the callable and the declarative limits must pass.
+"""
+import inspect
+import numbers
+import threading
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+DECLARATIVE_KEYS = ('min', 'max', 'equals', 'in')
+
+# Below this amount of measurements NumPy is slower than plain Python
+BULK_MIN_MEASUREMENTS = 32
+
+_SOURCE_CACHE = {}
+_SOURCE_CACHE_LOCK = threading.Lock()
+
+
+def get_source(function):
+    """Returns source of the limit function. Source is read only once per function."""
+    key = getattr(function, '__code__', function)
+
+    with _SOURCE_CACHE_LOCK:
+        if key in _SOURCE_CACHE:
+            return _SOURCE_CACHE[key]
+
+    try:
+        source = inspect.getsource(function)
+    except (OSError, TypeError):
+        source = repr(function)
+
+    with _SOURCE_CACHE_LOCK:
+        _SOURCE_CACHE[key] = source
+
+    return source
+
+
+def clear_source_cache():
+    """Forgets sources of the limit functions, e.g. when the sequence is reloaded"""
+    with _SOURCE_CACHE_LOCK:
+        _SOURCE_CACHE.clear()
+
+
+def _is_number(value):
+    if type(value) in (int, float):  # pylint: disable=unidiomatic-typecheck
+        return True
+    return isinstance(value, numbers.Real) and not isinstance(value, bool)
+
+
+class CompiledLimit:
+    """Limit of one measurement"""
+
+    def __init__(self, spec):
+        self.spec = spec
+        self.unit = spec.get('unit', '')
+        self.optional = spec.get('optional', False)
+        self.function = spec.get('limit')
+        self.min = spec.get('min')
+        self.max = spec.get('max')
+        self.equals = spec.get('equals')
+        self.allowed = spec.get('in')
+        self.declarative = any(key in spec for key in DECLARATIVE_KEYS)
+        self._report_limit = spec.get('report_limit')
+
+        if self.function is None and not self.declarative:
+            raise KeyError('limit')
+
+    @property
+    def range_only(self):
+        """True if the limit is only min and/or max, which can be evaluated in bulk"""
+        return (
+            self.function is None
+            and 'equals' not in self.spec
+            and 'in' not in self.spec
+            and (self.min is not None or self.max is not None)
+        )
+
+    @property
+    def report_limit(self):
+        """Representation of the limit on the report"""
+        if self._report_limit is None:
+            parts = []
+            if self.min is not None or self.max is not None:
+                parts.append(
+                    ' <= '.join(
+                        str(part)
+                        for part in (self.min, 'measurement', self.max)
+                        if part is not None
+                    )
+                )
+            if 'equals' in self.spec:
+                parts.append(f'measurement == {self.equals!r}')
+            if 'in' in self.spec:
+                parts.append(f'measurement in {self.allowed!r}')
+            if self.function is not None:
+                parts.append(get_source(self.function))
+            self._report_limit = ' and '.join(parts)
+
+        return self._report_limit
+
+    def _in_range(self, measurement):
+        if not _is_number(measurement):
+            if numpy is not None:
+                values = numpy.asarray(measurement)
+                return bool(
+                    (self.min is None or numpy.all(values >= self.min))
+                    and (self.max is None or numpy.all(values <= self.max))
+                )
+            return all(self._in_range(value) for value in measurement)
+
+        return (self.min is None or measurement >= self.min) and (
+            self.max is None or measurement <= self.max
+        )
+
+    def evaluate(self, measurement):
+        """Returns 'pass' or 'fail'"""
+        if self.declarative:
+            if (self.min is not None or self.max is not None) and not self._in_range(measurement):
+                return 'fail'
+            if 'equals' in self.spec and measurement != self.equals:
+                return 'fail'
+            if 'in' in self.spec and measurement not in self.allowed:
+                return 'fail'
+
+        if self.function is not None and not self.function(measurement):
+            return 'fail'
+
+        return 'pass'
+
+    def evaluate_array(self, values):
+        """Returns mask of the elements of NumPy array failing the limits
+
+        Limit function may return a boolean array, which is used as mask of passing elements.
+        Otherwise the result of the function applies to all elements.
+        """
+        fail_mask = numpy.zeros(values.shape, dtype=bool)
+
+        if self.min is not None:
+            fail_mask |= ~(values >= self.min)
+        if self.max is not None:
+            fail_mask |= ~(values <= self.max)
+        if 'equals' in self.spec:
+            fail_mask |= numpy.asarray(values != self.equals, dtype=bool)
+        if 'in' in self.spec:
+            fail_mask |= ~numpy.isin(values, self.allowed)
+
+        if self.function is not None:
+            result = self.function(values)
+            if isinstance(result, numpy.ndarray) and result.shape == values.shape:
+                fail_mask |= ~result.astype(bool)
+            elif not result:
+                fail_mask[...] = True
+
+        return fail_mask
+
+
+class CompiledLimits:
+    """Limits of all test cases, compiled once per sequence load"""
+
+    def __init__(self, limits):
+        self.limits = limits
+        self._compiled = {}
+        self._ranges = {}
+        self._bounds = {}
+        self._lock = threading.Lock()
+
+    def get(self, test_case_name, measurement_name):
+        """Returns CompiledLimit. Raises KeyError if the measurement has no limits."""
+        key = (test_case_name, measurement_name)
+        compiled = self._compiled.get(key)
+
+        if compiled is None:
+            compiled = CompiledLimit(self.limits[test_case_name][measurement_name])
+            with self._lock:
+                self._compiled[key] = compiled
+
+        return compiled
+
+    def _get_ranges(self, test_case_name):
+        """Returns (min, max) of measurements of the test case which have only min/max limits"""
+        ranges = self._ranges.get(test_case_name)
+
+        if ranges is None:
+            ranges = {}
+            for name in self.limits[test_case_name]:
+                try:
+                    compiled = self.get(test_case_name, name)
+                except (KeyError, AttributeError, TypeError):
+                    continue
+                if compiled.range_only:
+                    ranges[name] = (compiled.min, compiled.max)
+            with self._lock:
+                self._ranges[test_case_name] = ranges
+
+        return ranges
+
+    def evaluate_bulk(self, test_case_name, measurements, limit_names=None):
+        """Evaluates min/max limits of numeric measurements at once
+
+        measurements: Dictionary of measurement name -> value.
+        limit_names: Optional dictionary of measurement name -> name of its limits,
+        e.g. for measurements of sweep points.
+        Returns dictionary of measurement name -> 'pass'/'fail' of the evaluated measurements.
+        Others are left for CompiledLimit.evaluate.
+        """
+        if numpy is None or test_case_name not in self.limits:
+            return {}
+
+        ranges = self._get_ranges(test_case_name)
+        limit_names = limit_names or {}
+        names = tuple(
+            name
+            for name, value in measurements.items()
+            if limit_names.get(name, name) in ranges and _is_number(value)
+        )
+
+        if len(names) < BULK_MIN_MEASUREMENTS:
+            return {}
+
+        key = (test_case_name, names)
+        bounds = self._bounds.get(key)
+        if bounds is None:
+            # Missing min/max is NaN, which is treated as no limit
+            bounds = (
+                numpy.array([ranges[limit_names.get(name, name)][0] for name in names], dtype=float),
+                numpy.array([ranges[limit_names.get(name, name)][1] for name in names], dtype=float),
+            )
+            bounds = (
+                numpy.where(numpy.isnan(bounds[0]), -numpy.inf, bounds[0]),
+                numpy.where(numpy.isnan(bounds[1]), numpy.inf, bounds[1]),
+            )
+            with self._lock:
+                self._bounds[key] = bounds
+
+        lower, upper = bounds
+        values = numpy.fromiter((measurements[name] for name in names), float, len(names))
+        passed = (values >= lower) & (values <= upper)
+
+        return dict(zip(names, numpy.where(passed, 'pass', 'fail').tolist()))
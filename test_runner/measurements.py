@@ -0,0 +1,293 @@
+"""Measurement types stored by test cases"""
+import collections.abc
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def is_array(measurement):
+    """True if the measurement is a NumPy array, which is stored as ArrayMeasurement"""
+    return numpy is not None and isinstance(measurement, numpy.ndarray) and measurement.ndim > 0
+
+
+class ArrayMeasurement:
+    """Array or waveform measurement stored once
+
+    The array is kept by reference or in a memory-mapped .npy sidecar file. Test
+    cases, reports, progress and database get only the summary and a link to the file.
+    """
+
+    def __init__(self, data):
+        if numpy is None:
+            raise ImportError("ArrayMeasurement requires NumPy")
+
+        self.data = numpy.asarray(data)
+        self.file_path = None
+        self.url = None
+        self.fail_mask = None
+        self.fail_count = None
+        self.info = {}
+
+    def save(self, file_path):
+        """Saves the array to .npy file"""
+        with open(file_path, 'wb') as npy_file:
+            numpy.save(npy_file, self.data)
+
+    def map_file(self, file_path, url=None):
+        """Replaces the array with a read-only memory map of the saved .npy file"""
+        self.data = numpy.load(file_path, mmap_mode='r')
+        self.file_path = str(file_path)
+        self.url = url
+
+    def set_fail_mask(self, fail_mask):
+        """Stores elements failing the limits"""
+        self.fail_mask = fail_mask
+        self.fail_count = int(numpy.count_nonzero(fail_mask))
+
+    def summary(self):
+        """Returns JSON serializable summary of the array"""
+        summary = {
+            'type': 'array',
+            'shape': list(self.data.shape),
+            'dtype': str(self.data.dtype),
+            'min': None,
+            'max': None,
+            'mean': None,
+            'argmax': None,
+            'fail_count': self.fail_count,
+            'file_path': self.file_path,
+            'url': self.url,
+            **self.info,
+        }
+
+        if self.data.size and numpy.issubdtype(self.data.dtype, numpy.number):
+            summary.update(
+                {
+                    'min': self.data.min().item(),
+                    'max': self.data.max().item(),
+                    'mean': self.data.mean().item(),
+                    'argmax': int(self.data.argmax()),
+                }
+            )
+
+        return summary
+
+
+class StreamWriter:
+    """Writer of high-rate samples to a preallocated ring buffer
+
+    When the buffer is full, the oldest samples are overwritten. With file_path the
+    buffer is memory-mapped to the file instead of memory. On close the samples are
+    passed in order to on_close, e.g. to be stored as array measurement.
+    Writer is meant to be used by one thread.
+    """
+
+    def __init__(self, name, dtype, capacity, on_close, file_path=None):
+        if numpy is None:
+            raise ImportError("StreamWriter requires NumPy")
+
+        self.name = name
+        if file_path is None:
+            self.buffer = numpy.empty(capacity, dtype=dtype)
+        else:
+            self.buffer = numpy.memmap(file_path, dtype=dtype, mode='w+', shape=(capacity,))
+        self.capacity = capacity
+        self.samples = 0
+        self.closed = False
+        self._on_close = on_close
+
+    def append(self, value):
+        """Adds one sample"""
+        self.buffer[self.samples % self.capacity] = value
+        self.samples += 1
+
+    def extend(self, values):
+        """Adds array of samples"""
+        values = numpy.asarray(values, dtype=self.buffer.dtype).ravel()
+
+        if len(values) >= self.capacity:
+            self.samples += len(values)
+            # Keep the oldest sample at index samples % capacity. Written in place
+            # so that a memory-mapped buffer stays mapped to its file.
+            start = self.samples % self.capacity
+            values = values[-self.capacity:]
+            self.buffer[start:] = values[:self.capacity - start]
+            self.buffer[:start] = values[self.capacity - start:]
+            return
+
+        start = self.samples % self.capacity
+        first = min(len(values), self.capacity - start)
+        self.buffer[start:start + first] = values[:first]
+        self.buffer[:len(values) - first] = values[first:]
+        self.samples += len(values)
+
+    def data(self):
+        """Returns the buffered samples, oldest first"""
+        if self.samples <= self.capacity:
+            return self.buffer[:self.samples]
+
+        start = self.samples % self.capacity
+        return numpy.concatenate((self.buffer[start:], self.buffer[:start]))
+
+    def close(self):
+        """Finishes the stream. Calls on_close with the samples once."""
+        if self.closed:
+            return
+        self.closed = True
+        self._on_close(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class MeasurementRecord(collections.abc.MutableMapping):
+    """Compact record of one measurement in dut.test_cases
+
+    Mapping of the measurement dictionary (measurement, unit, optional, limit,
+    result, error) used by reports and UI, with fraction of its memory.
+    Other keys are stored to a dictionary created when first needed.
+    Reports get the records as dictionaries, see to_dicts.
+    """
+
+    __slots__ = ('measurement', 'error', 'unit', 'optional', 'limit', 'result', '_extra')
+
+    # Same order as the keys are set by TestCase.result_handler
+    FIELDS = ('measurement', 'error', 'unit', 'optional', 'limit', 'result')
+
+    def __getitem__(self, key):
+        if key in MeasurementRecord.FIELDS:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+
+        try:
+            return self._extra[key]
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __setitem__(self, key, value):
+        if key in MeasurementRecord.FIELDS:
+            setattr(self, key, value)
+            return
+
+        try:
+            self._extra[key] = value
+        except AttributeError:
+            self._extra = {key: value}
+
+    def __delitem__(self, key):
+        try:
+            if key in MeasurementRecord.FIELDS:
+                delattr(self, key)
+            else:
+                del self._extra[key]
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __iter__(self):
+        for key in MeasurementRecord.FIELDS:
+            if hasattr(self, key):
+                yield key
+        yield from getattr(self, '_extra', ())
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def to_dict(self):
+        """Returns the measurement as dictionary"""
+        return {key: self[key] for key in self}
+
+    def __repr__(self):
+        return repr(self.to_dict())
+
+
+class MeasurementDict(dict):
+    """Measurements of a test case in dut.test_cases
+
+    Keeps names of the measurements stored, replaced or deleted after the previous
+    take_changed() call, so that only changed measurements are evaluated against
+    limits. Changes made inside a stored measurement are not tracked.
+    """
+
+    __slots__ = ('_changed',)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Dictionary keeps the order of the changes
+        self._changed = dict.fromkeys(self)
+
+    def __setitem__(self, name, measurement):
+        super().__setitem__(name, measurement)
+        self._changed[name] = None
+
+    def __delitem__(self, name):
+        super().__delitem__(name)
+        self._changed.pop(name, None)
+
+    def setdefault(self, name, default=None):
+        if name not in self:
+            self[name] = default
+        return self[name]
+
+    def update(self, *args, **kwargs):  # pylint: disable=arguments-differ
+        for name, measurement in dict(*args, **kwargs).items():
+            self[name] = measurement
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def pop(self, name, *default):  # pylint: disable=arguments-differ
+        self._changed.pop(name, None)
+        return super().pop(name, *default)
+
+    def popitem(self):
+        name, measurement = super().popitem()
+        self._changed.pop(name, None)
+        return name, measurement
+
+    def clear(self):
+        super().clear()
+        self._changed.clear()
+
+    def __reduce__(self):
+        # Copied and pickled with the changes, which are set after the measurements
+        return type(self), (dict(self),), (None, {'_changed': dict(self._changed)})
+
+    def mark_changed(self, name):
+        """Marks measurement changed in place, e.g. by new_measurement"""
+        self._changed[name] = None
+
+    def take_changed(self):
+        """Returns measurements changed after the previous call"""
+        changed, self._changed = self._changed, {}
+        return {name: self[name] for name in changed}
+
+
+def to_dicts(value):
+    """Returns copy of test results with measurement records as dictionaries
+
+    For code expecting dictionaries, e.g. create_report and databases.
+    """
+    if isinstance(value, MeasurementRecord):
+        return value.to_dict()
+    if isinstance(value, dict):
+        return {key: to_dicts(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [to_dicts(item) for item in value]
+
+    return value
+
+
+def json_default(obj):
+    """Default of json.dumps for test results: measurement records as dictionaries, others as str"""
+    if isinstance(obj, MeasurementRecord):
+        return obj.to_dict()
+
+    return str(obj)
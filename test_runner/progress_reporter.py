@@ -1,8 +1,176 @@
 import json
-from threading import Lock
+import logging
+import queue
+import time
+from threading import Event, Thread
+from test_runner import measurements
+
+
+def freeze(value):
+    """Returns JSON compatible copy of value, as seen by the clients"""
+    return json.loads(json.dumps(value, default=measurements.json_default))
+
+
+def _escape(key):
+    return str(key).replace('~', '~0').replace('/', '~1')
+
+
+def diff(old, new, path=''):
+    """Returns JSON patch (RFC 6902) operations changing old to new
+
+    Dictionaries are compared key by key, other changed values are replaced as a whole.
+    """
+    if old is new:
+        return []
+
+    if isinstance(old, dict) and isinstance(new, dict):
+        # Comparison is fast compared to walking unchanged subtrees in Python
+        if old == new:
+            return []
+        operations = [
+            {'op': 'remove', 'path': f'{path}/{_escape(key)}'} for key in old if key not in new
+        ]
+        for key, value in new.items():
+            key_path = f'{path}/{_escape(key)}'
+            if key not in old:
+                operations.append({'op': 'add', 'path': key_path, 'value': value})
+            else:
+                operations.extend(diff(old[key], value, key_path))
+        return operations
+
+    if type(old) is type(new) and old == new:  # pylint: disable=unidiomatic-typecheck
+        return []
+
+    return [{'op': 'replace', 'path': path, 'value': new}]
+
+
+def select(progress, positions=None, fields=None):
+    """Returns the given fields and test positions of the progress
+
+    Unchanged parts are the same objects as in the progress.
+    """
+    if fields is not None:
+        progress = {key: value for key, value in progress.items() if key in fields}
+
+    if positions is not None and 'duts' in progress:
+        progress = dict(progress)
+        progress['duts'] = {
+            name: position for name, position in progress['duts'].items() if name in positions
+        }
+
+    return progress
+
+
+class ProgressMessage:
+    """One published version of the progress
+
+    JSON of the full progress, snapshot and delta to the previous published version
+    are serialised when first needed, once for all clients. Same for the parts of the
+    progress subscribed by the clients, see select().
+    """
+
+    def __init__(self, version, progress, base_version=None, base=None, fragments=None):
+        self.version = version
+        self.progress = progress
+        self.base_version = base_version
+        self._base = base
+        # JSON of each position in progress['duts'], serialised already
+        self._fragments = fragments
+        self._json = None
+        self._snapshot_json = None
+        self._patch = None
+        self._delta_json = None
+        self._selected = {}
+
+    @property
+    def json(self):
+        """Full progress as sent before the delta protocol"""
+        if self._json is None:
+            if self._fragments is None:
+                self._json = json.dumps(self.progress)
+            else:
+                duts = ', '.join(
+                    f'{json.dumps(name)}: {fragment}' for name, fragment in self._fragments.items()
+                )
+                others = json.dumps({k: v for k, v in self.progress.items() if k != 'duts'})
+                if others == '{}':
+                    self._json = f'{{"duts": {{{duts}}}}}'
+                else:
+                    self._json = f'{{"duts": {{{duts}}}, {others[1:]}'
+        return self._json
+
+    @property
+    def snapshot_json(self):
+        if self._snapshot_json is None:
+            self._snapshot_json = (
+                f'{{"type": "snapshot", "version": {self.version}, "progress": {self.json}}}'
+            )
+        return self._snapshot_json
+
+    @property
+    def patch(self):
+        """JSON patch from the previous version, or None if there is no previous version"""
+        if self._patch is None and self.base_version is not None:
+            self._patch = diff(self._base, self.progress)
+        return self._patch
+
+    @property
+    def delta_json(self):
+        """Delta to the previous version, or None if there is no previous version"""
+        if self._delta_json is None and self.base_version is not None:
+            self._delta_json = json.dumps(
+                {
+                    'type': 'delta',
+                    'version': self.version,
+                    'base_version': self.base_version,
+                    'patch': self.patch,
+                }
+            )
+        return self._delta_json
+
+    def select(self, positions=None, fields=None):
+        """Returns message of the given test positions and fields of the progress
+
+        positions and fields are frozensets or None for all. Messages are cached, so
+        clients with the same subscription share the serialised JSON. Not thread safe,
+        called by the listener only.
+        """
+        if positions is None and fields is None:
+            return self
+
+        key = (positions, fields)
+        if key not in self._selected:
+            progress = select(self.progress, positions, fields)
+            fragments = None
+            if self._fragments is not None and 'duts' in progress:
+                fragments = {name: self._fragments[name] for name in progress['duts']}
+            self._selected[key] = ProgressMessage(
+                self.version,
+                progress,
+                self.base_version,
+                None if self._base is None else select(self._base, positions, fields),
+                fragments,
+            )
+
+        return self._selected[key]
+
+    def __str__(self):
+        return self.json
+
 
 class ProgressReporter:
-    def __init__(self, test_control, progess_queue):
+    """Progress of the test station, published to UI
+
+    Progress is changed and published only by the thread of the reporter. Methods pass
+    the change to the thread and wait until it is applied. Changes within window_s
+    seconds are published as one progress, at most max_rate times per second. Change of
+    general_state, e.g. to finalize or abort, is published before the method returns.
+
+    Published progress is not changed afterwards, so test_control['progress'] and
+    test_control['progress_message'] are read without locking or copying.
+    """
+
+    def __init__(self, test_control, progess_queue, window_s=0, max_rate=None):
         self.test_control = test_control
         self.statistics = None
         self.general_state = None
@@ -14,66 +182,161 @@ class ProgressReporter:
         self.instrument_status = None
         self.version_info = None
         self.report_paths = {}
-        self.lock = Lock()
+        self.logger = logging.getLogger('progress_reporter')
+        self.version = 0
+        self.message = None
+        self.window_s = window_s
+        self.min_interval_s = 1 / max_rate if max_rate else 0
+        self.requested = 0
+        self.published = 0
+        self._last_publish = 0
+        # Position name -> (versions, progress of the position, JSON of it)
+        self._fragments = {}
+        self._changes = queue.Queue()
+        self._thread = Thread(target=self._run, name='progress_reporter')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _change(self, change):
+        """Applies change on the thread of the reporter and waits until it is done
+
+        change returns True if the progress must be published right away.
+        """
+        done = Event()
+        self._changes.put((change, done))
+        done.wait()
 
     def set_instrument_status(self, instrument, status):
+        def change():
+            if self.instrument_status is None:
+                self.instrument_status = {}
 
-        if self.instrument_status is None:
-            self.instrument_status = {}
+            self.instrument_status[instrument] = status
 
-        self.instrument_status[instrument] = status
-        self._report_progress()
+        self._change(change)
 
     def set_version_info(self, version_name, version_value):
+        def change():
+            if self.version_info is None:
+                self.version_info = {}
 
-        if self.version_info is None:
-            self.version_info = {}
+            self.version_info[version_name] = version_value
 
-        self.version_info[version_name] = version_value
-        self._report_progress()
+        self._change(change)
 
     def set_progress(self, **kwargs):
-        with self.lock:
+        def change():
+            # State transitions, e.g. to finalize or abort, are not delayed
+            immediate = kwargs.get('general_state', self.general_state) != self.general_state
             # Store variable
             self.__dict__.update(kwargs)
-            # Send new progress json
-            self._report_progress()
+            return immediate
+
+        self._change(change)
 
     def show_operator_instructions(self, message, append=False):
-        if append and self.operator_instructions:
-            self.operator_instructions = self.operator_instructions + '\r\n' + message
-        else:
-            self.operator_instructions = message
+        def change():
+            if append and self.operator_instructions:
+                self.operator_instructions = self.operator_instructions + '\r\n' + message
+            else:
+                self.operator_instructions = message
 
-        self._report_progress()
+        self._change(change)
 
     def set_report_paths(self, paths):
-        self.report_paths = paths
-        self._report_progress()
+        def change():
+            self.report_paths = paths
+
+        self._change(change)
+
+    def _due(self, pending_since):
+        return max(pending_since + self.window_s, self._last_publish + self.min_interval_s)
 
-    def _report_progress(self):
+    def _run(self):
+        pending_since = None
 
+        while True:
+            timeout = None
+            if pending_since is not None:
+                timeout = max(self._due(pending_since) - time.monotonic(), 0)
+
+            try:
+                change, done = self._changes.get(timeout=timeout)
+            except queue.Empty:
+                change, done = None, None
+
+            immediate = False
+            if change is not None:
+                self.requested += 1
+                try:
+                    immediate = bool(change())
+                except Exception:  # pylint: disable=broad-except
+                    self.logger.exception("Changing progress failed")
+                if pending_since is None:
+                    pending_since = time.monotonic()
+
+            if pending_since is not None and (
+                immediate or time.monotonic() >= self._due(pending_since)
+            ):
+                pending_since = None
+                try:
+                    self._publish(*self._get_progress())
+                except Exception:  # pylint: disable=broad-except
+                    # Published again on next change
+                    self.logger.exception("Publishing progress failed")
+                self._last_publish = time.monotonic()
+
+            if done is not None:
+                done.set()
+
+    def _get_position(self, position_name, position_value):
+        """Returns progress of the test position and its JSON
+
+        Serialised again only when the test position or its DUT has changed.
+        """
+        dut = position_value.dut
+        # Versions are read before the values, so a concurrent change is not missed
+        versions = (position_value.version, None if dut is None else dut.version)
+        cached = self._fragments.get(position_name)
+        if cached is not None and cached[0] == versions:
+            return cached[1], cached[2]
+
+        dut_class = None
+        if dut is None:
+            if position_value.previous_dut:
+                dut_class = position_value.previous_dut
+        else:
+            dut_class = dut.get_dut_dict()
+
+        fragment = json.dumps(
+            {
+                'step': position_value.step,
+                'status': position_value.status,
+                'sn': None if dut is None else dut.serial_number,
+                'test_status': str(position_value.test_status),
+                'dut_class': dut_class
+            },
+            default=measurements.json_default,
+        )
+        position = json.loads(fragment)
+        self._fragments[position_name] = (versions, position, fragment)
+        return position, fragment
+
+    def _get_progress(self):
+        """Returns JSON compatible copy of the current progress and JSON of each position"""
         positions_dict = {}
+        fragments = {}
 
         if self.test_positions:
             for position_name, position_value in self.test_positions.items():
-                dut_class = None
-                if position_value.dut is None:
-                    if position_value.previous_dut:
-                        dut_class = position_value.previous_dut
-                else:
-                    dut_class = position_value.dut.get_dut_dict()
-                positions_dict[position_name] = {
-                    'step': position_value.step,
-                    'status': position_value.status,
-                    'sn': None if position_value.dut is None else position_value.dut.serial_number,
-                    'test_status': str(position_value.test_status),
-                    'dut_class': dut_class
-                }
+                # Keys are strings in JSON
+                position_name = str(position_name)
+                positions_dict[position_name], fragments[position_name] = self._get_position(
+                    position_name, position_value
+                )
 
         progress_json = {
             "general_state": self.general_state,
-            "duts": positions_dict,
             "sequence_name": self.sequence_name,
             "get_sn_from_ui": self.test_control['get_sn_from_ui'],
             "test_sequences": self.test_control['test_sequences'],
@@ -92,5 +355,22 @@ class ProgressReporter:
         progress_json['operator_instructions'] = self.operator_instructions
         progress_json['report_paths'] = self.report_paths
 
-        self.test_control['progress'] = progress_json
-        self.progess_queue.put(json.dumps(progress_json, default=str))
+        progress = freeze(progress_json)
+        progress['duts'] = positions_dict
+        return progress, fragments
+
+    def _publish(self, progress, fragments=None):
+        """Publishes new version of the progress to test_control and the progress queue"""
+        previous = self.message
+        self.version += 1
+        self.published += 1
+        self.message = ProgressMessage(
+            self.version,
+            progress,
+            None if previous is None else previous.version,
+            None if previous is None else previous.progress,
+            fragments,
+        )
+        self.test_control['progress'] = progress
+        self.test_control['progress_message'] = self.message
+        self.progess_queue.put(self.message)
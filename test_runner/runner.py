@@ -1,13 +1,26 @@
 """Runs the test cases"""
+import concurrent.futures
+import copy
 import datetime
 import time
 import json
+import queue
 import threading
 import logging
 from unittest.mock import MagicMock
 from test_runner import progress_reporter
 from test_runner import helpers
+from test_runner import cancellation
 from test_runner import exceptions
+from test_runner import executor as task_executor
+from test_runner import scheduler
+from test_runner import test_order as fail_fast
+from test_runner import timing
+from test_runner import instrument_locks
+from test_runner import limits as limits_engine
+from test_runner import measurements
+from test_runner import event_loop
+from test_runner.test_run import TestRun
 import gaiaclient
 
 
@@ -256,6 +269,621 @@ def get_sn_externally(dut_sn_queue, common_definitions, logger):
         {"name": "external"}
     )
 
+def update_dicts(dict1, dict2):
+    if isinstance(dict1, dict):
+        for key, value in dict1.items():
+            if type(value) == dict:
+                if key in dict2 and isinstance(dict2[key], dict):
+                    update_dicts(dict1[key], dict2[key])
+            elif isinstance(dict2, dict):
+                if key in dict2:
+                    dict1[key] = dict2[key]
+
+    if isinstance(dict2, dict):
+        for key, value in dict2.items():
+            if not key in dict1:
+                dict1[key] = value
+
+    return dict1
+
+
+def copy_dicts(value):
+    """Returns copy of nested dictionaries. Other values, e.g. limit functions, are shared."""
+    if isinstance(value, dict):
+        return {key: copy_dicts(item) for key, item in value.items()}
+
+    return value
+
+
+# Merged limits by sequence name: source file mtimes, token of the test case parameters,
+# limits after update_test_case_params, their compiled limits and load count of the sequence
+_LIMITS_CACHE = {}
+_LIMITS_CACHE_LOCK = threading.Lock()
+
+
+def load_test_definitions(common_definitions, sequence_name, logger):
+    """Returns test definitions of the sequence, test case pool and compiled limits
+
+    Test pool limits are used as base limits and updated with sequence limits.
+    Merged limits are reused while source files of the sequence and test case pool
+    are not changed and get_test_case_params_token of common definitions returns
+    the same token (not None). Otherwise the sequence is reloaded, limits merged and
+    compiled, and update_test_case_params called once for the reloaded sequence.
+    The same LIMITS and compiled limits are used by all test runs of a cache entry,
+    so they must not be changed.
+    """
+
+    with _LIMITS_CACHE_LOCK:
+        # Fetch test definitions i.e. import module. Reloaded if source files are changed.
+        test_definitions = helpers.get_test_definitions(sequence_name, logger)
+
+        # Fetch test case pool too
+        test_pool = helpers.get_test_pool_definitions(logger)
+
+        mtimes = helpers.get_source_mtimes(test_definitions, test_pool)
+        get_token = getattr(common_definitions, 'get_test_case_params_token', None)
+        token = None
+        if get_token is not None:
+            token = get_token(common_definitions, sequence_name, logger)
+        cached = _LIMITS_CACHE.get(sequence_name)
+
+        if (
+            cached is not None
+            and token is not None
+            and cached[:2] == (mtimes, token)
+            and cached[4] == helpers.get_load_count(test_definitions)
+        ):
+            # Sequence module is the one merged and updated for the cache entry
+            logger.info("Use cached limits of sequence '%s'.", sequence_name)
+            return test_definitions, test_pool, cached[3]
+
+        if cached is not None:
+            logger.info("Test definitions or parameters of sequence '%s' changed.", sequence_name)
+
+            # Merging and update_test_case_params change the sequence module, so merge
+            # freshly loaded limits. Not loaded again if it was reloaded above.
+            if cached[4] == helpers.get_load_count(test_definitions):
+                test_definitions = helpers.get_test_definitions(sequence_name, logger, True)
+
+        # Sources of the limit functions of the previous sequence are not needed anymore
+        limits_engine.clear_source_cache()
+        merge_limits(sequence_name, test_definitions, test_pool, logger)
+        common_definitions.update_test_case_params(
+            common_definitions, sequence_name, test_definitions, logger
+        )
+        compiled_limits = limits_engine.CompiledLimits(getattr(test_definitions, 'LIMITS', {}))
+        _LIMITS_CACHE[sequence_name] = (
+            mtimes,
+            token,
+            getattr(test_definitions, 'LIMITS', None),
+            compiled_limits,
+            helpers.get_load_count(test_definitions),
+        )
+
+    return test_definitions, test_pool, compiled_limits
+
+
+def merge_limits(sequence_name, test_definitions, test_pool, logger):
+    """Merges test pool limits to test definitions
+
+    Limits of the modules are copied, so the test pool is not changed.
+    """
+
+    if hasattr(test_definitions, "LIMITS") and hasattr(test_pool, "LIMITS"):
+        logger.info("Use test pool limits as base limits and update them with sequence '%s' limits.", sequence_name)
+        seq_limits = copy_dicts(test_definitions.LIMITS)
+        test_definitions.LIMITS = copy_dicts(test_pool.LIMITS)
+        test_definitions.LIMITS = update_dicts(test_definitions.LIMITS, seq_limits)
+    elif not hasattr(test_definitions, "LIMITS") and hasattr(test_pool, "LIMITS"):
+        logger.info("Sequence '%s' has no defined limits. Use test pool limits as base limits.", sequence_name)
+        setattr(test_definitions, "LIMITS", copy_dicts(test_pool.LIMITS))
+
+
+def get_test_graph(common_definitions, test_definitions, test_pool, test_case_names, logger):
+    """Returns dependency graph of the test cases or None if test cases are run in TESTS order"""
+
+    # Test cases are run along dependency graph if the sequence defines DEPENDS
+    test_graph = None
+    if getattr(test_definitions, 'DEPENDS', None):
+        if common_definitions.PARALLEL_EXECUTION == 'PER_TEST_CASE':
+            logger.warning(
+                "DEPENDS is not supported with PER_TEST_CASE. Run test cases in TESTS order."
+            )
+        else:
+            logger.info("Run test cases along dependency graph. '_pre' steps are ignored.")
+            test_graph = scheduler.DependencyGraph(
+                [t for t in test_case_names if '_pre' not in t],
+                test_definitions.DEPENDS,
+                [t for t in test_definitions.TESTS if '_pre' not in t],
+            )
+
+    # When test cases declare their instruments, test positions don't need to run
+    # test cases in lockstep. Instrument locks take care of the shared instruments.
+    elif common_definitions.PARALLEL_EXECUTION == 'PARALLEL' and any(
+        getattr(
+            getattr(test_definitions, t, getattr(test_pool, t, None)),
+            'REQUIRED_INSTRUMENTS',
+            None,
+        )
+        for t in test_case_names
+    ):
+        logger.info("Test cases define REQUIRED_INSTRUMENTS. Run test positions independently.")
+        logger.warning(
+            "Test positions are not in lockstep: prepare_test_case is called once per test case, "
+            "when the first test position starts it."
+        )
+        # '_pre' steps start pre_test on background as in TESTS order
+        test_graph = scheduler.DependencyGraph(
+            test_case_names,
+            {t: [test_case_names[i - 1]] for i, t in enumerate(test_case_names) if i > 0},
+        )
+
+    return test_graph
+
+
+def route_sn_messages(dut_sn_queue, position_sn_queues, common_definitions, logger):
+    """Routes serial numbers from UI or external source to the queues of the test positions
+
+    Each test position takes its own DUT as soon as its serial number is received.
+    """
+    while True:
+        msg = dut_sn_queue.get()
+
+        try:
+            msg = json.loads(msg)
+        except (TypeError, json.decoder.JSONDecodeError):
+            continue
+
+        if not isinstance(msg, dict):
+            continue
+
+        sequence_name = msg.get('sequence')
+        if sequence_name not in common_definitions.TEST_SEQUENCES:
+            sequence_name = None
+
+        for position_name, sn_queue in position_sn_queues.items():
+            if msg.get(position_name) in [None, "null", '']:
+                continue
+
+            logger.info("Received DUT pos. %s SN is %s", position_name, msg[position_name])
+            sn_queue.put(
+                {
+                    'sn': msg[position_name],
+                    'sequence': sequence_name,
+                    'order': msg.get('order', ''),
+                    'operator': msg.get('operator') or "Not available",
+                    'test_cases': msg.get('testCases'),
+                    'running_mode': msg.get('running_mode'),
+                }
+            )
+
+
+def run_test_position(
+    test_control,
+    common_definitions,
+    progress,
+    executor,
+    instrument_lock_handler,
+    test_order,
+    test_case_timing,
+    db_handler,
+    test_positions,
+    test_position,
+    sn_queue,
+    station_lock,
+    send_message,
+    logger,
+):
+    """Runs test runs of one test position: get SN, prepare, test, report and release"""
+
+    while not test_control['terminate']:
+        # Wait until you are allowed to run again i.e. pause
+        test_control['run'].wait()
+        logger.info("Start new test run on test position %s", test_position.name)
+
+        try:
+            # Instruments, parameters and statistics are shared by all test positions
+            with station_lock:
+                common_definitions.handle_instrument_status(progress, logger)
+                common_definitions.update_parameters(common_definitions, logger)
+                update_test_control(test_control, common_definitions)
+
+                if db_handler:
+                    db_handler.clean_db()
+                    if isinstance(db_handler, MagicMock):
+                        progress.set_progress(statistics={'statistics': 'mocked'})
+                    else:
+                        progress.set_progress(statistics=db_handler.get_statistics())
+
+            # Station wide general_state is not changed, test runs are followed per test position
+            test_position.prepare_for_new_test_run()
+            test_position.status = 'prepare'
+            progress.set_progress(test_positions=test_positions)
+
+            order = ""
+            operator_info = {"name": "Not available"}
+            test_cases_override = None
+            running_mode = common_definitions.RUNNING_MODES[0]
+
+            if sn_queue is not None:
+                dut_info = None
+                while dut_info is None and not test_control['terminate']:
+                    try:
+                        dut_info = sn_queue.get(timeout=1)
+                    except queue.Empty:
+                        pass
+
+                if dut_info is None:
+                    break
+
+                sequence_name = dut_info.pop('sequence')
+                order = dut_info.pop('order')
+                operator_info = {"name": dut_info.pop('operator')}
+                test_cases_override = dut_info.pop('test_cases')
+
+                if dut_info['running_mode'] in common_definitions.RUNNING_MODES:
+                    running_mode = dut_info['running_mode']
+                dut_info.pop('running_mode')
+                if 'gage' in running_mode.lower():
+                    logger.warning(
+                        "Gage R&R is not supported with INDEPENDENT_TEST_POSITIONS. "
+                        "Run in %s mode.",
+                        common_definitions.RUNNING_MODES[0],
+                    )
+                    running_mode = common_definitions.RUNNING_MODES[0]
+
+                # If sequence was not selected, get it from identify_DUTs
+                if sequence_name is None:
+                    sequence_name = common_definitions.identify_DUTs(
+                        {test_position.name: dut_info}, common_definitions.INSTRUMENTS, logger
+                    )
+                    if not isinstance(sequence_name, str):
+                        sequence_name = sequence_name[1]
+            else:
+                (dut_sn_values, sequence_name, operator_info,) = common_definitions.identify_DUTs(
+                    None, common_definitions.INSTRUMENTS, logger
+                )
+                dut_info = dut_sn_values.get(test_position.name)
+
+                if not dut_info or dut_info.get("sn") in [None, "null", '']:
+                    logger.info("No DUT on test position %s", test_position.name)
+                    time.sleep(1)
+                    continue
+
+            # Test run starts. Abort of the test runs before is cleared.
+            test_position.abort = False
+
+            common_definitions.prepare_test(
+                common_definitions.INSTRUMENTS,
+                logger,
+                {test_position.name: dut_info},
+                sequence_name,
+            )
+
+            test_position.dut = common_definitions.parse_dut_info(
+                dut_info, test_position.name, order
+            )
+            own_test_positions = {test_position.name: test_position}
+
+            results = {
+                "sequence": sequence_name,
+                "operator": operator_info,
+                "tester": common_definitions.get_tester_info(),
+            }
+
+            test_definitions, test_pool, compiled_limits = load_test_definitions(
+                common_definitions, sequence_name, logger
+            )
+            test_case_names = [t for t in test_definitions.TESTS if t not in test_definitions.SKIP]
+
+            if test_order is not None:
+                test_case_names = test_order.apply(
+                    db_handler, sequence_name, test_definitions, test_case_names
+                )
+
+            if test_cases_override is not None and test_cases_override.get(sequence_name):
+                test_cases_override = [t['name'] for t in test_cases_override[sequence_name]]
+            else:
+                test_cases_override = None
+
+            logger.info("Running mode: %s", running_mode)
+
+            start_time_epoch = time.time()
+            start_time = datetime.datetime.now()
+            start_time_monotonic = time.monotonic()
+
+            test_run = TestRun(
+                test_control,
+                common_definitions,
+                test_definitions,
+                test_pool,
+                progress,
+                executor,
+                instrument_lock_handler,
+                db_handler,
+                send_message,
+                logger,
+                compiled_limits,
+            )
+            test_run.test_positions = own_test_positions
+            test_run.sequence_name = sequence_name
+            test_run.runner_thread_ident = threading.get_ident()
+            test_run.test_run_id = common_definitions.get_test_run_id(start_time_epoch)
+            test_run.test_cases_override = test_cases_override
+            test_run.test_case_names = test_case_names
+            test_run.test_graph = get_test_graph(
+                common_definitions, test_definitions, test_pool, test_case_names, logger
+            )
+
+            test_position.status = 'testing'
+            progress.set_progress(test_positions=test_positions, sequence_name=sequence_name)
+
+            test_run.run_test_cases(test_position.name, test_position)
+
+            test_run.join_post_tests()
+
+            if test_control['retest_on_fail']:
+                test_run.retest_failed_cases(test_position.name, test_position)
+
+            dut = test_position.dut
+            results[dut.serial_number] = dut.test_cases
+
+            if test_order is not None:
+                test_order.record(sequence_name, dut)
+            test_case_timing.add(sequence_name, dut)
+
+            aborted = test_run.is_aborted(test_position)
+            if aborted:
+                dut.pass_fail_result = 'abort'
+
+            if dut.pass_fail_result == 'error':
+                errors = [
+                    f"{case_name}: {case['error']}"
+                    for case_name, case in dut.test_cases.items()
+                    if case['result'] == 'error' and 'error' in case
+                ]
+                send_message(f"{dut.serial_number}: ERROR: " + ', '.join(errors))
+                test_position.test_status = 'error'
+            elif dut.pass_fail_result == 'pass':
+                send_message(f"{dut.serial_number}: PASSED")
+                test_position.test_status = 'pass'
+            else:
+                send_message(f"{dut.serial_number}: FAILED: {', '.join(dut.failed_steps)}")
+                test_position.test_status = 'fail'
+
+            results["start_time"] = start_time
+            results["start_time_epoch"] = start_time_epoch
+            results["end_time"] = datetime.datetime.now()
+            results["test_run_id"] = test_run.test_run_id
+            results["running_mode"] = running_mode
+            results["test_order"] = test_case_names
+            results["duration_s"] = round(time.monotonic() - start_time_monotonic, 2)
+            results["performance"] = {
+                'test_case_timing': test_case_timing.statistics(sequence_name),
+            }
+
+            if aborted:
+                logger.warning("Test aborted on test position %s.", test_position.name)
+                test_position.status = 'abort'
+                progress.set_progress(test_positions=test_positions)
+                common_definitions.test_aborted(common_definitions.INSTRUMENTS, logger)
+            else:
+                test_position.status = 'finalize'
+                progress.set_progress(test_positions=test_positions)
+                common_definitions.finalize_test(
+                    dut.pass_fail_result,
+                    own_test_positions,
+                    common_definitions.INSTRUMENTS,
+                    logger,
+                )
+
+            if not test_control['report_off']:
+                common_definitions.create_report(
+                    json.dumps(results, indent=4, default=measurements.json_default),
+                    measurements.to_dicts(results),
+                    own_test_positions,
+                    test_definitions.PARAMETERS,
+                    db_handler,
+                    common_definitions,
+                    progress,
+                    0,
+                    True,
+                )
+
+        except Exception as ex:
+            logger.exception("Error on test position %s", test_position.name)
+            logger.exception(str(ex))
+
+        if test_control['single_run']:
+            break
+
+
+def run_independent_test_positions(
+    test_control,
+    common_definitions,
+    progress,
+    executor,
+    instrument_lock_handler,
+    test_order,
+    test_case_timing,
+    db_handler,
+    test_positions,
+    dut_sn_queue,
+    send_message,
+    logger,
+):
+    """Runs test positions independently until testing is terminated
+
+    Each test position gets its DUT, tests, reports and releases it without
+    waiting for the other test positions.
+    """
+    if common_definitions.LOOP_EXECUTION:
+        logger.warning(
+            "LOOP_EXECUTION is not supported with INDEPENDENT_TEST_POSITIONS. "
+            "Each DUT is tested once."
+        )
+
+    progress.set_progress(general_state='testing', test_positions=test_positions)
+
+    position_sn_queues = {name: None for name in test_positions}
+
+    if test_control['get_sn_from_ui'] or test_control['get_sn_externally']:
+        position_sn_queues = {name: queue.Queue() for name in test_positions}
+        router = threading.Thread(
+            target=route_sn_messages,
+            args=(dut_sn_queue, position_sn_queues, common_definitions, logger),
+            name='sn_router_thread',
+        )
+        router.daemon = True
+        router.start()
+
+    station_lock = threading.Lock()
+
+    test_position_runs = [
+        executor.submit(
+            name,
+            run_test_position,
+            test_control,
+            common_definitions,
+            progress,
+            executor,
+            instrument_lock_handler,
+            test_order,
+            test_case_timing,
+            db_handler,
+            test_positions,
+            position,
+            position_sn_queues[name],
+            station_lock,
+            send_message,
+            logger,
+        )
+        for name, position in test_positions.items()
+    ]
+
+    while True:
+        _, not_done = concurrent.futures.wait(test_position_runs, timeout=cancellation.ABORT_POLL_S)
+
+        # Abort is meant for the test runs in progress, not for the next ones
+        if test_control['abort']:
+            test_control['abort'] = False
+            for position in test_positions.values():
+                position.abort = True
+
+        if not not_done:
+            break
+
+    task_executor.join(test_position_runs, logger)
+
+    test_control['terminate'] = True
+
+
+def finish_test_run(
+    common_definitions,
+    progress,
+    db_handler,
+    results,
+    test_positions,
+    parameters,
+    pass_fail_result,
+    finalize,
+    report,
+    send_message,
+    logger,
+    pipeline=None,
+):
+    """Finalizes test and creates report while the next test run is prepared
+
+    results and test_positions must be a snapshot, see snapshot_test_run, as the next
+    test run clears the test positions. The time the next test run was prepared during
+    finalizing is reported as pipeline_overlap_s of this test run. pipeline is shared
+    with wait_previous_test_run, which marks when the next test run started to wait.
+    Returns start and end time of finalizing and reporting.
+    """
+    start = time.monotonic()
+
+    if finalize:
+        try:
+            common_definitions.finalize_test(
+                pass_fail_result, test_positions, common_definitions.INSTRUMENTS, logger
+            )
+        except Exception as e:
+            logger.error("Error while finalizing test")
+            logger.exception(e)
+
+    if report:
+        if pipeline is not None:
+            report_start = time.monotonic()
+            waiting = pipeline['next_run_waiting']
+            results.setdefault('performance', {})['pipeline_overlap_s'] = round(
+                max(0.0, min(report_start, report_start if waiting is None else waiting) - start),
+                2,
+            )
+
+        try:
+            common_definitions.create_report(
+                json.dumps(results, indent=4, default=measurements.json_default),
+                measurements.to_dicts(results),
+                test_positions,
+                parameters,
+                db_handler,
+                common_definitions,
+                progress,
+                0,
+                True,
+            )
+        except Exception as e:
+            progress.set_progress(general_state="Error")
+            send_message("Error while generating a test report")
+            send_message(str(e))
+            logger.error("Error while generating a test report")
+            logger.exception(e)
+
+    return start, time.monotonic()
+
+
+def snapshot_test_run(results, test_positions):
+    """Returns copies of results and test positions of a test run for finish_test_run
+
+    The next test run reuses the test positions, and results of the DUTs are dictionaries
+    that can be changed in place. DUTs and results are copied together, so the results
+    still refer to the test cases of the copied DUTs.
+    """
+    memo = {}
+    results = copy.deepcopy(results, memo)
+    snapshot = {}
+
+    for name, position in test_positions.items():
+        snapshot[name] = copy.copy(position)
+        snapshot[name].dut = copy.deepcopy(position.dut, memo)
+        snapshot[name].previous_dut = copy.deepcopy(position.previous_dut, memo)
+        snapshot[name].test_case_instances = dict(position.test_case_instances)
+
+    return results, snapshot
+
+
+def wait_previous_test_run(previous_test_run, logger):
+    """Waits until finalizing and reporting of the previous test run is done
+
+    previous_test_run is the future of finish_test_run and its pipeline.
+    """
+    finishing, pipeline = previous_test_run
+    wait_start = time.monotonic()
+    pipeline['next_run_waiting'] = wait_start
+
+    try:
+        start, end = finishing.result()
+    except Exception as e:
+        logger.error("Error while finishing previous test run")
+        logger.exception(e)
+        return
+
+    logger.info(
+        "Finishing previous test run overlapped %s s with preparing this test run.",
+        round(max(0.0, min(end, wait_start) - start), 2),
+    )
+
+
 def run_test_runner(test_control, message_queue, progess_queue, dut_sn_queue, listener_args):
     """Starts the testing"""
 
@@ -267,7 +895,12 @@ def run_test_runner(test_control, message_queue, progess_queue, dut_sn_queue, li
 
     common_definitions = get_common_definitions()
 
-    progress = progress_reporter.ProgressReporter(test_control, progess_queue)
+    progress = progress_reporter.ProgressReporter(
+        test_control,
+        progess_queue,
+        getattr(common_definitions, 'PROGRESS_WINDOW_S', 0.05),
+        getattr(common_definitions, 'PROGRESS_MAX_RATE', 20),
+    )
 
     progress.set_progress(general_state="Boot")
 
@@ -319,6 +952,33 @@ def run_test_runner(test_control, message_queue, progess_queue, dut_sn_queue, li
     for position in common_definitions.TEST_POSITIONS:
         test_positions[position.name] = position
 
+    # Processes for CPU heavy work offloaded by test cases
+    task_executor.start_process_pool(getattr(common_definitions, 'PROCESS_POOL_WORKERS', 0))
+
+    # Long-lived workers: one per test position and shared pools for test cases run along
+    # dependency graph, pre-tests and post-tests
+    background_workers = getattr(
+        common_definitions, 'BACKGROUND_WORKERS', 2 * len(common_definitions.TEST_POSITIONS)
+    )
+    executor = task_executor.Executor(
+        test_positions,
+        background_workers,
+        getattr(common_definitions, 'POST_PROCESSING_PER_POSITION', 2),
+        getattr(common_definitions, 'POST_PROCESSING_PER_STATION', background_workers),
+        getattr(common_definitions, 'PRE_TEST_WORKERS', background_workers),
+    )
+
+    # Locks of instruments declared by test cases in REQUIRED_INSTRUMENTS
+    instrument_lock_handler = instrument_locks.InstrumentLocks()
+
+    # Optional fail-fast ordering of test cases based on their failure history
+    test_order = None
+    if getattr(common_definitions, 'FAIL_FAST_ORDERING', False):
+        test_order = fail_fast.FailFastOrder(logger)
+
+    # Durations of test case phases per sequence
+    test_case_timing = timing.TestCaseTiming()
+
     gage_progress = {
         "operator": 0,
         "dut": 0,
@@ -331,12 +991,38 @@ def run_test_runner(test_control, message_queue, progess_queue, dut_sn_queue, li
 
     progress.set_progress(general_state="Initialized")
 
+    # Each test position runs its own test runs
+    if getattr(common_definitions, 'INDEPENDENT_TEST_POSITIONS', False):
+        run_independent_test_positions(
+            test_control,
+            common_definitions,
+            progress,
+            executor,
+            instrument_lock_handler,
+            test_order,
+            test_case_timing,
+            db_handler,
+            test_positions,
+            dut_sn_queue,
+            send_message,
+            logger,
+        )
+
+    # Finalizing and reporting of a test run is done while the next test run is prepared
+    pipelined = getattr(common_definitions, 'PIPELINED_TEST_RUNS', False)
+    if pipelined and common_definitions.LOOP_EXECUTION:
+        logger.warning("PIPELINED_TEST_RUNS is not supported with LOOP_EXECUTION.")
+        pipelined = False
+    previous_test_run = None
+
     # Start the actual test loop
     while not test_control['terminate']:
         # Wait until you are allowed to run again i.e. pause
         test_control['run'].wait()
         logger.info("Start new test run")
 
+        finalize_pending = False
+
         try:
             test_control['abort'] = False
 
@@ -424,6 +1110,17 @@ def run_test_runner(test_control, message_queue, progess_queue, dut_sn_queue, li
                 (dut_sn_values, sequence_name, operator_info,) = common_definitions.identify_DUTs(
                     None, common_definitions.INSTRUMENTS, logger
                 )
+
+            # Fetch test definitions i.e. import module. Test pool limits are merged to them.
+            test_definitions, test_pool, compiled_limits = load_test_definitions(
+                common_definitions, sequence_name, logger
+            )
+
+            # DUTs of the previous test run must be finalized before preparing new ones
+            if previous_test_run is not None:
+                wait_previous_test_run(previous_test_run, logger)
+                previous_test_run = None
+
             common_definitions.prepare_test(
                 common_definitions.INSTRUMENTS, logger, dut_sn_values, sequence_name
             )
@@ -444,46 +1141,18 @@ def run_test_runner(test_control, message_queue, progess_queue, dut_sn_queue, li
                 "tester": common_definitions.get_tester_info()
             }
 
-            # Fetch test definitions i.e. import module
-            test_definitions = helpers.get_test_definitions(sequence_name, logger)
-
-            # Fetch test case pool too
-            test_pool = helpers.get_test_pool_definitions(logger)
-
-            def update_dicts(dict1, dict2):
-                if isinstance(dict1, dict):
-                    for key, value in dict1.items():
-                        if type(value) == dict:
-                            if key in dict2 and isinstance(dict2[key], dict):
-                                update_dicts(dict1[key], dict2[key])
-                        elif isinstance(dict2, dict):
-                            if key in dict2:
-                                dict1[key] = dict2[key]
-
-                if isinstance(dict2, dict):
-                    for key, value in dict2.items():
-                        if not key in dict1:
-                            dict1[key] = value
-
-                return dict1
-
-            if hasattr(test_definitions, "LIMITS") and hasattr(test_pool, "LIMITS"):
-                logger.info("Use test pool limits as base limits and update them with sequence '%s' limits.", sequence_name)
-                seq_limits = test_definitions.LIMITS.copy()
-                test_definitions.LIMITS = test_pool.LIMITS.copy()
-                test_definitions.LIMITS = update_dicts(test_definitions.LIMITS, seq_limits)
-            elif not hasattr(test_definitions, "LIMITS") and hasattr(test_pool, "LIMITS"):
-                logger.info("Sequence '%s' has no defined limits. Use test pool limits as base limits.", sequence_name)
-                setattr(test_definitions, "LIMITS", test_pool.LIMITS)
-
-            # Update test limits and testcases
-            common_definitions.update_test_case_params(
-                common_definitions, sequence_name, test_definitions, logger
-            )
-
             # Remove skipped test_case_names from test list
             test_case_names = [t for t in test_definitions.TESTS if t not in test_definitions.SKIP]
 
+            if test_order is not None:
+                test_case_names = test_order.apply(
+                    db_handler, sequence_name, test_definitions, test_case_names
+                )
+
+            test_graph = get_test_graph(
+                common_definitions, test_definitions, test_pool, test_case_names, logger
+            )
+
             start_time_epoch = time.time()
             start_time = datetime.datetime.now()
             start_time_monotonic = time.monotonic()
@@ -504,185 +1173,25 @@ def run_test_runner(test_control, message_queue, progess_queue, dut_sn_queue, li
             else:
                 gage_progress = gage_empty_progress.copy()
 
-            background_pre_tasks = {}
-            background_post_tasks = []
-
-            def parallel_run(test_position_name, test_position_instance, test_case_name, sync_test_cases=False):
-
-                if test_control['abort']:
-                    send_message("Test aborted")
-                    logger.warning("Test aborted")
-                    return
-
-                if test_cases_override and test_case_name not in test_cases_override:
-                    return
-
-                if not test_position_instance.dut or test_position_instance.stop_testing:
-                    return
-
-                is_pre_test = False
-                if '_pre' in test_case_name:
-                    is_pre_test = True
-
-                test_case_name = test_case_name.replace('_pre', '').replace('_pre', '')
-
-                def new_test_instance(the_case, the_position_instance):
-                    if hasattr(test_definitions, the_case):
-                        test_instance = getattr(test_definitions, the_case)(
-                            test_definitions.LIMITS,
-                            progress,
-                            the_position_instance.dut,
-                            test_definitions.PARAMETERS,
-                            db_handler,
-                            common_definitions,
-                        )
-                    elif hasattr(test_pool, the_case):
-                        test_instance = getattr(test_pool, the_case)(
-                            test_definitions.LIMITS,
-                            progress,
-                            the_position_instance.dut,
-                            test_definitions.PARAMETERS,
-                            db_handler,
-                            common_definitions,
-                        )
-                    else:
-                        raise exceptions.TestCaseNotFound(
-                            "Cannot find specified test case: " + the_case
-                        )
-                    return test_instance
-
-                # Create test case instance
-                if test_case_name not in test_position_instance.test_case_instances:
-                    test_position_instance.test_case_instances[
-                        test_case_name
-                    ] = new_test_instance(test_case_name, test_position_instance)
-                test_instance = test_position_instance.test_case_instances[test_case_name]
-                test_instance.test_position = test_position_instance
-                test_instance.test_run_id = test_run_id
-
-                if sync_test_cases and all_pos_mid_test_cases_completed is not None:
-                    test_instance.thread_barrier = all_pos_mid_test_cases_completed
-                    test_instance.thread_barrier_reset = mid_case_reset_barrier
-
-                try:
-                    if is_pre_test:
-                        # Start pre task and store it to dictionary
-                        if test_case_name not in background_pre_tasks:
-                            background_pre_tasks[test_case_name] = {}
-
-                        background_pre_tasks[test_case_name][
-                            test_position_name
-                        ] = threading.Thread(target=test_instance.run_pre_test)
-                        background_pre_tasks[test_case_name][test_position_name].start()
-                    else:
-                        # Wait for pre task
-                        if (
-                            test_case_name in background_pre_tasks
-                            and test_position_name in background_pre_tasks[test_case_name]
-                        ):
-                            background_pre_tasks[test_case_name][test_position_name].join()
-                        else:
-                            # Or if pre task is not run, run it now
-                            test_instance.run_pre_test()
-
-                        test_position_instance.test_status = "Testing"
-                        progress.set_progress(
-                            general_state='testing',
-                            test_position=test_positions,
-                            sequence_name=sequence_name,
-                        )
-                        # Run the actual test case
-                        test_instance.run_test()
-
-                        # Synchronize parallel per test case testing
-                        if sync_test_cases and all_pos_test_cases_completed is not None:
-                            if all_pos_test_cases_completed.parties > 1:
-                                logger.info(
-                                    "Test case completed thread for test position "
-                                    "%s is waiting for other %s threads.",
-                                    test_position_instance.name,
-                                    (
-                                        all_pos_test_cases_completed.parties -
-                                        all_pos_test_cases_completed.n_waiting
-                                        - 1
-                                    )
-                                )
-                            i_thread_wait = all_pos_test_cases_completed.wait(
-                                common_definitions.PARALLEL_SYNC_COMPLETED_TEST_TIMEOUT
-                            )
-                            if i_thread_wait == 0:
-                                logger.info(
-                                    "All threads have synced test case completion."
-                                )
-                                all_pos_test_cases_completed.reset()
-
-                        progress.set_progress(
-                            general_state='testing',
-                            test_positions=test_positions,
-                            sequence_name=sequence_name,
-                        )
-
-                        test_position_instance.test_status = (
-                            "Aborting" if test_control['abort'] else "Idle"
-                        )
-
-                        # Start post task and store it to list
-
-                        bg_task = threading.Thread(target=test_instance.run_post_test)
-                        bg_task.start()
-
-                        background_post_tasks.append(bg_task)
-
-                except Exception as err:
-
-                    if isinstance(err, gaiaclient.GaiaError):
-                        logger.error("Caught Gaia error, abort testing.")
-                        test_control['abort'] = True
-
-                    if sync_test_cases:
-                        if all_pos_mid_test_cases_completed is not None:
-                            logger.info(
-                                "Abort mid test case thread barrier."
-                            )
-                            all_pos_mid_test_cases_completed.abort()
-                        if all_pos_test_cases_completed is not None:
-                            logger.info(
-                                "Abort completed test case thread barrier."
-                            )
-                            all_pos_test_cases_completed.abort()
-
-                    trace = []
-                    trace_back = err.__traceback__
-                    while trace_back is not None:
-                        trace.append(
-                            {
-                                "filename": trace_back.tb_frame.f_code.co_filename,
-                                "name": trace_back.tb_frame.f_code.co_name,
-                                "line": trace_back.tb_lineno,
-                            }
-                        )
-                        trace_back = trace_back.tb_next
-
-                    err_dict = {
-                        'type': type(err).__name__,
-                        'message': str(err),
-                        'trace': trace,
-                    }
-
-                    test_instance.handle_error(error=err_dict)
-
-                else:
-                    # No error and no active tests
-                    test_position_instance.status = (
-                        "Aborting" if test_control['abort'] else "Idle"
-                    )
-                    test_position_instance.step = None
-
-                    progress.set_progress(
-                        general_state='testing',
-                        test_positions=test_positions,
-                        sequence_name=sequence_name,
-                    )
+            test_run = TestRun(
+                test_control,
+                common_definitions,
+                test_definitions,
+                test_pool,
+                progress,
+                executor,
+                instrument_lock_handler,
+                db_handler,
+                send_message,
+                logger,
+                compiled_limits,
+            )
+            test_run.test_positions = test_positions
+            test_run.sequence_name = sequence_name
+            test_run.test_run_id = test_run_id
+            test_run.test_cases_override = test_cases_override
+            test_run.test_case_names = test_case_names
+            test_run.test_graph = test_graph
 
             loop_testing = True  # Execute at least one loop
             loop_cycle = 1
@@ -691,9 +1200,9 @@ def run_test_runner(test_control, message_queue, progess_queue, dut_sn_queue, li
                 logger.info("Start %s.", "test loop" if loop_testing else "test")
                 background_test_runs = []
                 sync_test_cases = common_definitions.PARALLEL_EXECUTION == 'PER_TEST_CASE'
-                all_pos_test_cases_completed = None
-                all_pos_mid_test_cases_completed = None
-                mid_case_reset_barrier = None
+                test_run.all_pos_test_cases_completed = None
+                test_run.all_pos_mid_test_cases_completed = None
+                test_run.mid_case_reset_barrier = None
 
                 loop_start_time_epoch = time.time()
                 loop_start_time = datetime.datetime.now()
@@ -722,15 +1231,13 @@ def run_test_runner(test_control, message_queue, progess_queue, dut_sn_queue, li
                                 logger.debug("Clear measurements for test case %s", test_case)
                                 test_position_instance.test_case_instances[test_case].clear_measurements()
 
-                    # Run test cases for each DUT in test position fully parallel
-                    for test_case in test_case_names:
-                        background_test_runs = []
-                        common_definitions.prepare_test_case(
-                            common_definitions.INSTRUMENTS, logger, test_positions, sequence_name, test_case
-                        )
+                    if test_graph is not None:
+                        # Run test cases of each DUT along the dependency graph.
+                        # Test positions are not synced between test cases.
+                        test_run.prepared_test_cases.clear()
+                        test_graph_runs = []
 
                         for test_position_name, test_position_instance in test_positions.items():
-
                             if (
                                 test_position_instance.stop_looping
                                 or test_position_instance.stop_testing
@@ -743,54 +1250,94 @@ def run_test_runner(test_control, message_queue, progess_queue, dut_sn_queue, li
                                 )
                                 continue
 
-                            # Fill DUT data
-                            test_position_instance.step = test_case
-                            test_position_instance.status = 'testing'
-
-                            background_test_run = threading.Thread(
-                                target=parallel_run, args=(
+                            test_graph_runs.append(
+                                executor.submit(
+                                    test_position_name,
+                                    test_run.run_test_graph,
                                     test_position_name,
                                     test_position_instance,
-                                    test_case,
-                                    sync_test_cases
                                 )
                             )
-                            background_test_runs.append(background_test_run)
 
-                        amount_threads = len(background_test_runs)
-                        logger.info("Amount of test threads: %s", amount_threads)
+                        task_executor.join(test_graph_runs, logger)
 
-                        if sync_test_cases:
-                            if common_definitions.PARALLEL_SYNC_PER_TEST_CASE in ['MID', 'BOTH']:
-                                all_pos_mid_test_cases_completed = threading.Barrier(
-                                    amount_threads
-                                )
-                                mid_case_reset_barrier = threading.Barrier(
-                                    amount_threads
-                                )
-                            if common_definitions.PARALLEL_SYNC_PER_TEST_CASE in ['COMPLETED', 'BOTH']:
-                                all_pos_test_cases_completed = threading.Barrier(
-                                    amount_threads
-                                )
-                            if (
-                                all_pos_mid_test_cases_completed is None and
-                                all_pos_test_cases_completed is None
-                            ):
-                                raise Exception(
-                                    "Unknown common_definiton.PARALLEL_SYNC_PER_TEST_CASE parameter"
+                    # Run test cases for each DUT in test position fully parallel
+                    else:
+                        for test_case in test_case_names:
+                            background_test_runs = []
+                            common_definitions.prepare_test_case(
+                                common_definitions.INSTRUMENTS, logger, test_positions, sequence_name, test_case
+                            )
+
+                            for test_position_name, test_position_instance in test_positions.items():
+
+                                if (
+                                    test_position_instance.stop_looping
+                                    or test_position_instance.stop_testing
+                                    or test_position_instance.dut is None
+                                ):
+                                    test_position_instance.stop_looping = True
+                                    logger.info(
+                                        "Skip position %s from test loop",
+                                        test_position_instance.name
+                                    )
+                                    continue
+
+                                # Fill DUT data
+                                test_position_instance.step = test_case
+                                test_position_instance.status = 'testing'
+
+                                background_test_runs.append(
+                                    (test_position_name, test_position_instance, test_case)
                                 )
 
-                        progress.set_progress(
-                            general_state='testing',
-                            test_positions=test_positions,
-                            sequence_name=sequence_name,
-                        )
+                            amount_threads = len(background_test_runs)
+                            logger.info("Amount of test threads: %s", amount_threads)
+
+                            if sync_test_cases:
+                                if common_definitions.PARALLEL_SYNC_PER_TEST_CASE in ['MID', 'BOTH']:
+                                    test_run.all_pos_mid_test_cases_completed = cancellation.CancellableBarrier(
+                                        amount_threads
+                                    )
+                                    test_run.mid_case_reset_barrier = cancellation.CancellableBarrier(
+                                        amount_threads
+                                    )
+                                if common_definitions.PARALLEL_SYNC_PER_TEST_CASE in ['COMPLETED', 'BOTH']:
+                                    test_run.all_pos_test_cases_completed = cancellation.CancellableBarrier(
+                                        amount_threads
+                                    )
+                                if (
+                                    test_run.all_pos_mid_test_cases_completed is None and
+                                    test_run.all_pos_test_cases_completed is None
+                                ):
+                                    raise Exception(
+                                        "Unknown common_definiton.PARALLEL_SYNC_PER_TEST_CASE parameter"
+                                    )
 
-                        for test_run in background_test_runs:
-                            test_run.start()
+                            progress.set_progress(
+                                general_state='testing',
+                                test_positions=test_positions,
+                                sequence_name=sequence_name,
+                            )
 
-                        for test_run in background_test_runs:
-                            test_run.join()
+                            task_executor.join(
+                                [
+                                    executor.submit(
+                                        test_position_name,
+                                        test_run.run_test_case,
+                                        test_position_name,
+                                        test_position_instance,
+                                        test_case,
+                                        sync_test_cases,
+                                    )
+                                    for (
+                                        test_position_name,
+                                        test_position_instance,
+                                        test_case,
+                                    ) in background_test_runs
+                                ],
+                                logger,
+                            )
 
                 elif common_definitions.PARALLEL_EXECUTION == 'PER_DUT':
 
@@ -810,19 +1357,46 @@ def run_test_runner(test_control, message_queue, progess_queue, dut_sn_queue, li
                             )
                             continue
 
+                        if test_graph is not None:
+                            test_run.prepared_test_cases.clear()
+                            executor.submit(
+                                test_position_name,
+                                test_run.run_test_graph,
+                                test_position_name,
+                                test_position_instance,
+                            ).result()
+                            continue
+
                         for test_case in test_case_names:
-                            parallel_run(
+                            executor.submit(
+                                test_position_name,
+                                test_run.run_test_case,
                                 test_position_name,
                                 test_position_instance,
                                 test_case,
-                                sync_test_cases
-                            )
+                                sync_test_cases,
+                            ).result()
 
                 else:
                     raise Exception("Unknown test test_control.parallel_execution parameter")
 
-                for task in background_post_tasks:
-                    task.join()
+                test_run.join_post_tests()
+
+                # Re-run failed test cases of each test position
+                if test_control['retest_on_fail']:
+                    task_executor.join(
+                        [
+                            executor.submit(
+                                test_position_name,
+                                test_run.retest_failed_cases,
+                                test_position_name,
+                                test_position_instance,
+                            )
+                            for test_position_name, test_position_instance in test_positions.items()
+                            if test_position_instance.dut
+                        ],
+                        logger,
+                    )
 
                 for test_position_name, test_position_instance in test_positions.items():
 
@@ -834,6 +1408,10 @@ def run_test_runner(test_control, message_queue, progess_queue, dut_sn_queue, li
                         results[dut.serial_number] = {}
                     results[dut.serial_number][loop_cycle] = dut.test_cases.copy()
 
+                    if test_order is not None:
+                        test_order.record(sequence_name, dut)
+                    test_case_timing.add(sequence_name, dut)
+
                     loop_time = round(time.monotonic() - loop_start_time_monotonic, 2)
 
                     loop_stats = {}
@@ -879,7 +1457,13 @@ def run_test_runner(test_control, message_queue, progess_queue, dut_sn_queue, li
                 results["end_time"] = datetime.datetime.now()
                 results["test_run_id"] = test_run_id
                 results["running_mode"] = running_mode
+                results["test_order"] = test_case_names
                 results["duration_s"] = round(time.monotonic() - start_time_monotonic, 2)
+                results["performance"] = {
+                    'executor': executor.statistics(),
+                    'instruments': instrument_lock_handler.statistics(),
+                    'test_case_timing': test_case_timing.statistics(sequence_name),
+                }
                 if 'gage' in running_mode.lower():
                     results["gage_rr"] = gage_progress.copy()
 
@@ -916,8 +1500,8 @@ def run_test_runner(test_control, message_queue, progess_queue, dut_sn_queue, li
                 try:
                     if not test_control['report_off'] and common_definitions.LOOP_EXECUTION:
                         common_definitions.create_report(
-                            json.dumps(results, indent=4, default=str),
-                            results,
+                            json.dumps(results, indent=4, default=measurements.json_default),
+                            measurements.to_dicts(results),
                             test_positions,
                             test_definitions.PARAMETERS,
                             db_handler,
@@ -999,16 +1583,27 @@ def run_test_runner(test_control, message_queue, progess_queue, dut_sn_queue, li
                     overall_result=dut.pass_fail_result,
                     sequence_name=sequence_name,
                 )
-                common_definitions.finalize_test(
-                    dut.pass_fail_result, test_positions, common_definitions.INSTRUMENTS, logger
-                )
+                if pipelined:
+                    finalize_pending = True
+                else:
+                    common_definitions.finalize_test(
+                        dut.pass_fail_result, test_positions, common_definitions.INSTRUMENTS, logger
+                    )
 
             results["start_time"] = start_time
             results["start_time_epoch"] = start_time_epoch
             results["end_time"] = datetime.datetime.now()
             results["test_run_id"] = test_run_id
             results["running_mode"] = running_mode
+            results["test_order"] = test_case_names
             results["duration_s"] = round(time.monotonic() - start_time_monotonic, 2)
+            results["performance"] = {
+                'executor': executor.statistics(),
+                'instruments': instrument_lock_handler.statistics(),
+                'test_case_timing': test_case_timing.statistics(sequence_name),
+            }
+            logger.info("Executor statistics: %s", results["performance"]['executor'])
+            logger.info("Instrument usage: %s", results["performance"]['instruments'])
 
             if 'gage' in running_mode.lower():
                 results["gage_rr"] = gage_progress.copy()
@@ -1049,7 +1644,27 @@ def run_test_runner(test_control, message_queue, progess_queue, dut_sn_queue, li
             pass
 
         try:
-            if not test_control['report_off'] and not common_definitions.LOOP_EXECUTION:
+            if pipelined and (finalize_pending or not test_control['report_off']):
+                pipeline = {'next_run_waiting': None}
+                previous_test_run = (
+                    executor.submit_finish(
+                        finish_test_run,
+                        common_definitions,
+                        progress,
+                        db_handler,
+                        *snapshot_test_run(results, test_positions),
+                        test_definitions.PARAMETERS,
+                        dut.pass_fail_result,
+                        finalize_pending,
+                        not test_control['report_off'],
+                        send_message,
+                        logger,
+                        pipeline,
+                    ),
+                    pipeline,
+                )
+
+            elif not test_control['report_off'] and not common_definitions.LOOP_EXECUTION:
                 progress.set_progress(
                     general_state="Create test report",
                     test_positions=test_positions,
@@ -1058,8 +1673,8 @@ def run_test_runner(test_control, message_queue, progess_queue, dut_sn_queue, li
                 )
 
                 common_definitions.create_report(
-                    json.dumps(results, indent=4, default=str),
-                    results,
+                    json.dumps(results, indent=4, default=measurements.json_default),
+                    measurements.to_dicts(results),
                     test_positions,
                     test_definitions.PARAMETERS,
                     db_handler,
@@ -1078,6 +1693,13 @@ def run_test_runner(test_control, message_queue, progess_queue, dut_sn_queue, li
         if test_control['single_run']:
             test_control['terminate'] = True
 
+    if previous_test_run is not None:
+        wait_previous_test_run(previous_test_run, logger)
+
     progress.set_progress(general_state="Shutdown")
 
+    executor.shutdown()
+    event_loop.stop_event_loop()
+    task_executor.shutdown_process_pool()
+
     common_definitions.shutdown(common_definitions.INSTRUMENTS, logger)
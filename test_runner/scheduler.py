@@ -0,0 +1,89 @@
+"""Dependency graph scheduling of test cases within a single DUT"""
+from concurrent.futures import FIRST_COMPLETED, wait
+from test_runner import exceptions
+
+
+class DependencyGraph:
+    """Test cases and their dependencies
+
+    test_case_names: Test cases to be run, in the order of TESTS
+    depends: Dictionary of test case name -> list of test cases it depends on
+    known_names: All test case names of the sequence. Dependencies to known
+    test cases that are not run (i.e. skipped) are considered to be met.
+    """
+
+    def __init__(self, test_case_names, depends, known_names=None):
+        self.order = list(test_case_names)
+        known_names = set(known_names or []) | set(self.order)
+
+        for name, dependencies in depends.items():
+            for dependency in [name] + list(dependencies):
+                if dependency not in known_names:
+                    raise exceptions.DependencyError(
+                        f"Unknown test case '{dependency}' in DEPENDS"
+                    )
+
+        self.dependencies = {
+            name: {d for d in depends.get(name, []) if d in self.order} for name in self.order
+        }
+        self._check_cycles()
+
+    def _check_cycles(self):
+        done = set()
+        remaining = list(self.order)
+
+        while remaining:
+            ready = [name for name in remaining if self.dependencies[name] <= done]
+            if not ready:
+                raise exceptions.DependencyError(
+                    "Circular dependency between test cases: " + ", ".join(remaining)
+                )
+            done.update(ready)
+            remaining = [name for name in remaining if name not in done]
+
+    def ready(self, done, started):
+        """Returns test cases that can be started, in the order of TESTS"""
+        return [
+            name
+            for name in self.order
+            if name not in started and self.dependencies[name] <= done
+        ]
+
+
+def run_graph(graph, run_case, submit, test_position, logger):
+    """Runs test cases of one test position along the dependency graph
+
+    Independent test cases are run at the same time. No new test cases
+    are started after the test position has stopped testing (e.g. on
+    FlowControl.STOP_ON_FAIL), but already running ones are completed.
+    """
+    done = set()
+    started = set()
+    running = {}
+
+    while True:
+        if not test_position.stop_testing:
+            for name in graph.ready(done, started):
+                started.add(name)
+                running[submit(run_case, name)] = name
+
+        if not running:
+            break
+
+        finished, _ = wait(running, return_when=FIRST_COMPLETED)
+
+        for future in finished:
+            name = running.pop(future)
+            done.add(name)
+
+            if future.exception() is not None:
+                err = future.exception()
+                logger.error(
+                    "Exception on test case %s", name, exc_info=(type(err), err, err.__traceback__)
+                )
+
+    not_run = [name for name in graph.order if name not in started]
+    if not_run:
+        logger.info(
+            "Test position %s stopped testing. Not run: %s", test_position.name, ", ".join(not_run)
+        )
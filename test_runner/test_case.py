@@ -1,13 +1,27 @@
 """Base for all test cases"""
 from abc import ABC, abstractmethod
-import inspect
 import logging
 import datetime
+import itertools
+import threading
 import time
 
+from concurrent.futures import CancelledError
+from contextlib import ExitStack, contextmanager, nullcontext
 from enum import Enum
 from pathlib import Path
 
+from test_runner import cancellation
+from test_runner import event_loop
+from test_runner import executor
+from test_runner import limits as limits_engine
+from test_runner import measurements
+
+
+def point_suffix(point):
+    """Returns suffix of measurement names of a sweep point, e.g. [frequency=1000]"""
+    return f"[{','.join(f'{key}={value}' for key, value in point.items())}]"
+
 
 class FlowControl(Enum):
     """Defines flow control options"""
@@ -19,14 +33,39 @@ class FlowControl(Enum):
     CONTINUE = 3
 
 
+class InstrumentAccess(Enum):
+    """Defines how test case uses an instrument"""
+
+    """Instrument can be used by other test cases at the same time"""
+    SHARED = 1
+
+    """Instrument is reserved for one test case at a time"""
+    EXCLUSIVE = 2
+
+
 class TestCase(ABC):
     """Base for all test cases"""
 
+    # Instruments used by the test case, e.g. {'gaia': InstrumentAccess.SHARED}.
+    # Instruments are locked for each of pre_test, test and post_test.
+    REQUIRED_INSTRUMENTS = {}
+
+    # Optional hook for sweeps, test_batch(self, points), measuring all points of
+    # PARAMETERS["sweeps"] at once, e.g. with one batched instrument call. If not
+    # defined, test() is run for each point.
+    test_batch = None
+
+    # Seconds the test case may run from the start of test() or waiting for its pre_test,
+    # and seconds its post_test may run. Defaults to TEST_CASE_TIMEOUT of common
+    # definitions, None for no timeout.
+    TIMEOUT = None
+
     def __init__(self, limits, report_progress, dut, parameters, db_handler, common_definitions):
         self.flow_control = common_definitions.FLOW_CONTROL
         self.logger = logging.getLogger('test_case')
         self.parameters = parameters
-        self.instruments = common_definitions.INSTRUMENTS
+        self.common_instruments = common_definitions.INSTRUMENTS
+        self.default_timeout = getattr(common_definitions, 'TEST_CASE_TIMEOUT', None)
         self.dut = dut
         self.report_progress = report_progress
         self.limits = limits
@@ -41,16 +80,49 @@ class TestCase(ABC):
         self.my_ip = common_definitions.IRIS_IP
         self.thread_barrier = None
         self.thread_barrier_reset = None
+        self.instrument_locks = None
+        self.held_instruments = None
+        self.compiled_limits = None
+        self.array_measurements = {}
+        self.point_measurements = {}
+        self.sweep_point = None
+        # Set by the test run when pre_test and post_test are queued
+        self.pre_test_queued_monotonic = None
+        self.post_test_queued_monotonic = None
+        self.reset_cancellation()
         self.initialize_measurements()
 
+    def reset_cancellation(self):
+        """Creates new cancellation token for the next run of the test case"""
+        self.cancellation = cancellation.CancellationToken()
+        self.instruments = cancellation.Instruments(self.common_instruments, self.cancellation)
+
+    def get_timeout(self):
+        """Returns timeout of the test case in seconds or None"""
+        return self.TIMEOUT if self.TIMEOUT is not None else self.default_timeout
+
     def show_operator_instructions(self, message, append=False):
         self.report_progress.show_operator_instructions(message, append)
 
     def initialize_measurements(self):
-        self.dut.test_cases[self.name] = {'id': id(self), 'result': 'testing', 'measurements': {}}
+        self.dut.test_cases[self.name] = {
+            'id': id(self),
+            'result': 'testing',
+            'measurements': measurements.MeasurementDict(),
+        }
+        self.dut.touch()
+        self.array_measurements = {}
+        self.point_measurements = {}
 
     def clear_measurements(self):
-        self.dut.test_cases[self.name] = {'id': id(self), 'result': 'not tested', 'measurements': {}}
+        self.dut.test_cases[self.name] = {
+            'id': id(self),
+            'result': 'not tested',
+            'measurements': measurements.MeasurementDict(),
+        }
+        self.dut.touch()
+        self.array_measurements = {}
+        self.point_measurements = {}
 
     @abstractmethod
     def test(self):
@@ -75,14 +147,170 @@ class TestCase(ABC):
     def clean_fail(self):
         """Called after all steps are done if pass_fail_result is not True"""
 
-    def new_measurement(self, name, measurement):
-        """Adds new measurement to measurement array"""
+    def new_measurement(self, name, measurement, point=None):
+        """Adds new measurement to measurement array
+
+        NumPy arrays are stored as array measurements, see new_array_measurement.
+        On sweeps the measurement is stored for the given point, by default
+        the point being tested, and evaluated against the limits of name.
+        """
+        self.cancellation.check()
+
+        if point is None:
+            point = self.sweep_point
+        if point is not None:
+            name = self.point_measurement_name(name, point)
+
+        if measurements.is_array(measurement):
+            self.new_array_measurement(name, measurement)
+            return
+
         self.logger.debug("New measurement: %s:%s:%s", self.name, name, measurement)
 
-        if name not in self.dut.test_cases[self.name]['measurements']:
-            self.dut.test_cases[self.name]['measurements'][name] = {}
+        self._store_measurement(name, measurement)
+
+    def _store_measurement(self, name, measurement):
+        """Stores value of the measurement to the results, evaluated on next result_handler call"""
+        case_measurements = self.dut.test_cases[self.name]['measurements']
+        record = case_measurements.get(name)
+        if record is None:
+            record = measurements.MeasurementRecord()
+        record['measurement'] = measurement
+        # Stored again also when it exists, which marks it changed
+        case_measurements[name] = record
+        self.dut.touch()
+
+    def point_measurement_name(self, name, point):
+        """Returns name of the measurement of a sweep point, e.g. Gain[frequency=1000]"""
+        point_name = name + point_suffix(point)
+        self.point_measurements[point_name] = name
+        return point_name
+
+    def new_array_measurement(self, name, data, store_file=False, info=None):
+        """Adds array or waveform measurement
+
+        The array is not copied to test results. Test results get only a summary
+        (min, max, mean, argmax and count of elements failing the limits).
+        With store_file the array is saved to a memory-mapped .npy file attachment and
+        the summary links to it.
+        """
+        array_measurement = measurements.ArrayMeasurement(data)
+        array_measurement.info.update(info or {})
+
+        if store_file:
+            file_name = f'{name}.npy'
+            temp_path = Path(f'{self.name}_{id(self)}_{file_name}')
+            array_measurement.save(temp_path)
+            self.store_test_data_file(temp_path, file_name)
+            attachment = self.dut.test_cases[self.name]['media'][-1]
+            array_measurement.map_file(attachment['file_path'], attachment['url'])
+
+        self.logger.debug(
+            "New array measurement: %s:%s:%s", self.name, name, array_measurement.data.shape
+        )
+
+        self.array_measurements[name] = array_measurement
+
+        self._store_measurement(name, array_measurement.summary())
+
+    def open_stream(self, name, dtype='float64', capacity=1000000, store_file=False):
+        """Returns writer for high-rate samples of one measurement
+
+        Samples are appended with writer.append(value) or writer.extend(values) to a
+        preallocated ring buffer keeping the latest capacity samples. When the writer is
+        closed, or its with block ends, the samples are stored as array measurement and
+        limits are evaluated for the whole stream. With store_file the ring buffer is
+        memory-mapped to a temporary file and the samples are stored to .npy file attachment.
+        """
+        buffer_path = Path(f'{self.name}_{id(self)}_{name}.stream') if store_file else None
+
+        def close_stream(writer):
+            try:
+                self.new_array_measurement(
+                    name,
+                    writer.data(),
+                    store_file,
+                    info={
+                        'samples': writer.samples,
+                        'dropped': max(0, writer.samples - writer.capacity),
+                    },
+                )
+            finally:
+                if buffer_path is not None:
+                    writer.buffer = None
+                    buffer_path.unlink(missing_ok=True)
+
+        return measurements.StreamWriter(name, dtype, capacity, close_stream, buffer_path)
+
+    def hold_instruments(self):
+        """Returns context manager holding locks of REQUIRED_INSTRUMENTS"""
+        if self.instrument_locks is None or not self.REQUIRED_INSTRUMENTS:
+            return nullcontext()
+
+        return self.instrument_locks.hold(self.REQUIRED_INSTRUMENTS)
+
+    @contextmanager
+    def hold_instruments_timed(self):
+        """hold_instruments recording the wait for the instruments as instrument_wait"""
+        with ExitStack() as stack:
+            with self.timed('instrument_wait'):
+                self.held_instruments = stack.enter_context(self.hold_instruments())
+            try:
+                yield
+            finally:
+                self.held_instruments = None
+
+    def instruments_released(self):
+        """Returns context manager releasing the held instruments for the with block"""
+        if self.held_instruments is None:
+            return nullcontext()
+
+        return self.held_instruments.released()
+
+    def record_timing(self, phase, start, end):
+        """Adds phase to dut.test_cases[name]['timing']
+
+        Start and end are monotonic times, stored relative to the start of the test case.
+        Durations of repeated phases, e.g. barrier_wait, are summed.
+        """
+        timing = self.dut.test_cases[self.name].setdefault('timing', {})
+        origin = self.start_time_monotonic if self.start_time_monotonic is not None else start
+
+        if phase in timing:
+            timing[phase]['end_s'] = round(end - origin, 4)
+            timing[phase]['duration_s'] = round(timing[phase]['duration_s'] + end - start, 4)
+            timing[phase]['count'] += 1
+        else:
+            timing[phase] = {
+                'start_s': round(start - origin, 4),
+                'end_s': round(end - origin, 4),
+                'duration_s': round(end - start, 4),
+                'count': 1,
+            }
+
+        self.dut.touch()
+
+    @contextmanager
+    def timed(self, phase):
+        """Records the duration of the with block as phase of the test case"""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.record_timing(phase, start, time.monotonic())
+
+    def offload(self, function, *args, **kwargs):
+        """Runs CPU heavy function, e.g. analysis on post_test, on a separate process
 
-        self.dut.test_cases[self.name]['measurements'][name]['measurement'] = measurement
+        Returns the result of the function. Function and its arguments must be
+        picklable, i.e. use module level functions and plain data.
+        """
+        return executor.run_in_process(function, *args, **kwargs)
+
+    def offload_measurements(self, function, *args, **kwargs):
+        """Runs function on a separate process and stores the returned dictionary as measurements"""
+        for name, measurement in self.offload(function, *args, **kwargs).items():
+            self.new_measurement(name, measurement)
 
     def stop_testing(self):
         """Stops testing before going to next test step"""
@@ -93,6 +321,18 @@ class TestCase(ABC):
         self.test_position.stop_looping = True
 
     def sync_threads(self, timeout=None):
+        self.cancellation.check()
+
+        try:
+            # Other test positions may need the instruments before they reach the barrier
+            with self.timed('barrier_wait'), self.instruments_released():
+                self._sync_threads(timeout)
+        except threading.BrokenBarrierError:
+            # Cancelled test position leaves the barrier
+            self.cancellation.check()
+            raise
+
+    def _sync_threads(self, timeout):
         if self.thread_barrier is not None:
             self.logger.debug("Thread barrier size: %s", self.thread_barrier.parties)
             if self.thread_barrier.parties > 1:
@@ -105,7 +345,7 @@ class TestCase(ABC):
                         - 1
                     )
                 )
-            i_thread_wait = self.thread_barrier.wait(timeout)
+            i_thread_wait = self.thread_barrier.wait(timeout, self.cancellation)
 
             if i_thread_wait == 0:
                 self.logger.info(
@@ -115,7 +355,7 @@ class TestCase(ABC):
                 self.thread_barrier.reset()
 
             if self.thread_barrier_reset is not None:
-                i_thread_wait_reset = self.thread_barrier_reset.wait(timeout)
+                i_thread_wait_reset = self.thread_barrier_reset.wait(timeout, self.cancellation)
 
                 if i_thread_wait_reset == 0:
                     self.logger.info(
@@ -125,14 +365,48 @@ class TestCase(ABC):
                     self.thread_barrier_reset.reset()
                     self.logger.info("Syncing threads completed.")
 
-    def result_handler(self, error=None):
-        """Checks if test is pass or fail. Can be overridden if needed."""
+    def get_compiled_limits(self):
+        """Returns compiled limits of the sequence. Compiled here if limits are replaced."""
+        if self.compiled_limits is None or self.compiled_limits.limits is not self.limits:
+            self.compiled_limits = limits_engine.CompiledLimits(self.limits)
+
+        return self.compiled_limits
 
+    def get_dirty_measurements(self):
+        """Returns measurements stored, replaced or deleted after the previous call
+
+        Also measurements stored directly to dut.test_cases, without new_measurement,
+        are included. If the measurements of the test case have been replaced with
+        another dictionary, all of them are included.
+        """
         case = self.dut.test_cases[self.name]
+        if not isinstance(case['measurements'], measurements.MeasurementDict):
+            case['measurements'] = measurements.MeasurementDict(case['measurements'])
+
+        return case['measurements'].take_changed()
 
-        for measurement_name, measurement_dict in self.dut.test_cases[self.name][
-            'measurements'
-        ].items():
+    def result_handler(self, error=None):
+        """Checks if test is pass or fail. Can be overridden if needed.
+
+        Each measurement is evaluated once after it has changed. Results of the
+        earlier evaluated measurements are already on the test case and the DUT.
+        """
+
+        case = self.dut.test_cases[self.name]
+        compiled_limits = self.get_compiled_limits()
+        dirty_measurements = self.get_dirty_measurements()
+
+        try:
+            bulk_results = compiled_limits.evaluate_bulk(
+                self.name,
+                {name: m.get('measurement') for name, m in dirty_measurements.items()},
+                self.point_measurements,
+            )
+        except Exception as ex:
+            self.logger.debug("Bulk evaluation of limits failed: %s", ex)
+            bulk_results = {}
+
+        for measurement_name, measurement_dict in dirty_measurements.items():
             pass_fail_result = 'pass'
             limit = None
             unit = None
@@ -143,17 +417,24 @@ class TestCase(ABC):
                 measurement_value = measurement_dict['measurement']
 
                 if self.name in self.limits:
-                    limit = self.limits[self.name][measurement_name].get(
-                        'report_limit',
-                        inspect.getsource(self.limits[self.name][measurement_name]['limit']),
+                    compiled_limit = compiled_limits.get(
+                        self.name, self.point_measurements.get(measurement_name, measurement_name)
                     )
-
-                    unit = self.limits[self.name][measurement_name].get('unit', '')
-                    optional = self.limits[self.name][measurement_name].get('optional', False)
-
-                    pass_fail_result = 'pass' if self.limits[self.name][measurement_name]['limit'](
-                        measurement_value
-                    ) else 'fail'
+                    limit = compiled_limit.report_limit
+                    unit = compiled_limit.unit
+                    optional = compiled_limit.optional
+
+                    if measurement_name in self.array_measurements:
+                        array_measurement = self.array_measurements[measurement_name]
+                        array_measurement.set_fail_mask(
+                            compiled_limit.evaluate_array(array_measurement.data)
+                        )
+                        measurement_dict['measurement'] = array_measurement.summary()
+                        pass_fail_result = 'fail' if array_measurement.fail_count else 'pass'
+                    elif measurement_name in bulk_results:
+                        pass_fail_result = bulk_results[measurement_name]
+                    else:
+                        pass_fail_result = compiled_limit.evaluate(measurement_value)
 
                 case['measurements'][measurement_name]["unit"] = unit
                 case['measurements'][measurement_name]["optional"] = optional
@@ -180,51 +461,23 @@ class TestCase(ABC):
             case['error'] = error
             self.set_pass_fail_result('error')
 
+        self.dut.touch()
 
     def set_pass_fail_result(self, result):
         # Result must be set for both test case and DUT
         # If any of the test cases is fail/error, the result of DUT is fail/error.
-
-        def __set_result(target):
-            if target == 'error':
-                # If result is set to error, it must stay on error
-                pass
-            elif target == 'fail':
-                if result == 'error':
-                    # From 'fail' go only to 'error'
-                    target = result
-            else:
-                # From all other results ('pass', 'NA') go to any other result
-                target = result
-
-            return target
-
-        # Set result for test case
-        new_result = __set_result(self.dut.test_cases[self.name]['result'])
-        self.dut.test_cases[self.name]['result'] = new_result
-
-        # Set result for DUT
-        if not hasattr(self.dut, 'pass_fail_result'):
-            self.dut.pass_fail_result = result
-        else:
-            self.dut.pass_fail_result = __set_result(self.dut.pass_fail_result)
+        self.dut.add_result(self.name, result)
 
         if result != 'pass':
 
             if self.flow_control == FlowControl.STOP_ON_FAIL:
                 self.stop_testing()
 
-            if result == 'fail':
-                if self.name not in self.dut.failed_steps:
-                    self.dut.failed_steps.append(self.name)
-
-            if result == 'error':
-                if self.name not in self.dut.error_steps:
-                    self.dut.error_steps.append(self.name)
-
 
     def check_measurements_vs_limits(self):
         if self.name in self.limits:
+            # Measurements of sweep points are measurements of their limits
+            measured = set(self.point_measurements.values())
 
             for limit in self.limits[self.name]:
 
@@ -236,48 +489,137 @@ class TestCase(ABC):
                 if (
                     self.name in self.dut.test_cases
                     and limit not in self.dut.test_cases[self.name]['measurements'].keys()
+                    and limit not in measured
                 ):
 
-                    self.dut.pass_fail_result = 'error'
+                    self.dut.add_dut_result('error')
 
                     self.dut.test_cases[self.name]['result'] = 'error'
                     self.dut.test_cases[self.name]['error'] = f'Measurement "{limit}" missing'
+                    self.dut.touch()
 
                     if self.flow_control == FlowControl.STOP_ON_FAIL:
                         self.stop_testing()
 
+    def run_phase(self, phase):
+        """Runs one of pre_test, test and post_test"""
+        return phase()
+
     def run_pre_test(self):
         self.logger.debug("Running pre_test at %s", self.name)
         self.start_time = datetime.datetime.now()
         self.start_time_monotonic = time.monotonic()
         self.logger.debug("Initialize measurements dict for %s", self.name)
         self.initialize_measurements()
-        self.pre_test()
+        if self.pre_test_queued_monotonic is not None:
+            self.record_timing('pre_queue', self.pre_test_queued_monotonic, self.start_time_monotonic)
+            self.pre_test_queued_monotonic = None
+        with self.hold_instruments_timed(), self.timed('pre_test'):
+            self.run_phase(self.pre_test)
         self.evaluate_results()
         self.logger.debug("Pre_test done at %s", self.name)
 
+    def get_sweep_points(self):
+        """Returns points of PARAMETERS["sweeps"] of the test case, or None
+
+        Sweep is either dictionary of lists, swept over all their combinations, e.g.
+        {"frequency": [1e6, 2e6], "power": [0, 10]}, or list of point dictionaries.
+        """
+        sweeps = self.parameters.get('sweeps', {}) if isinstance(self.parameters, dict) else {}
+        sweep = sweeps.get(self.name)
+
+        if not sweep:
+            return None
+
+        if isinstance(sweep, dict):
+            return [dict(zip(sweep, values)) for values in itertools.product(*sweep.values())]
+
+        return [dict(point) for point in sweep]
+
+    def run_sweep(self, points):
+        """Runs test for each point, or test_batch for all points, and stores timing of points"""
+        timing = []
+
+        try:
+            if self.test_batch is not None:
+                start = time.monotonic()
+                self.run_phase(lambda: self.test_batch(points))
+                # Batched points share the duration
+                timing = [(time.monotonic() - start) / len(points)] * len(points)
+            else:
+                for point in points:
+                    if self.test_position is not None and self.test_position.stop_testing:
+                        break
+                    self.sweep_point = point
+                    start = time.monotonic()
+                    self.run_phase(self.test)
+                    timing.append(time.monotonic() - start)
+        finally:
+            self.sweep_point = None
+            self.dut.test_cases[self.name]['points'] = [
+                {'point': point, 'duration_s': round(duration_s, 4)}
+                for point, duration_s in zip(points, timing)
+            ]
+            self.dut.touch()
+
+    def set_point_results(self):
+        """Stores result of each sweep point from the results of its measurements"""
+        case = self.dut.test_cases[self.name]
+        point_names = {}
+        for measurement_name, limit_name in self.point_measurements.items():
+            point_names.setdefault(measurement_name[len(limit_name):], []).append(measurement_name)
+
+        for point in case.get('points', []):
+            names = point_names.get(point_suffix(point['point']), [])
+            results = [
+                case['measurements'][name].get('result')
+                for name in names
+                if name in case['measurements']
+            ]
+            if not results:
+                point['result'] = None
+            elif all(result == 'pass' for result in results):
+                point['result'] = 'pass'
+            else:
+                point['result'] = 'fail'
+
+        self.dut.touch()
+
     def run_test(self):
         self.logger.debug("Running test at %s", self.name)
-        self.test()
+        points = self.get_sweep_points()
+        with self.hold_instruments_timed(), self.timed('test'):
+            if points:
+                self.run_sweep(points)
+            else:
+                self.run_phase(self.test)
         if self.thread_barrier is not None:
             if self.thread_barrier.n_waiting > 0:
                 self.sync_threads()
         self.evaluate_results()
+        if points:
+            self.set_point_results()
         self.logger.debug("Test done at %s", self.name)
 
     def run_post_test(self):
         self.logger.debug("Running post_test done at %s", self.name)
-        self.post_test()
+        if self.post_test_queued_monotonic is not None:
+            self.record_timing('post_queue', self.post_test_queued_monotonic, time.monotonic())
+            self.post_test_queued_monotonic = None
+        with self.hold_instruments_timed(), self.timed('post_test'):
+            self.run_phase(self.post_test)
 
         self.evaluate_results()
-        self.check_measurements_vs_limits()
+        with self.timed('evaluate'):
+            self.check_measurements_vs_limits()
 
-        if self.dut.pass_fail_result == 'pass':
-            self.clean_pass()
-        else:
-            self.clean_fail()
+        with self.timed('clean'):
+            if self.dut.pass_fail_result == 'pass':
+                self.clean_pass()
+            else:
+                self.clean_fail()
 
-        self.clean()
+            self.clean()
 
         self.end_time = datetime.datetime.now()
         self.duration_s = time.monotonic() - self.start_time_monotonic
@@ -289,6 +631,7 @@ class TestCase(ABC):
                 "duration_s": round(self.duration_s, 2),
             }
         )
+        self.dut.touch()
         self.logger.debug("Post_test done at %s", self.name)
 
     def handle_error(self, error):
@@ -306,11 +649,13 @@ class TestCase(ABC):
                 "duration_s": round(self.duration_s, 2),
             }
         )
+        self.dut.touch()
         self.clean_error()
 
     def evaluate_results(self):
 
-        self.result_handler()
+        with self.timed('evaluate'):
+            self.result_handler()
 
     def store_test_data_file(self, source_file_path, dest_name, **kwargs):
         from common.test_report_writer import create_report_path
@@ -345,7 +690,47 @@ class TestCase(ABC):
             self.dut.test_cases[self.name]['media'] = []
 
         self.dut.test_cases[self.name]['media'].append(data)
+        self.dut.touch()
 
     def _store_test_data_file_to_db(self, data):
         if self.db_handler:
             self.db_handler.store_test_data_file_to_db(**data)
+
+
+class AsyncTestCase(TestCase):
+    """Base for test cases with asynchronous pre_test, test and post_test
+
+    All asynchronous test cases run on one shared event loop, so instrument I/O of all
+    test positions is run concurrently on one thread. Each test position still has its
+    own worker thread, which is blocked until the coroutine is done, so the amount of
+    threads is not reduced.
+    """
+
+    async def pre_test(self):
+        """This coroutine will be run on background before the actual test"""
+
+    @abstractmethod
+    async def test(self):
+        """Defines the test case."""
+
+    @abstractmethod
+    async def post_test(self):
+        """This coroutine will be run on background after the actual test"""
+
+    def run_phase(self, phase):
+        """Runs coroutine of pre_test, test or post_test on the shared event loop
+
+        The coroutine is cancelled when the test case is cancelled.
+        """
+        future = event_loop.get_event_loop().submit(phase())
+        self.cancellation.on_cancel(future.cancel)
+
+        try:
+            return future.result()
+        except CancelledError:
+            self.cancellation.check()
+            raise
+
+    async def sync_threads_async(self, timeout=None):
+        """Asynchronous version of sync_threads. Waits on a helper thread, not on the event loop."""
+        await event_loop.run_in_thread(self.sync_threads, timeout)
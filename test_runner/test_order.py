@@ -0,0 +1,181 @@
+"""Fail-fast ordering of test cases based on their failure history"""
+import threading
+
+# Amount of latest test reports read from the database to seed the history
+HISTORY_REPORTS = 500
+
+
+class CaseHistory:
+    """Run count, fail count and durations of one test case"""
+
+    def __init__(self):
+        self.runs = 0
+        self.fails = 0
+        self.duration_s = 0.0
+        self.timed_runs = 0
+
+    def add(self, failed, duration_s=None):
+        self.runs += 1
+        if failed:
+            self.fails += 1
+        if isinstance(duration_s, (int, float)) and duration_s >= 0:
+            self.duration_s += duration_s
+            self.timed_runs += 1
+
+    @property
+    def fail_probability(self):
+        """Laplace smoothed probability of failure. Unknown test case gets 0.5."""
+        return (self.fails + 1) / (self.runs + 2)
+
+    @property
+    def mean_duration_s(self):
+        if self.timed_runs == 0:
+            return None
+        return self.duration_s / self.timed_runs
+
+
+class FailFastOrder:
+    """Orders test cases to minimise expected time to the first failure
+
+    Test cases are sorted by failure probability per second of test time, which is
+    the optimal order for independent test cases. Pinned test cases keep their place
+    in TESTS and test cases are not moved over them. Test cases are not moved before
+    the test cases they depend on (DEPENDS). "_pre" steps keep their place unless their
+    test case is moved before them.
+    """
+
+    def __init__(self, logger):
+        self.logger = logger
+        self._history = {}
+        self._seeded = set()
+        self._lock = threading.Lock()
+
+    def _get(self, sequence_name, test_case_name):
+        sequence = self._history.setdefault(sequence_name, {})
+        if test_case_name not in sequence:
+            sequence[test_case_name] = CaseHistory()
+        return sequence[test_case_name]
+
+    def seed(self, db_handler, sequence_name):
+        """Reads history of the sequence from test reports on the database, once per sequence"""
+        with self._lock:
+            if sequence_name in self._seeded:
+                return
+            self._seeded.add(sequence_name)
+
+        if db_handler is None or not hasattr(db_handler, 'db_client'):
+            return
+
+        try:
+            reports = list(
+                db_handler.db_client[db_handler.db_name]
+                .test_reports.find(
+                    {'sequence': sequence_name},
+                    {'failedCases': 1, 'errorCases': 1, 'testCases': 1},
+                )
+                .sort('_id', -1)
+                .limit(HISTORY_REPORTS)
+            )
+        except Exception as err:  # pylint: disable=broad-except
+            self.logger.warning("Cannot read test case history from database: %s", err)
+            return
+
+        with self._lock:
+            for report in reports:
+                if not isinstance(report, dict):
+                    continue
+                failed = set(report.get('failedCases', [])) | set(report.get('errorCases', []))
+                for test_case in report.get('testCases', []):
+                    self._get(sequence_name, test_case['name']).add(
+                        test_case['name'] in failed, test_case.get('duration')
+                    )
+
+        self.logger.info(
+            "Read history of %s test reports for sequence %s", len(reports), sequence_name
+        )
+
+    def record(self, sequence_name, dut):
+        """Adds results of the tested DUT to the history"""
+        with self._lock:
+            for test_case_name, test_case in dut.test_cases.items():
+                if test_case.get('result') not in ('pass', 'fail', 'error'):
+                    continue
+                self._get(sequence_name, test_case_name).add(
+                    test_case['result'] != 'pass', test_case.get('duration_s')
+                )
+
+    def apply(self, db_handler, sequence_name, test_definitions, test_case_names):
+        """Returns test cases of the sequence in fail-fast order
+
+        Test cases listed in PINNED of the test definitions keep their place.
+        """
+        self.seed(db_handler, sequence_name)
+
+        ordered = self.order(
+            sequence_name,
+            test_case_names,
+            getattr(test_definitions, 'PINNED', ()),
+            getattr(test_definitions, 'DEPENDS', None),
+        )
+        self.logger.info("Fail-fast test order: %s", ordered)
+
+        return ordered
+
+    def _scores(self, sequence_name, test_case_names):
+        with self._lock:
+            history = {name: self._get(sequence_name, name) for name in test_case_names}
+
+        durations = [h.mean_duration_s for h in history.values() if h.mean_duration_s]
+        default_duration = sum(durations) / len(durations) if durations else 1.0
+
+        return {
+            name: h.fail_probability / max(h.mean_duration_s or default_duration, 0.001)
+            for name, h in history.items()
+        }
+
+    def order(self, sequence_name, test_case_names, pinned=(), depends=None):
+        """Returns test_case_names in fail-fast order"""
+        depends = depends or {}
+        cases = [t for t in test_case_names if '_pre' not in t]
+        scores = self._scores(sequence_name, cases)
+
+        # Pinned test cases split the sequence to segments which are ordered separately
+        segments = [[]]
+        for name in cases:
+            if name in pinned:
+                segments.append([])
+            else:
+                segments[-1].append(name)
+
+        ordered = []
+        for segment in segments:
+            remaining = list(segment)
+            while remaining:
+                ready = [
+                    name
+                    for name in remaining
+                    if not any(dep in remaining for dep in depends.get(name, []))
+                ]
+                # Circular dependencies are reported by the dependency graph
+                ready = ready or remaining
+                best = max(ready, key=lambda name: scores[name])
+                remaining.remove(best)
+                ordered.append(best)
+
+        # Fill the slots of the movable test cases in TESTS with the new order
+        new_order = iter(ordered)
+        result = []
+        for name in test_case_names:
+            if '_pre' in name or name in pinned:
+                result.append(name)
+            else:
+                result.append(next(new_order))
+
+        # Pre-test step is useless after its test case
+        for name in [t for t in result if '_pre' in t]:
+            case_name = name.replace('_pre', '')
+            if case_name in result and result.index(case_name) < result.index(name):
+                result.remove(name)
+                result.insert(result.index(case_name), name)
+
+        return result
@@ -1,4 +1,7 @@
-class TestPosition:
+from test_runner.helpers import Versioned
+
+
+class TestPosition(Versioned):
     def __init__(self, name, ui_position):
         self.name = name
         self.ui_position = ui_position
@@ -11,6 +14,8 @@ class TestPosition:
         self.stop_looping = False
         self.stop_reporting = False
         self.previous_dut = False
+        # Abort of the test run of this test position only, see INDEPENDENT_TEST_POSITIONS
+        self.abort = False
 
     def prepare_for_new_test_run(self):
         if self.dut:
@@ -0,0 +1,516 @@
+"""Runs the test cases of one test run"""
+import datetime
+import threading
+import time
+import gaiaclient
+from test_runner import cancellation
+from test_runner import exceptions
+from test_runner import executor as task_executor
+from test_runner import limits
+from test_runner import scheduler
+
+
+class TestRun:
+    """Test cases of one test run and the state needed to run them
+
+    Used both when all test positions are tested together and when
+    each test position runs its own test runs.
+    """
+
+    def __init__(
+        self,
+        test_control,
+        common_definitions,
+        test_definitions,
+        test_pool,
+        progress,
+        executor,
+        instrument_locks,
+        db_handler,
+        send_message,
+        logger,
+        compiled_limits=None,
+    ):
+        self.test_control = test_control
+        self.common_definitions = common_definitions
+        self.test_definitions = test_definitions
+        self.test_pool = test_pool
+        self.progress = progress
+        self.executor = executor
+        self.instrument_locks = instrument_locks
+        self.db_handler = db_handler
+        self.send_message = send_message
+        self.logger = logger
+
+        self.test_positions = {}
+        self.sequence_name = None
+        self.test_run_id = None
+        self.test_cases_override = None
+        self.test_case_names = []
+        self.test_graph = None
+
+        self.background_pre_tasks = {}
+        self.background_post_tasks = {}
+
+        self.all_pos_test_cases_completed = None
+        self.all_pos_mid_test_cases_completed = None
+        self.mid_case_reset_barrier = None
+
+        # Limits are compiled once per loaded sequence, see load_test_definitions, and
+        # shared by all test case instances
+        if compiled_limits is None:
+            compiled_limits = limits.CompiledLimits(getattr(test_definitions, 'LIMITS', {}))
+        self.compiled_limits = compiled_limits
+
+        self.prepared_test_cases = set()
+        self._prepared_test_cases_lock = threading.Lock()
+
+        self.watchdog = cancellation.get_watchdog()
+        # Thread running the test runs of a test position, which is not abandoned on cancel
+        self.runner_thread_ident = None
+
+    def is_aborted(self, test_position_instance):
+        """Returns True if the test run of the station or of the test position is aborted"""
+        return self.test_control['abort'] or test_position_instance.abort
+
+    def new_test_instance(self, the_case, the_position_instance):
+        """Creates test case instance from sequence or test case pool"""
+        if hasattr(self.test_definitions, the_case):
+            test_class = getattr(self.test_definitions, the_case)
+        elif hasattr(self.test_pool, the_case):
+            test_class = getattr(self.test_pool, the_case)
+        else:
+            raise exceptions.TestCaseNotFound("Cannot find specified test case: " + the_case)
+
+        test_instance = test_class(
+            self.test_definitions.LIMITS,
+            self.progress,
+            the_position_instance.dut,
+            self.test_definitions.PARAMETERS,
+            self.db_handler,
+            self.common_definitions,
+        )
+        test_instance.compiled_limits = self.compiled_limits
+
+        return test_instance
+
+    def run_test_case(
+        self, test_position_name, test_position_instance, test_case_name, sync_test_cases=False
+    ):
+        """Runs one test case (or starts its pre-test) on one test position"""
+
+        test_control = self.test_control
+        logger = self.logger
+
+        if self.is_aborted(test_position_instance):
+            self.send_message("Test aborted")
+            logger.warning("Test aborted")
+            return
+
+        if self.test_cases_override and test_case_name not in self.test_cases_override:
+            return
+
+        if not test_position_instance.dut or test_position_instance.stop_testing:
+            return
+
+        is_pre_test = False
+        if '_pre' in test_case_name:
+            is_pre_test = True
+
+        test_case_name = test_case_name.replace('_pre', '')
+
+        # Create test case instance
+        if test_case_name not in test_position_instance.test_case_instances:
+            test_position_instance.test_case_instances[test_case_name] = self.new_test_instance(
+                test_case_name, test_position_instance
+            )
+        test_instance = test_position_instance.test_case_instances[test_case_name]
+        test_instance.test_position = test_position_instance
+        test_instance.test_run_id = self.test_run_id
+        test_instance.instrument_locks = self.instrument_locks
+
+        if sync_test_cases and self.all_pos_mid_test_cases_completed is not None:
+            test_instance.thread_barrier = self.all_pos_mid_test_cases_completed
+            test_instance.thread_barrier_reset = self.mid_case_reset_barrier
+
+        all_pos_test_cases_completed = self.all_pos_test_cases_completed
+
+        watch = None
+
+        try:
+            if is_pre_test:
+                test_instance.reset_cancellation()
+
+                # Start pre task and store it to dictionary. Test positions may start
+                # the same pre task at the same time.
+                test_instance.pre_test_queued_monotonic = time.monotonic()
+                self.background_pre_tasks.setdefault(test_case_name, {})[
+                    test_position_name
+                ] = self.executor.submit_pre_test(test_instance.run_pre_test)
+            else:
+                pre_task_started = (
+                    test_case_name in self.background_pre_tasks
+                    and test_position_name in self.background_pre_tasks[test_case_name]
+                )
+                if not pre_task_started:
+                    test_instance.reset_cancellation()
+
+                # Cancels the test case on timeout or abort and frees the test position
+                thread_ident = threading.get_ident()
+                watch = self.watchdog.watch(
+                    test_instance.cancellation,
+                    test_instance.get_timeout(),
+                    lambda reason: self.cancel_test_case(
+                        test_position_instance, test_instance, reason, thread_ident, sync_test_cases
+                    ),
+                    lambda: self.is_aborted(test_position_instance),
+                )
+
+                # Wait for pre task
+                if pre_task_started:
+                    pre_task = self.background_pre_tasks[test_case_name][test_position_name]
+                    with test_instance.timed('pre_join'):
+                        pre_task.result()
+                else:
+                    # Or if pre task is not run, run it now
+                    test_instance.run_pre_test()
+
+                test_position_instance.test_status = "Testing"
+                self.progress.set_progress(
+                    general_state='testing',
+                    test_position=self.test_positions,
+                    sequence_name=self.sequence_name,
+                )
+                # Run the actual test case
+                test_instance.run_test()
+
+                self.watchdog.unwatch(watch)
+                if test_instance.cancellation.cancelled:
+                    return
+
+                # Synchronize parallel per test case testing
+                if sync_test_cases and all_pos_test_cases_completed is not None:
+                    if all_pos_test_cases_completed.parties > 1:
+                        logger.info(
+                            "Test case completed thread for test position "
+                            "%s is waiting for other %s threads.",
+                            test_position_instance.name,
+                            (
+                                all_pos_test_cases_completed.parties
+                                - all_pos_test_cases_completed.n_waiting
+                                - 1
+                            ),
+                        )
+                    with test_instance.timed('barrier_wait'):
+                        i_thread_wait = all_pos_test_cases_completed.wait(
+                            self.common_definitions.PARALLEL_SYNC_COMPLETED_TEST_TIMEOUT,
+                            test_instance.cancellation,
+                        )
+                    if i_thread_wait == 0:
+                        logger.info("All threads have synced test case completion.")
+                        all_pos_test_cases_completed.reset()
+
+                self.progress.set_progress(
+                    general_state='testing',
+                    test_positions=self.test_positions,
+                    sequence_name=self.sequence_name,
+                )
+
+                test_position_instance.test_status = (
+                    "Aborting" if self.is_aborted(test_position_instance) else "Idle"
+                )
+
+                def wait_post_processing():
+                    test_position_instance.status = 'waiting for post-processing'
+                    self.progress.set_progress(
+                        general_state='testing',
+                        test_positions=self.test_positions,
+                        sequence_name=self.sequence_name,
+                    )
+
+                # Start post task and store it to list. Waits if too many post tasks are running.
+                test_instance.post_test_queued_monotonic = time.monotonic()
+                self.background_post_tasks.setdefault(test_position_name, []).append(
+                    self.executor.submit_post_test(
+                        test_position_name,
+                        lambda: self.run_post_test(test_position_instance, test_instance),
+                        wait_post_processing,
+                    )
+                )
+
+        except Exception as err:
+
+            if watch is not None:
+                self.watchdog.unwatch(watch)
+                if test_instance.cancellation.cancelled:
+                    # Cancelled test case is already handled by cancel_test_case
+                    logger.warning("Cancelled test case %s ended: %s", test_case_name, err)
+                    return
+
+            if isinstance(err, gaiaclient.GaiaError):
+                logger.error("Caught Gaia error, abort testing.")
+                test_control['abort'] = True
+
+            if sync_test_cases:
+                if self.all_pos_mid_test_cases_completed is not None:
+                    logger.info("Abort mid test case thread barrier.")
+                    self.all_pos_mid_test_cases_completed.abort()
+                if all_pos_test_cases_completed is not None:
+                    logger.info("Abort completed test case thread barrier.")
+                    all_pos_test_cases_completed.abort()
+
+            trace = []
+            trace_back = err.__traceback__
+            while trace_back is not None:
+                trace.append(
+                    {
+                        "filename": trace_back.tb_frame.f_code.co_filename,
+                        "name": trace_back.tb_frame.f_code.co_name,
+                        "line": trace_back.tb_lineno,
+                    }
+                )
+                trace_back = trace_back.tb_next
+
+            err_dict = {
+                'type': type(err).__name__,
+                'message': str(err),
+                'trace': trace,
+            }
+
+            test_instance.handle_error(error=err_dict)
+
+        else:
+            # No error and no active tests
+            test_position_instance.status = (
+                "Aborting" if self.is_aborted(test_position_instance) else "Idle"
+            )
+            test_position_instance.step = None
+
+            self.progress.set_progress(
+                general_state='testing',
+                test_positions=self.test_positions,
+                sequence_name=self.sequence_name,
+            )
+
+    def cancel_test_case(
+        self, test_position_instance, test_instance, reason, thread_ident, sync_test_cases
+    ):
+        """Marks cancelled test case as error and frees its test position
+
+        Called by the watchdog on timeout or abort while the test case may still be
+        stuck, e.g. on an instrument call. The worker thread of the test position is
+        abandoned so that the rest of the station continues without waiting for it.
+        """
+        self.logger.error(
+            "Test case %s of test position %s cancelled: %s",
+            test_instance.name,
+            test_position_instance.name,
+            reason,
+        )
+
+        if test_instance.start_time_monotonic is None:
+            # Cancelled while waiting for pre_test to start
+            test_instance.start_time = datetime.datetime.now()
+            test_instance.start_time_monotonic = time.monotonic()
+
+        test_instance.handle_error(
+            error={'type': exceptions.TestCaseCancelled.__name__, 'message': reason, 'trace': []}
+        )
+        test_position_instance.stop_testing = True
+        test_position_instance.status = (
+            "Aborting" if self.is_aborted(test_position_instance) else "Idle"
+        )
+        test_position_instance.step = None
+
+        if sync_test_cases:
+            for barrier in (
+                self.all_pos_mid_test_cases_completed,
+                self.mid_case_reset_barrier,
+                self.all_pos_test_cases_completed,
+            ):
+                if barrier is None:
+                    continue
+                if self.is_aborted(test_position_instance):
+                    barrier.abort()
+                else:
+                    # Other test positions continue syncing without the cancelled one
+                    barrier.leave(test_instance.cancellation)
+
+        if thread_ident != self.runner_thread_ident:
+            self.executor.abandon(thread_ident)
+
+        self.progress.set_progress(
+            general_state='testing',
+            test_positions=self.test_positions,
+            sequence_name=self.sequence_name,
+        )
+
+    def run_post_test(self, test_position_instance, test_instance):
+        """Runs post_test of the test case, cancelled on timeout or abort like the test"""
+        thread_ident = threading.get_ident()
+        watch = self.watchdog.watch(
+            test_instance.cancellation,
+            test_instance.get_timeout(),
+            lambda reason: self.cancel_post_test(
+                test_position_instance, test_instance, reason, thread_ident
+            ),
+            lambda: self.is_aborted(test_position_instance),
+        )
+
+        try:
+            test_instance.run_post_test()
+        except Exception as err:
+            if not test_instance.cancellation.cancelled:
+                raise
+            # Cancelled post_test is already handled by cancel_post_test
+            self.logger.warning("Cancelled post_test of %s ended: %s", test_instance.name, err)
+        finally:
+            self.watchdog.unwatch(watch)
+
+    def cancel_post_test(self, test_position_instance, test_instance, reason, thread_ident):
+        """Marks test case of cancelled post_test as error and stops testing of its DUT
+
+        The test position may already run the next test case, so only the stuck
+        post-processing thread is abandoned.
+        """
+        self.logger.error(
+            "Post_test of test case %s of test position %s cancelled: %s",
+            test_instance.name,
+            test_position_instance.name,
+            reason,
+        )
+
+        test_instance.handle_error(
+            error={'type': exceptions.TestCaseCancelled.__name__, 'message': reason, 'trace': []}
+        )
+        test_position_instance.stop_testing = True
+        self.executor.abandon(thread_ident)
+
+        self.progress.set_progress(
+            general_state='testing',
+            test_positions=self.test_positions,
+            sequence_name=self.sequence_name,
+        )
+
+    def prepare_and_run_test_case(self, test_position_name, test_position_instance, test_case):
+        """Runs one test case when test positions are not run in lockstep
+
+        prepare_test_case is called once per test case, by the first test position.
+        """
+        with self._prepared_test_cases_lock:
+            if test_case not in self.prepared_test_cases:
+                self.prepared_test_cases.add(test_case)
+                self.common_definitions.prepare_test_case(
+                    self.common_definitions.INSTRUMENTS,
+                    self.logger,
+                    self.test_positions,
+                    self.sequence_name,
+                    test_case,
+                )
+
+        test_position_instance.step = test_case
+        test_position_instance.status = 'testing'
+
+        self.run_test_case(test_position_name, test_position_instance, test_case)
+
+    def run_test_graph(self, test_position_name, test_position_instance):
+        """Runs test cases of one test position along the dependency graph"""
+        scheduler.run_graph(
+            self.test_graph,
+            lambda test_case: self.prepare_and_run_test_case(
+                test_position_name, test_position_instance, test_case
+            ),
+            self.executor.submit_background,
+            test_position_instance,
+            self.logger,
+        )
+
+    def run_test_cases(self, test_position_name, test_position_instance):
+        """Runs all test cases of one test position"""
+        if self.test_graph is not None:
+            self.run_test_graph(test_position_name, test_position_instance)
+            return
+
+        for test_case in self.test_case_names:
+            self.prepare_and_run_test_case(test_position_name, test_position_instance, test_case)
+
+    def join_post_tests(self, test_position_name=None):
+        """Waits until started post-tests of the test position or all test positions are done"""
+        if test_position_name is None:
+            names = list(self.background_post_tasks)
+        else:
+            names = [test_position_name]
+
+        post_tasks = []
+        for name in names:
+            post_tasks.extend(self.background_post_tasks.pop(name, []))
+
+        task_executor.join(post_tasks, self.logger)
+
+    def retest_failed_cases(self, test_position_name, test_position_instance):
+        """Runs failed and errored test cases again, up to test_control['retest_on_fail'] times
+
+        Test cases not run after the failure, e.g. skipped by FlowControl.STOP_ON_FAIL,
+        are run too, so the DUT passes only if all its test cases have passed.
+        Existing test case instances are used. Earlier results of a test case are
+        stored to 'attempts' of the test case.
+        """
+        dut = test_position_instance.dut
+        attempts = {}
+
+        for attempt in range(int(self.test_control['retest_on_fail'] or 0)):
+            if dut is None or self.is_aborted(test_position_instance):
+                break
+
+            test_cases = [
+                t
+                for t in self.test_case_names
+                if '_pre' not in t
+                and not (self.test_cases_override and t not in self.test_cases_override)
+            ]
+            failed_cases = [
+                t
+                for t in test_cases
+                if dut.test_cases.get(t, {}).get('result') in ('fail', 'error')
+            ]
+            if not failed_cases:
+                break
+
+            # Failed test cases and the ones not run, in test order
+            retest_cases = [
+                t for t in test_cases if dut.test_cases.get(t, {}).get('result') != 'pass'
+            ]
+
+            self.logger.info(
+                "Retest %s of test position %s: %s",
+                attempt + 1,
+                test_position_name,
+                ', '.join(retest_cases),
+            )
+
+            for test_case in retest_cases:
+                if test_case in failed_cases:
+                    attempts.setdefault(test_case, []).append(dut.test_cases[test_case])
+
+                # Pre-test is run again with the test case
+                self.background_pre_tasks.get(test_case, {}).pop(test_position_name, None)
+
+                # Test positions are not synced on retest
+                test_instance = test_position_instance.test_case_instances.get(test_case)
+                if test_instance is not None:
+                    test_instance.thread_barrier = None
+                    test_instance.thread_barrier_reset = None
+
+            dut.prepare_retest(retest_cases)
+            test_position_instance.stop_testing = False
+
+            for test_case in retest_cases:
+                test_position_instance.step = test_case
+                test_position_instance.status = 'retesting'
+                self.run_test_case(test_position_name, test_position_instance, test_case)
+
+            self.join_post_tests(test_position_name)
+
+        for test_case, case_attempts in attempts.items():
+            dut.test_cases[test_case]['attempts'] = case_attempts
+        dut.touch()
@@ -0,0 +1,43 @@
+"""Timing of test case phases aggregated per sequence"""
+import threading
+
+from test_runner.executor import LatencyStatistics
+
+
+class TestCaseTiming:
+    """Durations of the phases of test cases, e.g. pre_test, barrier_wait and post_queue,
+    aggregated per sequence from dut.test_cases[name]['timing']"""
+
+    def __init__(self):
+        self._statistics = {}
+        self._lock = threading.Lock()
+
+    def _get(self, sequence_name, test_case_name, phase):
+        with self._lock:
+            test_cases = self._statistics.setdefault(sequence_name, {})
+            phases = test_cases.setdefault(test_case_name, {})
+            if phase not in phases:
+                phases[phase] = LatencyStatistics()
+            return phases[phase]
+
+    def add(self, sequence_name, dut):
+        """Adds phase durations of the test cases of the tested DUT"""
+        for test_case_name, test_case in dut.test_cases.items():
+            for phase, timing in test_case.get('timing', {}).items():
+                self._get(sequence_name, test_case_name, phase).add(timing['duration_s'])
+
+            if isinstance(test_case.get('duration_s'), (int, float)):
+                self._get(sequence_name, test_case_name, 'total').add(test_case['duration_s'])
+
+    def statistics(self, sequence_name):
+        """Returns count, mean and max of each phase of each test case of the sequence"""
+        with self._lock:
+            test_cases = {
+                test_case_name: dict(phases)
+                for test_case_name, phases in self._statistics.get(sequence_name, {}).items()
+            }
+
+        return {
+            test_case_name: {phase: latency.statistics() for phase, latency in phases.items()}
+            for test_case_name, phases in test_cases.items()
+        }
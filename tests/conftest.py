@@ -0,0 +1,94 @@
+"""Fakes of the test station shared by the tests
+
+unittest test cases import the functions, pytest tests use the fixtures.
+"""
+import logging
+import types
+
+import pytest
+
+from test_runner import test_case
+from test_runner import test_position
+from test_runner import test_run
+from test_runner.dut import Dut
+
+
+class Progress:
+    """Progress reporter discarding the progress"""
+
+    def set_progress(self, **kwargs):
+        pass
+
+    def show_operator_instructions(self, message, append=False):
+        pass
+
+
+def create_common_definitions(**definitions):
+    """Returns common definitions of a station without instruments, definitions override defaults"""
+    common_definitions = {
+        'FLOW_CONTROL': test_case.FlowControl.STOP_ON_FAIL,
+        'INSTRUMENTS': {},
+        'IRIS_IP': 'localhost',
+        'PARALLEL_SYNC_COMPLETED_TEST_TIMEOUT': None,
+    }
+    common_definitions.update(definitions)
+    return types.SimpleNamespace(**common_definitions)
+
+
+def create_test_definitions(limits, *test_case_classes, parameters=None):
+    """Returns test definitions running the test case classes in the given order"""
+    return types.SimpleNamespace(
+        TESTS=[test_case_class.__name__ for test_case_class in test_case_classes],
+        LIMITS=limits,
+        PARAMETERS=parameters or {},
+        **{test_case_class.__name__: test_case_class for test_case_class in test_case_classes},
+    )
+
+
+def create_test_positions(count):
+    """Returns test positions position_1 ... position_<count> with a DUT each"""
+    test_positions = {}
+    for index in range(1, count + 1):
+        name = f'position_{index}'
+        test_positions[name] = test_position.TestPosition(name, index)
+        test_positions[name].dut = Dut(f'sn_{index}', name)
+    return test_positions
+
+
+def create_test_run(
+    common_definitions,
+    test_definitions,
+    test_positions,
+    executor,
+    test_control=None,
+    instrument_locks=None,
+    logger=None,
+):
+    """Returns TestRun of the test positions, as set up by the runner before testing"""
+    run = test_run.TestRun(
+        {'abort': False} if test_control is None else test_control,
+        common_definitions,
+        test_definitions,
+        None,
+        Progress(),
+        executor,
+        instrument_locks,
+        None,
+        lambda message: None,
+        logger or logging.getLogger('tests'),
+    )
+    run.test_positions = test_positions
+    run.test_run_id = 'test_run'
+    run.test_case_names = list(test_definitions.TESTS)
+    return run
+
+
+@pytest.fixture
+def progress():
+    return Progress()
+
+
+@pytest.fixture
+def common_definitions():
+    return create_common_definitions()
+
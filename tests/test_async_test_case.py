@@ -0,0 +1,92 @@
+"""Asynchronous test cases run on the shared event loop"""
+import asyncio
+import logging
+import threading
+import time
+import unittest
+
+from conftest import create_common_definitions
+from conftest import create_test_definitions
+from conftest import create_test_positions
+from conftest import create_test_run
+from test_runner import cancellation
+from test_runner import event_loop
+from test_runner import executor as task_executor
+from test_runner import test_case
+
+
+class WaitingForInstrument(test_case.AsyncTestCase):
+    """Waits for a network instrument and syncs with the other test positions"""
+
+    DELAY_S = 0.2
+    threads = set()
+
+    async def test(self):
+        WaitingForInstrument.threads.add(threading.get_ident())
+        await asyncio.sleep(self.DELAY_S)
+        await self.sync_threads_async(5)
+        self.new_measurement('value', 1)
+
+    async def post_test(self):
+        pass
+
+
+class ManyPositionsTest(unittest.TestCase):
+    POSITIONS = 32
+
+    def setUp(self):
+        WaitingForInstrument.threads = set()
+        test_definitions = create_test_definitions(
+            {'WaitingForInstrument': {'value': {'min': 1}}}, WaitingForInstrument
+        )
+        self.test_positions = create_test_positions(self.POSITIONS)
+        self.executor = task_executor.Executor(list(self.test_positions), 2, 1, 2)
+        self.logger = logging.getLogger('test_async_test_case')
+
+        self.test_run = create_test_run(
+            create_common_definitions(),
+            test_definitions,
+            self.test_positions,
+            self.executor,
+            logger=self.logger,
+        )
+        self.test_run.all_pos_mid_test_cases_completed = cancellation.CancellableBarrier(
+            self.POSITIONS
+        )
+        self.test_run.mid_case_reset_barrier = cancellation.CancellableBarrier(self.POSITIONS)
+        self.test_run.all_pos_test_cases_completed = cancellation.CancellableBarrier(
+            self.POSITIONS
+        )
+
+    def tearDown(self):
+        self.executor.shutdown()
+        event_loop.stop_event_loop()
+
+    def test_test_positions_wait_for_instruments_concurrently(self):
+        start = time.monotonic()
+        task_executor.join(
+            [
+                self.executor.submit(
+                    name,
+                    self.test_run.run_test_case,
+                    name,
+                    position,
+                    'WaitingForInstrument',
+                    True,
+                )
+                for name, position in self.test_positions.items()
+            ],
+            self.logger,
+        )
+        self.test_run.join_post_tests()
+        elapsed = time.monotonic() - start
+
+        # One after another would take POSITIONS * DELAY_S
+        self.assertLess(elapsed, self.POSITIONS * WaitingForInstrument.DELAY_S / 4)
+        self.assertEqual(len(WaitingForInstrument.threads), 1)
+        for position in self.test_positions.values():
+            self.assertEqual(position.dut.pass_fail_result, 'pass')
+
+
+if __name__ == '__main__':
+    unittest.main()
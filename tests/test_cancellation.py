@@ -0,0 +1,170 @@
+"""Cancellation of test cases"""
+import threading
+import time
+import unittest
+from unittest import mock
+
+from test_runner import cancellation
+from test_runner import exceptions
+
+
+class Multimeter:
+    def read(self):
+        return 5
+
+
+class Lock:
+    def __init__(self):
+        self.lock = threading.Lock()
+
+    def __enter__(self):
+        self.lock.acquire()
+        return self
+
+    def __exit__(self, *args):
+        self.lock.release()
+
+
+class Registers:
+    def __init__(self):
+        self.registers = {}
+
+    def __getitem__(self, name):
+        return self.registers[name]
+
+    def __setitem__(self, name, value):
+        self.registers[name] = value
+
+    def __len__(self):
+        return len(self.registers)
+
+
+class InstrumentsTest(unittest.TestCase):
+    def setUp(self):
+        self.common_instruments = {
+            'dmm': Multimeter(),
+            'lock': Lock(),
+            'registers': Registers(),
+            'config': {'channel': 1},
+        }
+        self.token = cancellation.CancellationToken()
+        self.instruments = cancellation.Instruments(self.common_instruments, self.token)
+
+    def test_instruments_behave_as_the_instrument(self):
+        self.assertIsInstance(self.instruments['dmm'], Multimeter)
+        self.assertEqual(self.instruments['dmm'].read(), 5)
+        self.assertEqual(self.instruments['dmm'], self.common_instruments['dmm'])
+
+        with self.instruments['lock']:
+            self.assertTrue(self.common_instruments['lock'].lock.locked())
+
+        registers = self.instruments['registers']
+        registers['gain'] = 3
+        self.assertEqual(registers['gain'], 3)
+        self.assertEqual(len(registers), 1)
+
+    def test_plain_data_is_not_wrapped(self):
+        self.assertIs(self.instruments['config'], self.common_instruments['config'])
+        self.assertIs(self.instruments.get('config'), self.common_instruments['config'])
+
+    def test_values_and_items_are_wrapped(self):
+        self.assertIsInstance(dict(self.instruments.items())['dmm'], cancellation.InstrumentProxy)
+        self.assertTrue(
+            any(isinstance(v, cancellation.InstrumentProxy) for v in self.instruments.values())
+        )
+
+    def test_common_instruments_are_not_changed(self):
+        self.assertIs(type(self.common_instruments['dmm']), Multimeter)
+
+    def test_use_after_cancel_raises(self):
+        dmm = self.instruments['dmm']
+        registers = self.instruments['registers']
+        self.token.cancel('Timeout')
+
+        with self.assertRaises(exceptions.TestCaseCancelled):
+            dmm.read()
+        with self.assertRaises(exceptions.TestCaseCancelled):
+            registers['gain'] = 1
+        with self.assertRaises(exceptions.TestCaseCancelled):
+            with self.instruments['lock']:
+                pass
+
+    def test_chained_attributes_of_mock_instrument(self):
+        gaia = mock.MagicMock()
+        gaia.state_triggers.Ready.return_value = 'ready'
+        instruments = cancellation.Instruments({'gaia': gaia}, self.token)
+
+        self.assertEqual(instruments['gaia'].state_triggers.Ready.value, gaia.state_triggers.Ready.value)
+        self.assertEqual(instruments['gaia'].state_triggers.Ready(), 'ready')
+        gaia.state_triggers.Ready.assert_called_once_with()
+
+        with instruments['gaia'] as gaia_in_use:
+            self.assertEqual(gaia_in_use, gaia.__enter__.return_value)
+        self.assertEqual(instruments['gaia']['channel'], gaia['channel'])
+
+        ready = instruments['gaia'].state_triggers.Ready
+        self.token.cancel('Timeout')
+        with self.assertRaises(exceptions.TestCaseCancelled):
+            ready()
+        with self.assertRaises(exceptions.TestCaseCancelled):
+            instruments['gaia'].state_triggers
+
+
+class CancellableBarrierTest(unittest.TestCase):
+    def wait_in_thread(self, barrier, token=None):
+        result = {}
+
+        def wait():
+            try:
+                result['index'] = barrier.wait(5, token)
+            except threading.BrokenBarrierError:
+                result['broken'] = True
+
+        thread = threading.Thread(target=wait)
+        thread.start()
+        return thread, result
+
+    def test_other_parties_continue_when_party_leaves(self):
+        barrier = cancellation.CancellableBarrier(3)
+        thread, result = self.wait_in_thread(barrier, cancellation.CancellationToken())
+
+        barrier.leave(cancellation.CancellationToken())
+        barrier.wait(5, cancellation.CancellationToken())
+        thread.join(5)
+
+        self.assertIn('index', result)
+        self.assertEqual(barrier.parties, 2)
+
+    def test_waiting_party_is_released_when_it_leaves(self):
+        barrier = cancellation.CancellableBarrier(3)
+        cancelled = cancellation.CancellationToken()
+        cancelled_thread, cancelled_result = self.wait_in_thread(barrier, cancelled)
+        thread, result = self.wait_in_thread(barrier, cancellation.CancellationToken())
+        while barrier.n_waiting < 2:
+            time.sleep(0.01)
+
+        barrier.leave(cancelled)
+        cancelled_thread.join(5)
+        self.assertTrue(cancelled_result.get('broken'))
+        self.assertTrue(thread.is_alive())
+
+        barrier.wait(5, cancellation.CancellationToken())
+        thread.join(5)
+        self.assertIn('index', result)
+
+    def test_abort_breaks_all_parties(self):
+        barrier = cancellation.CancellableBarrier(2)
+        thread, result = self.wait_in_thread(barrier)
+        while barrier.n_waiting < 1:
+            time.sleep(0.01)
+
+        barrier.abort()
+        thread.join(5)
+
+        self.assertTrue(result.get('broken'))
+        with self.assertRaises(threading.BrokenBarrierError):
+            barrier.wait(5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+"""Results of the DUT added by concurrent test cases"""
+import random
+import sys
+import threading
+import unittest
+
+from test_runner.dut import Dut
+
+
+class ConcurrentResultsTest(unittest.TestCase):
+    THREADS = 16
+    RESULTS_PER_THREAD = 50
+    ROUNDS = 50
+
+    def setUp(self):
+        # Switch threads as often as possible to expose unlocked read-modify-write
+        self.switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+
+    def tearDown(self):
+        sys.setswitchinterval(self.switch_interval)
+
+    def add_results(self, dut, bad_case, bad_result):
+        barrier = threading.Barrier(self.THREADS)
+
+        def add(index):
+            barrier.wait()
+            for count in range(self.RESULTS_PER_THREAD):
+                bad = index == bad_case and count == self.RESULTS_PER_THREAD // 2
+                dut.add_result(f'Case{index}', bad_result if bad else 'pass')
+
+        threads = [threading.Thread(target=add, args=(i,)) for i in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def test_fail_and_error_are_not_lost(self):
+        for _ in range(self.ROUNDS):
+            dut = Dut('sn_1', 'position_1')
+            for index in range(self.THREADS):
+                dut.test_cases[f'Case{index}'] = {'result': 'testing', 'measurements': {}}
+            bad_case = random.randrange(self.THREADS)
+            bad_result = random.choice(['error', 'fail'])
+
+            self.add_results(dut, bad_case, bad_result)
+
+            self.assertEqual(dut.pass_fail_result, bad_result)
+            self.assertEqual(dut.test_cases[f'Case{bad_case}']['result'], bad_result)
+            steps = dut.error_steps if bad_result == 'error' else dut.failed_steps
+            self.assertEqual(steps, [f'Case{bad_case}'])
+
+
+if __name__ == '__main__':
+    unittest.main()
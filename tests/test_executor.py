@@ -0,0 +1,109 @@
+"""Process pool for work offloaded by test cases"""
+import importlib.util
+import pathlib
+import sys
+import tempfile
+import threading
+import unittest
+
+from test_runner import executor
+
+
+class ProcessPoolTest(unittest.TestCase):
+    def setUp(self):
+        executor.start_process_pool(1)
+
+    def tearDown(self):
+        executor.shutdown_process_pool()
+        sys.modules.pop('offloaded_case', None)
+
+    def test_function_of_module_loaded_from_file(self):
+        # Like test cases of a sequence, the module is not importable by its name
+        with tempfile.TemporaryDirectory() as directory:
+            path = pathlib.Path(directory, 'offloaded_case.py')
+            path.write_text('def square(value):\n    return value * value\n')
+
+            spec = importlib.util.spec_from_file_location('offloaded_case', path)
+            module = importlib.util.module_from_spec(spec)
+            sys.modules['offloaded_case'] = module
+            spec.loader.exec_module(module)
+
+            self.assertEqual(executor.run_in_process(module.square, 12), 144)
+
+
+class PostProcessingStageTest(unittest.TestCase):
+    def setUp(self):
+        self.stage = executor.PostProcessingStage(per_position=1, per_station=2)
+        self.release = threading.Event()
+        self.lock = threading.Lock()
+        self.running = 0
+        self.max_running = 0
+
+    def tearDown(self):
+        self.release.set()
+        self.stage.shutdown()
+
+    def post_test(self):
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        self.release.wait(5)
+        with self.lock:
+            self.running -= 1
+
+    def submit_on_thread(self, test_position_name, on_wait):
+        """Returns thread submitting the post-test and the list the future is put on"""
+        futures = []
+        thread = threading.Thread(
+            target=lambda: futures.append(
+                self.stage.submit(test_position_name, self.post_test, on_wait)
+            )
+        )
+        thread.start()
+        return thread, futures
+
+    def test_submit_blocks_when_test_position_is_full(self):
+        waits = []
+        first = self.stage.submit('position_1', self.post_test, lambda: waits.append(1))
+
+        thread, futures = self.submit_on_thread('position_1', lambda: waits.append(2))
+        thread.join(0.2)
+        self.assertTrue(thread.is_alive())
+        self.assertEqual(waits, [2])
+
+        # Another test position has its own slots
+        other = self.stage.submit('position_2', self.post_test)
+
+        self.release.set()
+        thread.join(5)
+        for future in [first, other] + futures:
+            future.result(5)
+        self.assertEqual(self.max_running, 2)
+
+    def test_submit_blocks_when_station_is_full(self):
+        futures = [
+            self.stage.submit(name, self.post_test) for name in ('position_1', 'position_2')
+        ]
+        waits = []
+
+        thread, blocked = self.submit_on_thread('position_3', lambda: waits.append(3))
+        thread.join(0.2)
+        self.assertTrue(thread.is_alive())
+        self.assertEqual(waits, [3])
+
+        self.release.set()
+        thread.join(5)
+        for future in futures + blocked:
+            future.result(5)
+        self.assertEqual(self.max_running, 2)
+
+        statistics = self.stage.statistics()
+        self.assertEqual(statistics['per_position'], 1)
+        self.assertEqual(statistics['per_station'], 2)
+        for latency in statistics['latency'].values():
+            self.assertEqual(latency['count'], 3)
+        self.assertGreaterEqual(statistics['latency']['wait']['max_s'], 0.2)
+
+
+if __name__ == '__main__':
+    unittest.main()
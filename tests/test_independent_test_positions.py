@@ -0,0 +1,143 @@
+"""Test positions testing their DUTs independently of each other"""
+import logging
+import threading
+import time
+import unittest
+from unittest import mock
+
+from conftest import Progress
+from conftest import create_common_definitions
+from conftest import create_test_definitions
+from conftest import create_test_positions
+from test_runner import executor as task_executor
+from test_runner import instrument_locks
+from test_runner import runner
+from test_runner import test_case
+from test_runner import timing
+from test_runner.dut import Dut
+
+
+class Measuring(test_case.TestCase):
+    """Passes at once on position_1, measures on position_2 until it is aborted"""
+
+    started = {}
+
+    def test(self):
+        Measuring.started[self.dut.test_position].set()
+        deadline = time.monotonic() + 5
+        while self.dut.test_position == 'position_2' and time.monotonic() < deadline:
+            self.new_measurement('value', 1)
+            time.sleep(0.01)
+        self.new_measurement('value', 1)
+
+    def post_test(self):
+        pass
+
+
+class AbortTest(unittest.TestCase):
+    def setUp(self):
+        self.logger = logging.getLogger('test_independent_test_positions')
+        self.test_positions = create_test_positions(2)
+        Measuring.started = {name: threading.Event() for name in self.test_positions}
+        self.reported = {name: threading.Event() for name in self.test_positions}
+        self.finalized = []
+        self.aborted = []
+
+        def create_report(report_json, results, test_positions, *args):
+            for name in test_positions:
+                self.reported[name].set()
+
+        self.common_definitions = create_common_definitions(
+            PARALLEL_EXECUTION='PARALLEL',
+            LOOP_EXECUTION=False,
+            SN_FROM_UI=False,
+            SN_EXTERNALLY=False,
+            TEST_SEQUENCES=['sequence'],
+            RUNNING_MODES=['Production'],
+            GAGE_RR={},
+            handle_instrument_status=lambda progress, logger: None,
+            update_parameters=lambda common_definitions, logger: None,
+            identify_DUTs=lambda sn, instruments, logger: (
+                {name: {'sn': f'sn_{name}'} for name in self.test_positions},
+                'sequence',
+                {'name': 'operator'},
+            ),
+            prepare_test=lambda *args: None,
+            prepare_test_case=lambda *args: None,
+            parse_dut_info=lambda dut_info, name, order: Dut(dut_info['sn'], name),
+            get_tester_info=lambda: 'tester',
+            get_test_run_id=lambda start_time: str(start_time),
+            finalize_test=lambda result, test_positions, *args: self.finalized.extend(
+                test_positions
+            ),
+            test_aborted=lambda instruments, logger: self.aborted.append(instruments),
+            create_report=create_report,
+        )
+        self.test_definitions = create_test_definitions(
+            {'Measuring': {'value': {'min': 1}}}, Measuring
+        )
+        self.test_definitions.SKIP = []
+        self.test_control = {
+            'abort': False,
+            'terminate': False,
+            'single_run': True,
+            'retest_on_fail': 0,
+            'report_off': False,
+            'get_sn_from_ui': False,
+            'get_sn_externally': False,
+            'run': threading.Event(),
+        }
+        self.test_control['run'].set()
+        self.executor = task_executor.Executor(list(self.test_positions), 2, 1, 2)
+
+    def tearDown(self):
+        self.executor.shutdown()
+
+    def run_test_positions(self):
+        with mock.patch.object(
+            runner,
+            'load_test_definitions',
+            return_value=(self.test_definitions, None, None),
+        ):
+            runner.run_independent_test_positions(
+                self.test_control,
+                self.common_definitions,
+                Progress(),
+                self.executor,
+                instrument_locks.InstrumentLocks(),
+                None,
+                timing.TestCaseTiming(),
+                None,
+                self.test_positions,
+                None,
+                lambda message: None,
+                self.logger,
+            )
+
+    def test_abort_stops_only_test_runs_in_progress(self):
+        thread = threading.Thread(target=self.run_test_positions)
+        thread.start()
+
+        self.assertTrue(self.reported['position_1'].wait(5))
+        self.assertTrue(Measuring.started['position_2'].wait(5))
+        self.test_control['abort'] = True
+        thread.join(10)
+        self.assertFalse(thread.is_alive())
+
+        position_1 = self.test_positions['position_1']
+        position_2 = self.test_positions['position_2']
+        self.assertEqual(position_1.dut.pass_fail_result, 'pass')
+        self.assertEqual(position_1.status, 'finalize')
+        self.assertEqual(position_2.dut.pass_fail_result, 'abort')
+        self.assertEqual(position_2.status, 'abort')
+        self.assertEqual(self.finalized, ['position_1'])
+        self.assertEqual(self.aborted, [{}])
+        self.assertTrue(self.reported['position_2'].is_set())
+
+        # The station wide abort was handed to the test positions
+        self.assertFalse(self.test_control['abort'])
+        self.assertTrue(self.test_control['terminate'])
+
+
+if __name__ == '__main__':
+    unittest.main()
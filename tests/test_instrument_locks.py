@@ -0,0 +1,72 @@
+"""Locks of REQUIRED_INSTRUMENTS"""
+import logging
+import unittest
+
+from conftest import create_common_definitions
+from conftest import create_test_definitions
+from conftest import create_test_positions
+from conftest import create_test_run
+from test_runner import cancellation
+from test_runner import executor as task_executor
+from test_runner import instrument_locks
+from test_runner import test_case
+
+
+class SyncingWithExclusiveInstrument(test_case.TestCase):
+    REQUIRED_INSTRUMENTS = {'dmm': test_case.InstrumentAccess.EXCLUSIVE}
+
+    def test(self):
+        self.sync_threads(2)
+        self.new_measurement('value', 1)
+
+    def post_test(self):
+        pass
+
+
+class InstrumentLocksTest(unittest.TestCase):
+    def setUp(self):
+        test_definitions = create_test_definitions(
+            {'SyncingWithExclusiveInstrument': {'value': {'min': 1}}},
+            SyncingWithExclusiveInstrument,
+        )
+        self.test_positions = create_test_positions(2)
+        self.executor = task_executor.Executor(list(self.test_positions), 2, 1, 2)
+
+        self.test_run = create_test_run(
+            create_common_definitions(FLOW_CONTROL=test_case.FlowControl.CONTINUE),
+            test_definitions,
+            self.test_positions,
+            self.executor,
+            instrument_locks=instrument_locks.InstrumentLocks(),
+            logger=logging.getLogger('test_instrument_locks'),
+        )
+
+    def tearDown(self):
+        self.executor.shutdown()
+
+    def test_sync_threads_releases_exclusive_instruments(self):
+        self.test_run.all_pos_mid_test_cases_completed = cancellation.CancellableBarrier(2)
+        self.test_run.mid_case_reset_barrier = cancellation.CancellableBarrier(2)
+
+        task_executor.join(
+            [
+                self.executor.submit(
+                    name,
+                    self.test_run.run_test_case,
+                    name,
+                    position,
+                    'SyncingWithExclusiveInstrument',
+                    True,
+                )
+                for name, position in self.test_positions.items()
+            ],
+            logging.getLogger('test_instrument_locks'),
+        )
+        self.test_run.join_post_tests()
+
+        for position in self.test_positions.values():
+            self.assertEqual(position.dut.pass_fail_result, 'pass')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,177 @@
+"""Progress sent to websocket clients"""
+import json
+import unittest
+from unittest import mock
+
+from test_runner import progress_reporter
+
+try:
+    from listener import listener
+except ImportError:
+    # Dependencies of the listener, e.g. bcrypt, are not installed
+    listener = None
+
+
+def progress(version):
+    return {'general_state': 'testing', 'duts': {'1': {'step': f'step_{version}'}}}
+
+
+def apply_patch(document, patch):
+    """Returns copy of the document with the JSON patch applied, as a client does"""
+    document = json.loads(json.dumps(document))
+    for operation in patch:
+        keys = [
+            key.replace('~1', '/').replace('~0', '~') for key in operation['path'].split('/')[1:]
+        ]
+        if not keys:
+            document = operation['value']
+            continue
+        parent = document
+        for key in keys[:-1]:
+            parent = parent[key]
+        if operation['op'] == 'remove':
+            del parent[keys[-1]]
+        else:
+            parent[keys[-1]] = operation['value']
+    return document
+
+
+@unittest.skipIf(listener is None, "Dependencies of the listener are not installed")
+class ProgressWebsocketTest(unittest.TestCase):
+    def create_client(self, delta=False, positions=None, fields=None):
+        client = listener.ProgressWebsocketHandler.__new__(listener.ProgressWebsocketHandler)
+        client.initialize(message_handlers=[], test_control={})
+        client.delta = delta
+        client.subscribe(positions, fields)
+        client.written = []
+        client.write_progress = client.written.append
+        return client
+
+    def not_computed(self, name):
+        """Patches property of progress messages to fail the test if it is read"""
+        return mock.patch.object(
+            progress_reporter.ProgressMessage,
+            name,
+            new_callable=mock.PropertyMock,
+            side_effect=AssertionError(f"{name} computed"),
+        )
+
+    def test_full_progress_client_does_not_compare_versions(self):
+        client = self.create_client()
+        with self.not_computed('patch'), self.not_computed('delta_json'):
+            client.send_selected(progress_reporter.ProgressMessage(1, progress(1)))
+            client.send_selected(progress_reporter.ProgressMessage(2, progress(1), 1, progress(1)))
+
+        self.assertEqual([json.loads(msg) for msg in client.written], [progress(1)] * 2)
+
+    def test_subscribed_client_does_not_serialise_deltas(self):
+        client = self.create_client(fields=['duts'])
+        with self.not_computed('delta_json'):
+            client.send_selected(progress_reporter.ProgressMessage(1, progress(1)))
+            client.send_selected(progress_reporter.ProgressMessage(2, progress(1), 1, progress(1)))
+            client.send_selected(progress_reporter.ProgressMessage(3, progress(3), 2, progress(1)))
+
+        self.assertEqual(
+            [json.loads(msg) for msg in client.written],
+            [{'duts': progress(1)['duts']}, {'duts': progress(3)['duts']}],
+        )
+
+    def test_delta_is_from_version_sent_last(self):
+        client = self.create_client(delta=True)
+        client.send_selected(progress_reporter.ProgressMessage(1, progress(1)))
+        client.send_selected(progress_reporter.ProgressMessage(2, progress(2), 1, progress(1)))
+        # Version 3 is not sent, e.g. because of max_rate
+        client.send_selected(progress_reporter.ProgressMessage(4, progress(4), 3, progress(3)))
+        # Unchanged progress is not sent
+        client.send_selected(progress_reporter.ProgressMessage(5, progress(4), 4, progress(4)))
+
+        snapshot, *deltas = [json.loads(msg) for msg in client.written]
+        self.assertEqual(snapshot, {'type': 'snapshot', 'version': 1, 'progress': progress(1)})
+        self.assertEqual(
+            [(delta['type'], delta['version'], delta['base_version']) for delta in deltas],
+            [('delta', 2, 1), ('delta', 4, 2)],
+        )
+        patched = progress(1)
+        for delta in deltas:
+            patched = apply_patch(patched, delta['patch'])
+        self.assertEqual(patched, progress(4))
+
+    def test_older_versions_are_not_sent(self):
+        client = self.create_client(delta=True)
+        client.send_selected(progress_reporter.ProgressMessage(2, progress(2), 1, progress(1)))
+        client.send_selected(progress_reporter.ProgressMessage(1, progress(1)))
+
+        self.assertEqual([json.loads(msg)['version'] for msg in client.written], [2])
+
+    def test_resync_sends_snapshot_of_latest_version(self):
+        client = self.create_client(delta=True)
+        client.send_selected(progress_reporter.ProgressMessage(1, progress(1)))
+        client.test_control['progress_message'] = progress_reporter.ProgressMessage(
+            2, progress(2), 1, progress(1)
+        )
+
+        client.on_message(json.dumps({'type': 'resync'}))
+
+        self.assertEqual(
+            json.loads(client.written[-1]),
+            {'type': 'snapshot', 'version': 2, 'progress': progress(2)},
+        )
+
+    def test_subscribe_sends_snapshot_of_subscribed_progress(self):
+        client = self.create_client(delta=True)
+        client.test_control['progress_message'] = progress_reporter.ProgressMessage(1, progress(1))
+
+        client.on_message(json.dumps({'type': 'subscribe', 'fields': ['general_state']}))
+
+        self.assertEqual(
+            json.loads(client.written[-1]),
+            {'type': 'snapshot', 'version': 1, 'progress': {'general_state': 'testing'}},
+        )
+
+    def test_max_rate_sends_latest_version(self):
+        client = self.create_client(delta=True)
+        client.subscribe(max_rate=2)
+        client.loop = mock.Mock()
+        client.send_progress(progress_reporter.ProgressMessage(1, progress(1)))
+        client.send_progress(progress_reporter.ProgressMessage(2, progress(2), 1, progress(1)))
+        client.send_progress(progress_reporter.ProgressMessage(3, progress(3), 2, progress(2)))
+
+        self.assertEqual(len(client.written), 1)
+        (wait_s, send_pending), _ = client.loop.call_later.call_args
+        self.assertEqual(client.loop.call_later.call_count, 1)
+        self.assertLessEqual(wait_s, 0.5)
+        send_pending()
+
+        delta = json.loads(client.written[-1])
+        self.assertEqual((delta['version'], delta['base_version']), (3, 1))
+        self.assertEqual(apply_patch(progress(1), delta['patch']), progress(3))
+
+
+@unittest.skipIf(listener is None, "Dependencies of the listener are not installed")
+class ProgressHandlersTest(unittest.TestCase):
+    def setUp(self):
+        progress = {
+            'general_state': 'testing',
+            'duts': {'1': {'step': 'First', 'sn': 'sn_1', 'dut_class': {'test_cases': {}}}},
+        }
+        message = progress_reporter.ProgressMessage(1, progress)
+        self.test_control = {'progress': progress, 'progress_message': message}
+        self.published = json.loads(message.json)
+
+    def handle_get(self, handler_class):
+        handler = handler_class.__new__(handler_class)
+        handler.test_control = self.test_control
+        return json.loads(handler.handle_get('localhost', None))
+
+    def test_handlers_do_not_change_published_progress(self):
+        self.assertEqual(
+            self.handle_get(listener.DutsHandler), {'1': {'step': 'First', 'sn': 'sn_1'}}
+        )
+        self.assertEqual(self.handle_get(listener.CurrentTestHandler), {'1': 'First'})
+        self.assertEqual(self.handle_get(listener.ProgressHandler), {'progress': self.published})
+
+        self.assertEqual(self.test_control['progress'], self.published)
+
+
+if __name__ == '__main__':
+    unittest.main()
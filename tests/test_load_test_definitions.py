@@ -0,0 +1,124 @@
+"""Limits of test definitions merged and cached by load_test_definitions"""
+import itertools
+import logging
+import pathlib
+import sys
+import tempfile
+import unittest
+
+from conftest import create_common_definitions
+from test_runner import helpers
+from test_runner import limits
+from test_runner import runner
+
+SEQUENCE = '''
+LIMITS = {"First": {"value": {"min": 1}, "other": {"max": 5}}}
+'''
+
+TEST_CASE_POOL = '''
+LIMITS = {"First": {"value": {"min": 0, "unit": "V"}}, "Second": {"value": {"min": 0}}}
+'''
+
+
+def update_test_case_params(common_definitions, sequence_name, test_definitions, logger):
+    common_definitions.updates += 1
+    test_definitions.LIMITS['First']['value']['min'] += 10
+
+
+def get_test_case_params_token(common_definitions, sequence_name, logger):
+    return 'token'
+
+
+class LoadTestDefinitionsTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        root = pathlib.Path(self.directory.name)
+        (root / 'sequences' / 'cached_sequence').mkdir(parents=True)
+        (root / 'sequences' / '__init__.py').write_text('')
+        (root / 'sequences' / 'cached_sequence' / '__init__.py').write_text(SEQUENCE)
+        (root / 'test_case_pool').mkdir()
+        (root / 'test_case_pool' / '__init__.py').write_text(TEST_CASE_POOL)
+        sys.path.insert(0, self.directory.name)
+
+        self.common_definitions = create_common_definitions(
+            update_test_case_params=update_test_case_params,
+            get_test_case_params_token=get_test_case_params_token,
+            updates=0,
+        )
+        self.logger = logging.getLogger('test_load_test_definitions')
+
+    def tearDown(self):
+        sys.path.remove(self.directory.name)
+        # pylint: disable=protected-access
+        for name in ('sequences', 'sequences.cached_sequence', 'test_case_pool'):
+            sys.modules.pop(name, None)
+            helpers._LOAD_COUNTS.pop(name, None)
+            helpers._SOURCE_MTIMES.pop(name, None)
+        runner._LIMITS_CACHE.pop('cached_sequence', None)
+        self.directory.cleanup()
+
+    def load(self):
+        return runner.load_test_definitions(self.common_definitions, 'cached_sequence', self.logger)
+
+    def test_cached_limits_are_reused(self):
+        test_definitions, test_pool, compiled_limits = self.load()
+        limits = test_definitions.LIMITS
+
+        for _ in range(3):
+            test_definitions, test_pool, cached_compiled_limits = self.load()
+
+            self.assertIs(test_definitions.LIMITS, limits)
+            self.assertIs(cached_compiled_limits, compiled_limits)
+            self.assertIs(compiled_limits.limits, limits)
+            self.assertEqual(
+                test_definitions.LIMITS,
+                {
+                    'First': {'value': {'min': 11, 'unit': 'V'}, 'other': {'max': 5}},
+                    'Second': {'value': {'min': 0}},
+                },
+            )
+            self.assertEqual(test_pool.LIMITS['First']['value'], {'min': 0, 'unit': 'V'})
+
+        self.assertEqual(self.common_definitions.updates, 1)
+        self.assertEqual(helpers.get_load_count(test_definitions), 1)
+        self.assertEqual(helpers.get_load_count(test_pool), 1)
+
+    def test_sequence_is_reloaded_when_token_changes(self):
+        tokens = itertools.count()
+        self.common_definitions.get_test_case_params_token = lambda *args: next(tokens)
+
+        compiled = []
+        for load_count in (1, 2, 3):
+            test_definitions, _, compiled_limits = self.load()
+
+            self.assertEqual(test_definitions.LIMITS['First']['value']['min'], 11)
+            self.assertIs(compiled_limits.limits, test_definitions.LIMITS)
+            self.assertEqual(helpers.get_load_count(test_definitions), load_count)
+            self.assertEqual(self.common_definitions.updates, load_count)
+            compiled.append(compiled_limits)
+
+        self.assertEqual(len(set(map(id, compiled))), 3)
+
+    def test_sequence_is_reloaded_without_token(self):
+        del self.common_definitions.get_test_case_params_token
+
+        for load_count in (1, 2):
+            test_definitions, _, _ = self.load()
+
+            self.assertEqual(test_definitions.LIMITS['First']['value']['min'], 11)
+            self.assertEqual(helpers.get_load_count(test_definitions), load_count)
+
+    def test_sources_of_limit_functions_are_forgotten_on_reload(self):
+        self.load()
+        limits.get_source(update_test_case_params)
+        self.load()
+        # pylint: disable=protected-access
+        self.assertIn(update_test_case_params.__code__, limits._SOURCE_CACHE)
+
+        self.common_definitions.get_test_case_params_token = lambda *args: 'new token'
+        self.load()
+        self.assertNotIn(update_test_case_params.__code__, limits._SOURCE_CACHE)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,157 @@
+"""Measurement types stored by test cases"""
+import collections.abc
+import copy
+import json
+import os
+import pickle
+import tempfile
+import unittest
+
+from test_runner import measurements
+
+
+class MeasurementRecordTest(unittest.TestCase):
+    def setUp(self):
+        self.record = measurements.MeasurementRecord()
+        self.record['measurement'] = 95
+        self.record['unit'] = 'dB'
+        self.record['note'] = 'extra key'
+
+    def test_record_is_mapping(self):
+        self.assertIsInstance(self.record, collections.abc.MutableMapping)
+        self.assertEqual(self.record, {'measurement': 95, 'unit': 'dB', 'note': 'extra key'})
+        self.assertEqual(list(self.record), ['measurement', 'unit', 'note'])
+        self.assertEqual(len(self.record), 3)
+
+        self.record.update(result='pass', error=None)
+        del self.record['note']
+        self.assertEqual(
+            dict(self.record), {'measurement': 95, 'error': None, 'unit': 'dB', 'result': 'pass'}
+        )
+        self.assertNotIn('limit', self.record)
+        with self.assertRaises(KeyError):
+            del self.record['limit']
+
+    def test_results_are_converted_to_dictionaries(self):
+        results = {'sn_1': {'First': {'result': 'pass', 'measurements': {'value': self.record}}}}
+        converted = measurements.to_dicts(results)
+
+        record = converted['sn_1']['First']['measurements']['value']
+        self.assertIs(type(record), dict)
+        self.assertEqual(record, self.record)
+        self.assertEqual(
+            json.dumps(converted), json.dumps(results, default=measurements.json_default)
+        )
+
+
+@unittest.skipIf(measurements.numpy is None, "ArrayMeasurement requires NumPy")
+class ArrayMeasurementTest(unittest.TestCase):
+    def test_summary(self):
+        array_measurement = measurements.ArrayMeasurement([1.0, 4.0, -2.0, 3.0])
+        array_measurement.info['unit'] = 'V'
+        array_measurement.set_fail_mask(measurements.numpy.array([False, True, True, False]))
+
+        self.assertEqual(
+            array_measurement.summary(),
+            {
+                'type': 'array',
+                'shape': [4],
+                'dtype': 'float64',
+                'min': -2.0,
+                'max': 4.0,
+                'mean': 1.5,
+                'argmax': 1,
+                'fail_count': 2,
+                'file_path': None,
+                'url': None,
+                'unit': 'V',
+            },
+        )
+        json.dumps(array_measurement.summary())
+
+    def test_summary_of_empty_array(self):
+        summary = measurements.ArrayMeasurement([]).summary()
+
+        self.assertEqual(summary['shape'], [0])
+        self.assertIsNone(summary['min'])
+        self.assertIsNone(summary['argmax'])
+
+    def test_saved_array_is_memory_mapped(self):
+        with tempfile.TemporaryDirectory() as directory:
+            file_path = os.path.join(directory, 'waveform.npy')
+            array_measurement = measurements.ArrayMeasurement(measurements.numpy.arange(5))
+            array_measurement.save(file_path)
+            array_measurement.map_file(file_path, 'http://localhost/api/media/waveform.npy')
+
+            self.assertIsInstance(array_measurement.data, measurements.numpy.memmap)
+            self.assertEqual(array_measurement.data.tolist(), [0, 1, 2, 3, 4])
+            self.assertEqual(array_measurement.summary()['file_path'], file_path)
+            del array_measurement
+
+
+@unittest.skipIf(measurements.numpy is None, "StreamWriter requires NumPy")
+class MeasurementDictTest(unittest.TestCase):
+    def test_changes_are_taken_once(self):
+        case_measurements = measurements.MeasurementDict(first=1)
+        case_measurements['second'] = 2
+        self.assertEqual(case_measurements.take_changed(), {'first': 1, 'second': 2})
+        self.assertEqual(case_measurements.take_changed(), {})
+
+        case_measurements['first'] = 3
+        case_measurements.update(third=4)
+        case_measurements.pop('second')
+        case_measurements.mark_changed('third')
+        self.assertEqual(case_measurements.take_changed(), {'first': 3, 'third': 4})
+
+    def test_copies_keep_changes(self):
+        case_measurements = measurements.MeasurementDict(first=1)
+        case_measurements.take_changed()
+        case_measurements['second'] = 2
+
+        for copied in (copy.copy(case_measurements), pickle.loads(pickle.dumps(case_measurements))):
+            self.assertEqual(copied, {'first': 1, 'second': 2})
+            self.assertEqual(copied.take_changed(), {'second': 2})
+        self.assertEqual(json.loads(json.dumps(case_measurements)), {'first': 1, 'second': 2})
+
+
+class StreamWriterTest(unittest.TestCase):
+    def setUp(self):
+        self.closed = []
+
+    def writer(self, file_path=None):
+        return measurements.StreamWriter('samples', 'int64', 4, self.closed.append, file_path)
+
+    def test_oldest_samples_are_overwritten(self):
+        writer = self.writer()
+        writer.extend([1, 2, 3])
+        writer.extend([4, 5])
+        writer.append(6)
+
+        self.assertEqual(writer.data().tolist(), [3, 4, 5, 6])
+
+    def test_extend_with_more_than_capacity(self):
+        writer = self.writer()
+        writer.extend([1])
+        writer.extend(range(2, 8))
+        writer.append(8)
+
+        self.assertEqual(writer.data().tolist(), [5, 6, 7, 8])
+
+    def test_memory_mapped_buffer_is_written_in_place(self):
+        with tempfile.TemporaryDirectory() as directory:
+            file_path = os.path.join(directory, 'samples.bin')
+            writer = self.writer(file_path)
+            buffer = writer.buffer
+            writer.extend([1])
+            writer.extend(range(2, 8))
+
+            self.assertIs(writer.buffer, buffer)
+            self.assertIsInstance(writer.buffer, measurements.numpy.memmap)
+            self.assertEqual(writer.data().tolist(), [4, 5, 6, 7])
+
+            writer.buffer.flush()
+            del writer, buffer
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+"""Finishing of a test run while the next test run is prepared"""
+import logging
+import time
+import unittest
+
+from conftest import Progress
+from conftest import create_common_definitions
+from conftest import create_test_positions
+from test_runner import executor as task_executor
+from test_runner import runner
+
+
+class SnapshotTest(unittest.TestCase):
+    def setUp(self):
+        self.test_positions = create_test_positions(2)
+        self.results = {'performance': {}}
+        for position in self.test_positions.values():
+            dut = position.dut
+            dut.test_cases['Measuring'] = {'result': 'testing', 'measurements': {}}
+            dut.add_result('Measuring', 'fail')
+            self.results[dut.serial_number] = dut.test_cases
+
+    def test_next_test_run_does_not_change_snapshot(self):
+        results, test_positions = runner.snapshot_test_run(self.results, self.test_positions)
+
+        dut = self.test_positions['position_1'].dut
+        dut.test_cases['Measuring']['measurements']['late'] = 1
+        dut.add_result('Measuring', 'error')
+        for position in self.test_positions.values():
+            position.prepare_for_new_test_run()
+        self.results['performance']['changed'] = True
+
+        snapshot_dut = test_positions['position_1'].dut
+        self.assertIsNot(snapshot_dut, dut)
+        self.assertEqual(snapshot_dut.pass_fail_result, 'fail')
+        self.assertEqual(snapshot_dut.failed_steps, ['Measuring'])
+        self.assertEqual(snapshot_dut.test_cases['Measuring']['measurements'], {})
+        self.assertEqual(results['performance'], {})
+        # The results refer to the copied DUTs
+        self.assertIs(results['sn_1'], snapshot_dut.test_cases)
+        self.assertIsNotNone(test_positions['position_2'].dut)
+
+        # DUT of the snapshot has its own lock
+        snapshot_dut.add_result('Measuring', 'pass')
+        self.assertEqual(snapshot_dut.pass_fail_result, 'fail')
+
+
+class OverlapTest(unittest.TestCase):
+    FINALIZE_S = 0.2
+
+    def setUp(self):
+        self.reports = []
+
+        def create_report(report_json, results, *args):
+            self.reports.append(results)
+
+        self.common_definitions = create_common_definitions(
+            finalize_test=lambda *args: time.sleep(self.FINALIZE_S),
+            create_report=create_report,
+        )
+        self.executor = task_executor.Executor([], 1, 1, 1)
+        self.logger = logging.getLogger('test_pipelined_test_runs')
+
+    def tearDown(self):
+        self.executor.shutdown()
+
+    def finish(self):
+        """Finishes a test run on background like the runner does"""
+        pipeline = {'next_run_waiting': None}
+        finishing = self.executor.submit_finish(
+            runner.finish_test_run,
+            self.common_definitions,
+            Progress(),
+            None,
+            {'performance': {}},
+            {},
+            {},
+            'pass',
+            True,
+            True,
+            lambda message: None,
+            self.logger,
+            pipeline,
+        )
+        return finishing, pipeline
+
+    def test_overlap_is_reported_on_finished_test_run(self):
+        previous_test_run = self.finish()
+        # The next test run prepares longer than the previous one is finalized
+        time.sleep(self.FINALIZE_S * 2)
+        runner.wait_previous_test_run(previous_test_run, self.logger)
+
+        overlap_s = self.reports[0]['performance']['pipeline_overlap_s']
+        self.assertGreaterEqual(overlap_s, self.FINALIZE_S - 0.05)
+        self.assertLess(overlap_s, self.FINALIZE_S * 2)
+
+    def test_waiting_is_not_overlap(self):
+        previous_test_run = self.finish()
+        runner.wait_previous_test_run(previous_test_run, self.logger)
+
+        self.assertLess(self.reports[0]['performance']['pipeline_overlap_s'], 0.05)
+
+
+if __name__ == '__main__':
+    unittest.main()
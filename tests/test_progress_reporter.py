@@ -0,0 +1,291 @@
+"""Progress published to UI"""
+import json
+import queue
+import threading
+import time
+import unittest
+
+from test_runner import measurements
+from test_runner import progress_reporter
+from test_runner import test_position
+from test_runner.dut import Dut
+
+
+class DiffTest(unittest.TestCase):
+    def test_changed_keys_are_patched(self):
+        old = {'general_state': 'testing', 'duts': {'1': {'step': 'First'}, '2': {'step': None}}}
+        new = {'general_state': 'testing', 'duts': {'1': {'step': 'Second'}, '3': {'step': None}}}
+
+        self.assertEqual(
+            progress_reporter.diff(old, new),
+            [
+                {'op': 'remove', 'path': '/duts/2'},
+                {'op': 'replace', 'path': '/duts/1/step', 'value': 'Second'},
+                {'op': 'add', 'path': '/duts/3', 'value': {'step': None}},
+            ],
+        )
+
+    def test_keys_are_escaped(self):
+        self.assertEqual(
+            progress_reporter.diff({'a/b~c': 1}, {'a/b~c': 2}),
+            [{'op': 'replace', 'path': '/a~1b~0c', 'value': 2}],
+        )
+
+    def test_lists_and_types_are_replaced_as_a_whole(self):
+        self.assertEqual(
+            progress_reporter.diff({'steps': [1, 2], 'value': 1}, {'steps': [1, 3], 'value': 1.0}),
+            [
+                {'op': 'replace', 'path': '/steps', 'value': [1, 3]},
+                {'op': 'replace', 'path': '/value', 'value': 1.0},
+            ],
+        )
+
+    def test_unchanged(self):
+        progress = {'duts': {'1': {'step': 'First'}}}
+
+        self.assertEqual(progress_reporter.diff(progress, json.loads(json.dumps(progress))), [])
+
+
+class ProgressMessageTest(unittest.TestCase):
+    def setUp(self):
+        self.base = {'general_state': 'testing', 'duts': {'1': {'step': 'First'}}}
+        self.progress = {'general_state': 'testing', 'duts': {'1': {'step': 'Second'}}}
+
+    def test_delta_json(self):
+        message = progress_reporter.ProgressMessage(8, self.progress, 7, self.base)
+
+        self.assertEqual(
+            json.loads(message.delta_json),
+            {
+                'type': 'delta',
+                'version': 8,
+                'base_version': 7,
+                'patch': [{'op': 'replace', 'path': '/duts/1/step', 'value': 'Second'}],
+            },
+        )
+        self.assertEqual(
+            json.loads(message.snapshot_json),
+            {'type': 'snapshot', 'version': 8, 'progress': self.progress},
+        )
+
+    def test_first_version_has_no_delta(self):
+        message = progress_reporter.ProgressMessage(1, self.progress)
+
+        self.assertIsNone(message.patch)
+        self.assertIsNone(message.delta_json)
+
+    def test_json_of_fragments(self):
+        fragments = {'1': json.dumps(self.progress['duts']['1'])}
+        message = progress_reporter.ProgressMessage(8, self.progress, fragments=fragments)
+
+        self.assertEqual(json.loads(message.json), self.progress)
+
+    def test_selected_message_is_cached(self):
+        message = progress_reporter.ProgressMessage(8, self.progress, 7, self.base)
+        fields = frozenset(['general_state'])
+
+        selected = message.select(fields=fields)
+
+        self.assertIs(message.select(fields=fields), selected)
+        self.assertIs(message.select(), message)
+        self.assertEqual(selected.progress, {'general_state': 'testing'})
+        self.assertEqual(selected.patch, [])
+
+
+class ProgressCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.test_control = {
+            'get_sn_from_ui': False,
+            'test_sequences': [],
+            'test_cases': [],
+            'running_mode': [],
+            'gage_rr': False,
+        }
+        self.test_positions = {}
+        for index in (1, 2):
+            position = test_position.TestPosition(str(index), index)
+            position.dut = Dut(f'sn_{index}', str(index))
+            measurement = measurements.MeasurementRecord()
+            measurement['measurement'] = 1
+            measurement['result'] = 'pass'
+            position.dut.test_cases['First'] = {
+                'result': 'pass',
+                'measurements': {'value': measurement},
+            }
+            position.dut.touch()
+            self.test_positions[str(index)] = position
+
+        self.progress_queue = queue.Queue()
+        self.reporter = progress_reporter.ProgressReporter(self.test_control, self.progress_queue)
+        self.reporter.set_progress(general_state='testing', test_positions=self.test_positions)
+
+    def publish(self):
+        self.reporter.set_progress(test_positions=self.test_positions)
+        message = self.test_control['progress_message']
+        self.assertEqual(json.loads(message.json), message.progress)
+        return message.progress['duts']['1']['dut_class']['test_cases']['First']
+
+    def test_unchanged_position_is_not_serialised_again(self):
+        first = self.test_control['progress']['duts']['1']
+        self.reporter.set_progress(test_positions=self.test_positions)
+
+        self.assertIs(self.test_control['progress']['duts']['1'], first)
+
+    def test_changes_made_in_place_are_published_after_touch(self):
+        dut = self.test_positions['1'].dut
+
+        dut.test_cases['First']['measurements']['value']['measurement'] = 2
+        self.assertEqual(self.publish()['measurements']['value']['measurement'], 1)
+        dut.touch()
+        self.assertEqual(self.publish()['measurements']['value']['measurement'], 2)
+
+        dut.test_cases['First']['measurements']['extra'] = {'measurement': [3]}
+        dut.touch()
+        self.assertEqual(self.publish()['measurements']['extra'], {'measurement': [3]})
+
+        dut.test_cases['First']['measurements']['extra']['measurement'].append(4)
+        dut.touch()
+        self.assertEqual(self.publish()['measurements']['extra'], {'measurement': [3, 4]})
+
+    def test_results_are_published_after_add_result(self):
+        self.test_positions['1'].dut.add_result('First', 'fail')
+
+        self.assertEqual(self.publish()['result'], 'fail')
+        progress = self.test_control['progress']
+        self.assertEqual(progress['duts']['1']['dut_class']['failed_steps'], ['First'])
+
+
+class CoalescingTest(unittest.TestCase):
+    def create_reporter(self, window_s=0, max_rate=None):
+        self.test_control = {
+            'get_sn_from_ui': False,
+            'test_sequences': [],
+            'test_cases': [],
+            'running_mode': [],
+            'gage_rr': False,
+        }
+        self.progress_queue = queue.Queue()
+        return progress_reporter.ProgressReporter(
+            self.test_control, self.progress_queue, window_s, max_rate
+        )
+
+    def wait_published(self, reporter, published, timeout=1):
+        deadline = time.monotonic() + timeout
+        while reporter.published < published and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def test_changes_within_window_are_published_once(self):
+        reporter = self.create_reporter(window_s=0.2)
+        reporter.set_progress(general_state='testing')
+        for index in range(20):
+            reporter.set_progress(sequence_name=f'sequence_{index}')
+        self.assertEqual(reporter.published, 1)
+
+        self.wait_published(reporter, 2)
+        time.sleep(0.1)
+
+        self.assertEqual(reporter.requested, 21)
+        self.assertEqual(reporter.published, 2)
+        self.assertEqual(self.test_control['progress']['sequence_name'], 'sequence_19')
+        self.assertEqual(self.progress_queue.qsize(), 2)
+
+    def test_change_of_general_state_is_published_at_once(self):
+        reporter = self.create_reporter(window_s=10)
+        reporter.set_progress(general_state='testing')
+        reporter.set_progress(sequence_name='sequence')
+        reporter.set_progress(general_state='finalize')
+
+        self.assertEqual(reporter.published, 2)
+        self.assertEqual(self.test_control['progress']['general_state'], 'finalize')
+        self.assertEqual(self.test_control['progress']['sequence_name'], 'sequence')
+
+    def test_max_rate(self):
+        reporter = self.create_reporter(max_rate=5)
+        start = time.monotonic()
+        for index in range(10):
+            reporter.set_progress(sequence_name=f'sequence_{index}')
+            time.sleep(0.005)
+
+        self.wait_published(reporter, 2)
+        elapsed = time.monotonic() - start
+        time.sleep(0.1)
+
+        # First change is published at once, the rest once the interval has passed
+        self.assertEqual(reporter.published, 2)
+        self.assertGreaterEqual(elapsed, 0.2 - 0.01)
+        self.assertEqual(self.test_control['progress']['sequence_name'], 'sequence_9')
+
+        message = self.test_control['progress_message']
+        self.assertEqual(message.base_version, message.version - 1)
+        self.assertEqual(
+            message.patch,
+            [{'op': 'replace', 'path': '/sequence_name', 'value': 'sequence_9'}],
+        )
+
+
+class SingleWriterTest(unittest.TestCase):
+    def setUp(self):
+        self.test_control = {
+            'get_sn_from_ui': False,
+            'test_sequences': [],
+            'test_cases': [],
+            'running_mode': [],
+            'gage_rr': False,
+        }
+        self.reporter = progress_reporter.ProgressReporter(self.test_control, queue.Queue())
+
+    def test_published_progress_is_not_changed(self):
+        self.reporter.set_instrument_status('dmm', 'ok')
+        progress = self.test_control['progress']
+        message = self.test_control['progress_message']
+        message_json = message.json
+
+        self.reporter.set_instrument_status('psu', 'ok')
+        self.reporter.show_operator_instructions('Insert DUT')
+        self.reporter.set_report_paths({'1': 'report'})
+
+        self.assertEqual(progress['instrument_status'], {'dmm': 'ok'})
+        self.assertIsNone(progress['operator_instructions'])
+        self.assertEqual(message.json, message_json)
+        self.assertEqual(
+            self.test_control['progress']['instrument_status'], {'dmm': 'ok', 'psu': 'ok'}
+        )
+        # Callers read their own writes
+        self.assertEqual(self.reporter.instrument_status, {'dmm': 'ok', 'psu': 'ok'})
+
+    def test_concurrent_writers_and_readers(self):
+        writers = 16
+        changes = 30
+        stop = threading.Event()
+        errors = []
+
+        def read():
+            while not stop.is_set():
+                try:
+                    json.dumps(self.test_control['progress'])
+                except Exception as err:  # pylint: disable=broad-except
+                    errors.append(err)
+
+        def write(writer):
+            for index in range(changes):
+                self.reporter.set_instrument_status(f'{writer}_{index}', 'ok')
+
+        self.reporter.set_progress(general_state='testing')
+        reader = threading.Thread(target=read)
+        reader.start()
+        threads = [threading.Thread(target=write, args=(writer,)) for writer in range(writers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        stop.set()
+        reader.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(self.reporter.requested, writers * changes + 1)
+        self.assertEqual(len(self.reporter.instrument_status), writers * changes)
+        self.assertEqual(len(self.test_control['progress']['instrument_status']), writers * changes)
+
+
+if __name__ == '__main__':
+    unittest.main()
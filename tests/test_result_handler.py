@@ -0,0 +1,157 @@
+"""Evaluation of measurements against limits"""
+import json
+import unittest
+
+from conftest import Progress
+from conftest import create_common_definitions
+from test_runner import measurements
+from test_runner import test_case
+from test_runner.dut import Dut
+
+
+class Measuring(test_case.TestCase):
+    def test(self):
+        pass
+
+    def post_test(self):
+        pass
+
+
+class ResultHandlerTest(unittest.TestCase):
+    def setUp(self):
+        self.evaluated = []
+
+        def limit(measurement):
+            self.evaluated.append(measurement)
+            return measurement > 0
+
+        limits = {
+            'Measuring': {
+                'first': {'limit': limit},
+                'second': {'limit': limit},
+                'direct': {'limit': limit},
+            }
+        }
+        common_definitions = create_common_definitions(FLOW_CONTROL=None)
+        self.dut = Dut('sn_1', 'position_1')
+        self.test_case = Measuring(limits, Progress(), self.dut, {}, None, common_definitions)
+        self.test_case.initialize_measurements()
+
+    def test_only_changed_measurements_are_evaluated(self):
+        self.test_case.new_measurement('first', 1)
+        self.test_case.new_measurement('second', 2)
+        self.test_case.evaluate_results()
+
+        self.test_case.new_measurement('second', -2)
+        self.test_case.evaluate_results()
+        self.test_case.evaluate_results()
+
+        self.assertEqual(self.evaluated, [1, 2, -2])
+        self.assertEqual(self.dut.test_cases['Measuring']['measurements']['second']['result'], 'fail')
+        self.assertEqual(self.dut.pass_fail_result, 'fail')
+
+    def test_measurement_stored_directly_is_evaluated_once(self):
+        self.test_case.new_measurement('first', 1)
+        self.test_case.evaluate_results()
+
+        record = measurements.MeasurementRecord()
+        record['measurement'] = 3
+        self.dut.test_cases['Measuring']['measurements']['direct'] = record
+        self.test_case.evaluate_results()
+        self.test_case.evaluate_results()
+
+        self.assertEqual(self.evaluated, [1, 3])
+        self.assertEqual(record['result'], 'pass')
+
+    def test_measurement_overwritten_directly_is_evaluated_again(self):
+        self.test_case.new_measurement('first', 1)
+        self.test_case.evaluate_results()
+
+        record = measurements.MeasurementRecord()
+        record['measurement'] = -1
+        self.dut.test_cases['Measuring']['measurements']['first'] = record
+        self.test_case.evaluate_results()
+
+        self.assertEqual(self.evaluated, [1, -1])
+        self.assertEqual(record['result'], 'fail')
+        self.assertEqual(self.dut.pass_fail_result, 'fail')
+
+    def test_measurement_added_after_delete_is_evaluated(self):
+        self.test_case.new_measurement('first', 1)
+        self.test_case.new_measurement('second', 2)
+        self.test_case.evaluate_results()
+
+        case_measurements = self.dut.test_cases['Measuring']['measurements']
+        del case_measurements['second']
+        record = measurements.MeasurementRecord()
+        record['measurement'] = 3
+        case_measurements['direct'] = record
+        self.test_case.evaluate_results()
+
+        self.assertEqual(self.evaluated, [1, 2, 3])
+        self.assertEqual(record['result'], 'pass')
+
+    def test_replaced_measurements_are_evaluated(self):
+        self.test_case.new_measurement('first', 1)
+        self.test_case.evaluate_results()
+
+        record = measurements.MeasurementRecord()
+        record['measurement'] = 4
+        self.dut.test_cases['Measuring']['measurements'] = {'direct': record}
+        self.test_case.evaluate_results()
+        self.test_case.evaluate_results()
+
+        self.assertEqual(self.evaluated, [1, 4])
+        self.assertEqual(record['result'], 'pass')
+
+
+
+@unittest.skipIf(measurements.numpy is None, "ArrayMeasurement requires NumPy")
+class ArrayMeasurementLimitsTest(unittest.TestCase):
+    def setUp(self):
+        limits = {
+            'Measuring': {
+                'waveform': {'min': 0, 'max': 5, 'unit': 'V'},
+                'gain': {'limit': lambda values: values > 1},
+            }
+        }
+        common_definitions = create_common_definitions(FLOW_CONTROL=None)
+        self.dut = Dut('sn_1', 'position_1')
+        self.test_case = Measuring(limits, Progress(), self.dut, {}, None, common_definitions)
+        self.test_case.initialize_measurements()
+
+    def test_elements_are_evaluated_against_limits(self):
+        self.test_case.new_array_measurement('waveform', [0.0, 6.0, 2.0, -1.0])
+        self.test_case.evaluate_results()
+
+        record = self.dut.test_cases['Measuring']['measurements']['waveform']
+        self.assertEqual(record['result'], 'fail')
+        self.assertEqual(record['unit'], 'V')
+        self.assertEqual(record['measurement']['fail_count'], 2)
+        self.assertEqual(record['measurement']['max'], 6.0)
+        self.assertEqual(
+            self.test_case.array_measurements['waveform'].fail_mask.tolist(),
+            [False, True, False, True],
+        )
+
+    def test_limit_function_returning_mask(self):
+        self.test_case.new_array_measurement('gain', [2, 3, 4])
+        self.test_case.evaluate_results()
+
+        record = self.dut.test_cases['Measuring']['measurements']['gain']
+        self.assertEqual(record['result'], 'pass')
+        self.assertEqual(record['measurement']['fail_count'], 0)
+        self.assertEqual(self.dut.pass_fail_result, 'pass')
+
+    def test_array_is_not_stored_to_results(self):
+        self.test_case.new_array_measurement('waveform', [1.0] * 1000, info={'step_s': 0.001})
+
+        measurement = self.dut.test_cases['Measuring']['measurements']['waveform']['measurement']
+        self.assertEqual(measurement['shape'], [1000])
+        self.assertEqual(measurement['step_s'], 0.001)
+        # Only the summary is stored, not the 1000 elements
+        self.assertLess(len(json.dumps(measurement)), 300)
+
+
+if __name__ == '__main__':
+    unittest.main()
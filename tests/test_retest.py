@@ -0,0 +1,96 @@
+"""Retest of failed test cases with FlowControl.STOP_ON_FAIL"""
+import logging
+import unittest
+
+from conftest import create_common_definitions
+from conftest import create_test_definitions
+from conftest import create_test_positions
+from conftest import create_test_run
+from test_runner import executor as task_executor
+from test_runner import test_case
+
+
+class FailingOnce(test_case.TestCase):
+    """Fails on the first run, passes when retested"""
+
+    runs = 0
+    fail_runs = 1
+
+    def test(self):
+        FailingOnce.runs += 1
+        self.new_measurement('value', 0 if FailingOnce.runs <= self.fail_runs else 1)
+
+    def post_test(self):
+        pass
+
+
+class Passing(test_case.TestCase):
+    runs = 0
+
+    def test(self):
+        Passing.runs += 1
+        self.new_measurement('value', 1)
+
+    def post_test(self):
+        pass
+
+
+class RetestTest(unittest.TestCase):
+    def setUp(self):
+        FailingOnce.runs = 0
+        FailingOnce.fail_runs = 1
+        Passing.runs = 0
+
+        self.common_definitions = create_common_definitions()
+        test_definitions = create_test_definitions(
+            {'FailingOnce': {'value': {'min': 1}}, 'Passing': {'value': {'min': 1}}},
+            FailingOnce,
+            Passing,
+        )
+        self.test_position = create_test_positions(1)['position_1']
+        self.test_control = {'abort': False, 'retest_on_fail': 1}
+        self.executor = task_executor.Executor(['position_1'], 2, 1, 2)
+
+        self.test_run = create_test_run(
+            self.common_definitions,
+            test_definitions,
+            {'position_1': self.test_position},
+            self.executor,
+            self.test_control,
+            logger=logging.getLogger('test_retest'),
+        )
+
+    def tearDown(self):
+        self.executor.shutdown()
+
+    def run_test_run(self):
+        for name in self.test_run.test_case_names:
+            self.test_run.run_test_case('position_1', self.test_position, name)
+        self.test_run.join_post_tests()
+        self.test_run.retest_failed_cases('position_1', self.test_position)
+
+    def test_retest_runs_test_cases_skipped_after_fail(self):
+        self.run_test_run()
+
+        dut = self.test_position.dut
+        self.assertEqual(FailingOnce.runs, 2)
+        self.assertEqual(Passing.runs, 1)
+        self.assertEqual(dut.test_cases['FailingOnce']['result'], 'pass')
+        self.assertEqual(dut.test_cases['Passing']['result'], 'pass')
+        self.assertEqual(len(dut.test_cases['FailingOnce']['attempts']), 1)
+        self.assertNotIn('attempts', dut.test_cases['Passing'])
+        self.assertEqual(dut.pass_fail_result, 'pass')
+
+    def test_dut_fails_when_retest_fails(self):
+        FailingOnce.fail_runs = 2
+        self.run_test_run()
+
+        dut = self.test_position.dut
+        self.assertEqual(FailingOnce.runs, 2)
+        self.assertEqual(Passing.runs, 0)
+        self.assertNotIn('Passing', dut.test_cases)
+        self.assertEqual(dut.pass_fail_result, 'fail')
+
+
+if __name__ == '__main__':
+    unittest.main()
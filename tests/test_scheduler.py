@@ -0,0 +1,155 @@
+"""Test cases run along dependency graph"""
+import logging
+import threading
+import types
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait
+
+from conftest import create_common_definitions
+from conftest import create_test_definitions
+from conftest import create_test_positions
+from conftest import create_test_run
+from test_runner import exceptions
+from test_runner import executor as task_executor
+from test_runner import instrument_locks
+from test_runner import runner
+from test_runner import scheduler
+from test_runner import test_case
+
+
+class DependencyGraphTest(unittest.TestCase):
+    def test_ready_test_cases_are_in_tests_order(self):
+        graph = scheduler.DependencyGraph(
+            ['Flash', 'Voltage', 'Current', 'Radio'],
+            {'Current': ['Flash'], 'Radio': ['Voltage', 'Current']},
+        )
+
+        self.assertEqual(graph.ready(set(), set()), ['Flash', 'Voltage'])
+        self.assertEqual(graph.ready({'Flash'}, {'Flash', 'Voltage'}), ['Current'])
+        self.assertEqual(graph.ready({'Flash', 'Voltage'}, {'Flash', 'Voltage', 'Current'}), [])
+        self.assertEqual(
+            graph.ready({'Flash', 'Voltage', 'Current'}, {'Flash', 'Voltage', 'Current'}),
+            ['Radio'],
+        )
+
+    def test_dependency_to_skipped_test_case_is_met(self):
+        graph = scheduler.DependencyGraph(
+            ['Voltage', 'Radio'], {'Radio': ['Flash', 'Voltage']}, ['Flash', 'Voltage', 'Radio']
+        )
+
+        self.assertEqual(graph.ready({'Voltage'}, {'Voltage'}), ['Radio'])
+
+    def test_circular_dependency(self):
+        with self.assertRaisesRegex(exceptions.DependencyError, 'Circular.*Current, Radio'):
+            scheduler.DependencyGraph(
+                ['Flash', 'Current', 'Radio'],
+                {'Current': ['Flash', 'Radio'], 'Radio': ['Current']},
+            )
+
+    def test_unknown_dependency(self):
+        with self.assertRaisesRegex(exceptions.DependencyError, "Unknown test case 'Flahs'"):
+            scheduler.DependencyGraph(['Flash', 'Radio'], {'Radio': ['Flahs']})
+
+    def test_unknown_test_case_with_dependencies(self):
+        with self.assertRaisesRegex(exceptions.DependencyError, "Unknown test case 'Radoi'"):
+            scheduler.DependencyGraph(['Flash', 'Radio'], {'Radoi': ['Flash']})
+
+    def test_no_test_cases_are_started_after_stop_testing(self):
+        graph = scheduler.DependencyGraph(
+            ['Flash', 'Voltage', 'Radio'], {'Voltage': ['Flash'], 'Radio': ['Voltage']}
+        )
+        position = types.SimpleNamespace(name='position_1', stop_testing=False)
+        run = []
+
+        def run_case(name):
+            run.append(name)
+            position.stop_testing = name == 'Voltage'
+
+        with ThreadPoolExecutor(2) as pool:
+            scheduler.run_graph(
+                graph, run_case, pool.submit, position, logging.getLogger('test_scheduler')
+            )
+
+        self.assertEqual(run, ['Flash', 'Voltage'])
+
+
+class Heating(test_case.TestCase):
+    """pre_test heats the DUT on background once the next test case has powered it"""
+
+    REQUIRED_INSTRUMENTS = {'dmm': test_case.InstrumentAccess.SHARED}
+
+    def pre_test(self):
+        self.new_measurement('powered', int(self.test_position.powered.wait(1)))
+
+    def test(self):
+        self.new_measurement('value', 1)
+
+    def post_test(self):
+        pass
+
+
+class Powering(test_case.TestCase):
+    REQUIRED_INSTRUMENTS = {'dmm': test_case.InstrumentAccess.SHARED}
+
+    def test(self):
+        self.test_position.powered.set()
+        self.new_measurement('value', 1)
+
+    def post_test(self):
+        pass
+
+
+class ChainedGraphTest(unittest.TestCase):
+    POSITIONS = 6
+
+    def setUp(self):
+        self.logger = logging.getLogger('test_scheduler')
+        self.common_definitions = create_common_definitions(
+            FLOW_CONTROL=test_case.FlowControl.CONTINUE,
+            PARALLEL_EXECUTION='PARALLEL',
+            prepare_test_case=lambda *args: None,
+        )
+        limits = {
+            'Heating': {'value': {'min': 1}, 'powered': {'min': 1}},
+            'Powering': {'value': {'min': 1}},
+        }
+        self.test_definitions = create_test_definitions(limits, Heating, Powering)
+        self.test_definitions.TESTS = ['Heating_pre', 'Powering', 'Heating']
+        self.test_positions = create_test_positions(self.POSITIONS)
+        for position in self.test_positions.values():
+            position.powered = threading.Event()
+        # One worker for test cases and one for pre-tests of all test positions
+        self.executor = task_executor.Executor(list(self.test_positions), 1, 1, 1)
+
+    def tearDown(self):
+        self.executor.shutdown()
+
+    def test_pre_tests_run_while_many_positions_use_one_background_worker(self):
+        run = create_test_run(
+            self.common_definitions,
+            self.test_definitions,
+            self.test_positions,
+            self.executor,
+            instrument_locks=instrument_locks.InstrumentLocks(),
+            logger=self.logger,
+        )
+        run.test_graph = runner.get_test_graph(
+            self.common_definitions, self.test_definitions, None, run.test_case_names, self.logger
+        )
+        self.assertIsNotNone(run.test_graph)
+
+        futures = [
+            self.executor.submit(name, run.run_test_cases, name, position)
+            for name, position in self.test_positions.items()
+        ]
+        _, not_done = wait(futures, timeout=10)
+        self.assertFalse(not_done, "Test positions are stuck")
+        run.join_post_tests()
+
+        for position in self.test_positions.values():
+            self.assertEqual(position.dut.pass_fail_result, 'pass')
+
+
+if __name__ == '__main__':
+    unittest.main()
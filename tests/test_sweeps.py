@@ -0,0 +1,125 @@
+"""Test cases run over sweep points"""
+import types
+import unittest
+
+from conftest import Progress
+from conftest import create_common_definitions
+from test_runner import test_case
+from test_runner.dut import Dut
+
+
+class Gain(test_case.TestCase):
+    """Measures gain of the point, fails on frequencies over 2e6"""
+
+    def test(self):
+        self.new_measurement('Gain', 3e6 - self.sweep_point['frequency'])
+
+    def post_test(self):
+        pass
+
+
+class BatchGain(Gain):
+    batches = []
+
+    def test_batch(self, points):
+        BatchGain.batches.append(points)
+        for point in points:
+            self.new_measurement('Gain', 3e6 - point['frequency'], point=point)
+
+
+class SweepTest(unittest.TestCase):
+    LIMITS = {'Gain': {'Gain': {'min': 1e6}}, 'BatchGain': {'Gain': {'min': 1e6}}}
+
+    def create_test_case(self, test_case_class, sweep):
+        self.dut = Dut('sn_1', 'position_1')
+        case = test_case_class(
+            self.LIMITS,
+            Progress(),
+            self.dut,
+            {'sweeps': {test_case_class.__name__: sweep}},
+            None,
+            create_common_definitions(FLOW_CONTROL=None),
+        )
+        case.initialize_measurements()
+        return case
+
+    def test_points_of_dictionary_are_all_combinations(self):
+        case = self.create_test_case(Gain, {'frequency': [1e6, 2e6], 'power': [0, 10]})
+
+        self.assertEqual(
+            case.get_sweep_points(),
+            [
+                {'frequency': 1e6, 'power': 0},
+                {'frequency': 1e6, 'power': 10},
+                {'frequency': 2e6, 'power': 0},
+                {'frequency': 2e6, 'power': 10},
+            ],
+        )
+
+    def test_points_of_list_are_copied(self):
+        sweep = [{'frequency': 1e6}, {'frequency': 5e6}]
+        case = self.create_test_case(Gain, sweep)
+
+        points = case.get_sweep_points()
+        points[0]['frequency'] = 0
+
+        self.assertEqual(sweep[0], {'frequency': 1e6})
+
+    def test_no_sweep(self):
+        case = self.create_test_case(Gain, None)
+
+        self.assertIsNone(case.get_sweep_points())
+
+    def test_test_is_run_for_each_point(self):
+        case = self.create_test_case(Gain, {'frequency': [1e6, 2e6, 3e6]})
+        case.run_test()
+
+        measurements = self.dut.test_cases['Gain']['measurements']
+        self.assertEqual(
+            list(measurements),
+            [
+                'Gain[frequency=1000000.0]',
+                'Gain[frequency=2000000.0]',
+                'Gain[frequency=3000000.0]',
+            ],
+        )
+        self.assertEqual(measurements['Gain[frequency=3000000.0]']['result'], 'fail')
+        self.assertEqual(
+            [(point['point'], point['result']) for point in self.dut.test_cases['Gain']['points']],
+            [
+                ({'frequency': 1e6}, 'pass'),
+                ({'frequency': 2e6}, 'pass'),
+                ({'frequency': 3e6}, 'fail'),
+            ],
+        )
+        self.assertIsNone(case.sweep_point)
+        self.assertEqual(self.dut.pass_fail_result, 'fail')
+
+    def test_sweep_stops_when_test_position_stops_testing(self):
+        case = self.create_test_case(Gain, {'frequency': [1e6, 2e6, 3e6]})
+        case.test_position = types.SimpleNamespace(stop_testing=False)
+        original_test = case.test
+
+        def test():
+            original_test()
+            case.test_position.stop_testing = True
+
+        case.test = test
+        case.run_test()
+
+        self.assertEqual(len(self.dut.test_cases['Gain']['points']), 1)
+
+    def test_batch_measures_all_points_at_once(self):
+        BatchGain.batches = []
+        case = self.create_test_case(BatchGain, {'frequency': [1e6, 3e6]})
+        case.run_test()
+
+        self.assertEqual(BatchGain.batches, [[{'frequency': 1e6}, {'frequency': 3e6}]])
+        points = self.dut.test_cases['BatchGain']['points']
+        self.assertEqual([point['result'] for point in points], ['pass', 'fail'])
+        # Batched points share the duration
+        self.assertEqual(points[0]['duration_s'], points[1]['duration_s'])
+
+
+if __name__ == '__main__':
+    unittest.main()
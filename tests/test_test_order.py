@@ -0,0 +1,108 @@
+"""Fail-fast ordering of test cases"""
+import logging
+import types
+import unittest
+
+from test_runner import test_order
+
+
+class FailFastOrderTest(unittest.TestCase):
+    def setUp(self):
+        self.order = test_order.FailFastOrder(logging.getLogger('test_test_order'))
+
+    def add_history(self, test_case_name, runs, fails, duration_s):
+        dut = types.SimpleNamespace(
+            test_cases={test_case_name: {'result': 'fail', 'duration_s': duration_s}}
+        )
+        for _ in range(fails):
+            self.order.record('sequence', dut)
+        dut.test_cases[test_case_name]['result'] = 'pass'
+        for _ in range(runs - fails):
+            self.order.record('sequence', dut)
+
+    def test_failing_test_cases_per_second_first(self):
+        self.add_history('Flash', 10, 0, 1.0)
+        # Fails most often, but takes so long that the others find failures faster
+        self.add_history('Radio', 10, 8, 20.0)
+        self.add_history('Current', 10, 2, 1.0)
+
+        self.assertEqual(
+            self.order.order('sequence', ['Flash', 'Radio', 'Current']),
+            ['Current', 'Flash', 'Radio'],
+        )
+
+    def test_pinned_test_cases_keep_their_place(self):
+        self.add_history('Flash', 10, 0, 1.0)
+        self.add_history('Current', 10, 5, 1.0)
+        self.add_history('Radio', 10, 9, 1.0)
+
+        # Radio is not moved over the pinned Power
+        self.assertEqual(
+            self.order.order(
+                'sequence', ['Flash', 'Current', 'Power', 'Radio'], pinned=['Power']
+            ),
+            ['Current', 'Flash', 'Power', 'Radio'],
+        )
+
+    def test_test_cases_are_not_moved_before_their_dependencies(self):
+        self.add_history('Flash', 10, 0, 1.0)
+        self.add_history('Radio', 10, 9, 1.0)
+        self.add_history('Current', 10, 5, 1.0)
+
+        self.assertEqual(
+            self.order.order(
+                'sequence', ['Flash', 'Current', 'Radio'], depends={'Radio': ['Flash']}
+            ),
+            ['Current', 'Flash', 'Radio'],
+        )
+
+    def test_pre_test_step_is_kept_before_its_test_case(self):
+        self.add_history('Flash', 10, 0, 1.0)
+        self.add_history('Radio', 10, 9, 1.0)
+
+        self.assertEqual(
+            self.order.order('sequence', ['Flash', 'Radio_pre', 'Radio']),
+            ['Radio_pre', 'Radio', 'Flash'],
+        )
+
+    def test_history_is_read_from_test_reports_once(self):
+        reports = [
+            {
+                'failedCases': ['Radio'],
+                'testCases': [
+                    {'name': 'Flash', 'duration': 1.0},
+                    {'name': 'Radio', 'duration': 1.0},
+                ],
+            }
+        ] * 5
+        queries = []
+
+        class Cursor(list):
+            def sort(self, *args):
+                return self
+
+            def limit(self, count):
+                return self
+
+        def find(query, projection):
+            queries.append(query)
+            return Cursor(reports)
+
+        db_handler = types.SimpleNamespace(
+            db_name='iris',
+            db_client={
+                'iris': types.SimpleNamespace(test_reports=types.SimpleNamespace(find=find))
+            },
+        )
+        test_definitions = types.SimpleNamespace()
+
+        for _ in range(2):
+            self.assertEqual(
+                self.order.apply(db_handler, 'sequence', test_definitions, ['Flash', 'Radio']),
+                ['Radio', 'Flash'],
+            )
+        self.assertEqual(queries, [{'sequence': 'sequence'}])
+
+
+if __name__ == '__main__':
+    unittest.main()
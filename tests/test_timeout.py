@@ -0,0 +1,117 @@
+"""Timeout of test cases"""
+import logging
+import threading
+import unittest
+
+from conftest import create_common_definitions
+from conftest import create_test_definitions
+from conftest import create_test_positions
+from conftest import create_test_run
+from test_runner import cancellation
+from test_runner import executor as task_executor
+from test_runner import test_case
+
+
+class StuckPostTest(test_case.TestCase):
+    """post_test hangs, e.g. on an instrument call, until released"""
+
+    TIMEOUT = 0.2
+    release = threading.Event()
+
+    def test(self):
+        self.new_measurement('value', 1)
+
+    def post_test(self):
+        StuckPostTest.release.wait(10)
+
+
+class StuckOnFirstPosition(test_case.TestCase):
+    """test hangs on the first test position between syncs with the other positions"""
+
+    release = threading.Event()
+
+    def get_timeout(self):
+        # Other test positions wait for the stuck one until it is cancelled
+        return 0.2 if self.test_position.name == 'position_1' else 5
+
+    def test(self):
+        self.sync_threads(5)
+        if self.test_position.name == 'position_1':
+            StuckOnFirstPosition.release.wait(10)
+        self.sync_threads(5)
+        self.new_measurement('value', 1)
+
+    def post_test(self):
+        pass
+
+
+class TimeoutTest(unittest.TestCase):
+    def setUp(self):
+        StuckPostTest.release.clear()
+        StuckOnFirstPosition.release.clear()
+
+        test_definitions = create_test_definitions(
+            {
+                'StuckPostTest': {'value': {'min': 1}},
+                'StuckOnFirstPosition': {'value': {'min': 1}},
+            },
+            StuckPostTest,
+        )
+        test_definitions.StuckOnFirstPosition = StuckOnFirstPosition
+        self.test_positions = create_test_positions(2)
+        self.test_position = self.test_positions['position_1']
+        self.executor = task_executor.Executor(list(self.test_positions), 2, 1, 2)
+
+        self.test_run = create_test_run(
+            create_common_definitions(),
+            test_definitions,
+            self.test_positions,
+            self.executor,
+            logger=logging.getLogger('test_timeout'),
+        )
+
+    def tearDown(self):
+        StuckPostTest.release.set()
+        StuckOnFirstPosition.release.set()
+        self.executor.shutdown()
+
+    def test_post_test_is_cancelled_on_timeout(self):
+        self.test_run.run_test_case('position_1', self.test_position, 'StuckPostTest')
+        self.test_run.join_post_tests()
+
+        dut = self.test_position.dut
+        self.assertEqual(dut.test_cases['StuckPostTest']['result'], 'error')
+        self.assertEqual(dut.test_cases['StuckPostTest']['error']['type'], 'TestCaseCancelled')
+        self.assertEqual(dut.pass_fail_result, 'error')
+        self.assertTrue(self.test_position.stop_testing)
+
+    def test_synced_test_positions_continue_without_cancelled_one(self):
+        self.test_run.all_pos_mid_test_cases_completed = cancellation.CancellableBarrier(2)
+        self.test_run.mid_case_reset_barrier = cancellation.CancellableBarrier(2)
+        self.test_run.all_pos_test_cases_completed = cancellation.CancellableBarrier(2)
+
+        task_executor.join(
+            [
+                self.executor.submit(
+                    name,
+                    self.test_run.run_test_case,
+                    name,
+                    position,
+                    'StuckOnFirstPosition',
+                    True,
+                )
+                for name, position in self.test_positions.items()
+            ],
+            logging.getLogger('test_timeout'),
+        )
+        self.test_run.join_post_tests()
+
+        stuck = self.test_positions['position_1'].dut
+        other = self.test_positions['position_2'].dut
+        self.assertEqual(stuck.test_cases['StuckOnFirstPosition']['result'], 'error')
+        self.assertEqual(other.test_cases['StuckOnFirstPosition']['result'], 'pass')
+        self.assertEqual(other.pass_fail_result, 'pass')
+
+
+if __name__ == '__main__':
+    unittest.main()
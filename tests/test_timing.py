@@ -0,0 +1,115 @@
+"""Timing of the phases of test cases"""
+import logging
+import time
+import unittest
+
+from conftest import create_common_definitions
+from conftest import create_test_definitions
+from conftest import create_test_positions
+from conftest import create_test_run
+from test_runner import executor as task_executor
+from test_runner import test_case
+from test_runner import timing
+from test_runner.dut import Dut
+
+
+class Slow(test_case.TestCase):
+    """Each phase takes at least PHASE_S"""
+
+    PHASE_S = 0.05
+
+    def pre_test(self):
+        time.sleep(self.PHASE_S)
+
+    def test(self):
+        time.sleep(self.PHASE_S)
+        self.new_measurement('value', 1)
+
+    def post_test(self):
+        time.sleep(self.PHASE_S)
+
+
+class TestCaseTimingTest(unittest.TestCase):
+    def setUp(self):
+        self.test_position = create_test_positions(1)['position_1']
+        self.executor = task_executor.Executor(['position_1'], 2, 1, 2)
+        self.test_run = create_test_run(
+            create_common_definitions(),
+            create_test_definitions({'Slow': {'value': {'min': 1}}}, Slow),
+            {'position_1': self.test_position},
+            self.executor,
+            logger=logging.getLogger('test_timing'),
+        )
+        self.test_run.test_case_names = ['Slow_pre', 'Slow']
+
+    def tearDown(self):
+        self.executor.shutdown()
+
+    def test_phases_are_recorded(self):
+        for name in self.test_run.test_case_names:
+            self.test_run.run_test_case('position_1', self.test_position, name)
+        self.test_run.join_post_tests()
+
+        phases = self.test_position.dut.test_cases['Slow']['timing']
+        self.assertEqual(
+            set(phases),
+            {
+                'pre_queue',
+                'pre_test',
+                'pre_join',
+                'instrument_wait',
+                'test',
+                'post_queue',
+                'post_test',
+                'evaluate',
+                'clean',
+            },
+        )
+
+        for phase in ('pre_test', 'test', 'post_test'):
+            self.assertGreaterEqual(phases[phase]['duration_s'], Slow.PHASE_S)
+            self.assertEqual(phases[phase]['count'], 1)
+        self.assertLess(phases['pre_test']['start_s'], Slow.PHASE_S)
+        self.assertLessEqual(phases['pre_test']['end_s'], phases['post_test']['start_s'])
+        # Instruments are waited for on each of pre_test, test and post_test
+        self.assertEqual(phases['instrument_wait']['count'], 3)
+
+    def test_statistics_per_sequence(self):
+        statistics = timing.TestCaseTiming()
+        for duration_s in (1.0, 3.0):
+            dut = Dut('sn_1', 'position_1')
+            dut.test_cases['Slow'] = {
+                'duration_s': duration_s + 1,
+                'timing': {'test': {'duration_s': duration_s, 'count': 1}},
+            }
+            statistics.add('sequence', dut)
+
+        self.assertEqual(
+            statistics.statistics('sequence'),
+            {
+                'Slow': {
+                    'test': {'count': 2, 'mean_s': 2.0, 'max_s': 3.0},
+                    'total': {'count': 2, 'mean_s': 3.0, 'max_s': 4.0},
+                }
+            },
+        )
+        self.assertEqual(statistics.statistics('other_sequence'), {})
+
+
+class RecordTimingTest(unittest.TestCase):
+    def test_repeated_phase_is_summed(self):
+        case = Slow({}, None, Dut('sn_1', 'position_1'), {}, None, create_common_definitions())
+        case.initialize_measurements()
+        case.start_time_monotonic = 100.0
+
+        case.record_timing('barrier_wait', 101.0, 101.5)
+        case.record_timing('barrier_wait', 103.0, 103.25)
+
+        self.assertEqual(
+            case.dut.test_cases['Slow']['timing']['barrier_wait'],
+            {'start_s': 1.0, 'end_s': 3.25, 'duration_s': 0.75, 'count': 2},
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()